@@ -1,10 +1,15 @@
 import os
 import sys
 import json
+import hashlib
 import subprocess
 import argparse
 import re
 import platform
+import itertools
+import math
+import statistics
+from concurrent.futures import ProcessPoolExecutor
 import psutil
 
 from asvdb import ASVDb, BenchmarkInfo, BenchmarkResult
@@ -16,6 +21,12 @@ from pynvml import smi
 #   -n : Repository Name
 #   -t : Target Directory for ASV JSON
 #   -b : Branch Name
+#   -j : Number of processes to read the JSON files with (default: 1)
+#   -u : Units of the user counters in JSON format, eg. '{"bandwidth": "GB/s"}'
+#        (default: "count")
+#   -m : Manifest of the JSON files already added to the ASV results
+#        (default: <target dir>/.gbench_to_asv_manifest.json)
+#   --dry-run : Only report the JSON files that would be added
 
 def build_argparse():
     parser = argparse.ArgumentParser(add_help=True)
@@ -24,6 +35,10 @@ def build_argparse():
     parser.add_argument('-t', nargs=1, help='Target Directory for JSON')
     parser.add_argument('-b', nargs=1, help='Branch Name')
     parser.add_argument('-r', nargs=1, help='Requirements metadata in JSON format', default=['{}'])
+    parser.add_argument('-j', nargs=1, type=int, help='Number of processes to read the JSON files with', default=[1])
+    parser.add_argument('-u', nargs=1, help='Units of the user counters in JSON format', default=['{}'])
+    parser.add_argument('-m', nargs=1, help='Manifest of the JSON files already added')
+    parser.add_argument('--dry-run', action='store_true', help='Only report the JSON files that would be added')
     return parser
 
 
@@ -41,12 +56,17 @@ def getCommandOutput(cmd):
                        % (cmd, stdout, stderr))
 
 
-def getSysInfo(requirements):
+def getMachineName():
     # Use Node Label from Jenkins if possible
     label = os.environ.get('ASV_LABEL')
-    uname = platform.uname()
     if label == None:
-        label = uname.machine
+        label = platform.uname().machine
+    return label
+
+
+def getSysInfo(requirements):
+    label = getMachineName()
+    uname = platform.uname()
 
     commitHash = getCommandOutput("git rev-parse HEAD")
     commitTime = getCommandOutput("git log -n1 --pretty=%%ct %s" % commitHash)
@@ -70,76 +90,406 @@ def getSysInfo(requirements):
 
     return bInfo
 
-def genBenchmarkResults(fileList, repoName):
-    pattern = re.compile(r"([^\/]+)")
-    benchResults = []
+# Gbench output files are read this many characters at a time
+READ_SIZE = 1 << 20
+
+NAME_PATTERN = re.compile(r"([^\/]+)")
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+json_decoder = json.JSONDecoder()
+
 
-    for file in fileList:
-        with open(file, 'r') as in_file:
-            tests = json.load(in_file)["benchmarks"]
-
-        # Create dictionary reference for number of parameters
-        num_params_dict = {}
-        for each in tests:
-            name_and_params = pattern.findall(each["name"])
-            name = repoName + "." + name_and_params[0]
-            name = name.replace("<","[").replace(">","]").replace("::", "_")
-            test_params = name_and_params[1:]
-
-            # Get max number of parameters for each benchmark
-            if name not in num_params_dict:
-                num_params_dict[name] = len(test_params)
+class JSONStream:
+    """
+    Reads the JSON values in a file one at a time, READ_SIZE characters at a
+    time, so the whole file never has to be in memory.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+
+    def fill(self):
+        chunk = self.f.read(READ_SIZE)
+        if not chunk:
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        # Return the next non-whitespace character without consuming it
+        while True:
+            self.pos = WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                raise ValueError("Unexpected end of JSON in %s" % self.f.name)
+
+    def accept(self, char):
+        # Consume the next non-whitespace character if it is char
+        if self.peek() != char:
+            return False
+        self.pos += 1
+        return True
+
+    def expect(self, char):
+        if not self.accept(char):
+            raise ValueError("Expected '%s' at offset %d in %s"
+                             % (char, self.pos, self.f.name))
+
+    def decode(self):
+        # Return the next JSON value, reading more of the file until it is
+        # complete
+        self.peek()
+        while True:
+            try:
+                (value, end) = json_decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if (end == len(self.buf)) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iterGbenchEntries(fileName):
+    """
+    Yield each entry of the "benchmarks" list of the gbench JSON output file
+    fileName, without loading the whole file.
+    """
+    with open(fileName, 'r') as in_file:
+        stream = JSONStream(in_file)
+        stream.expect("{")
+        if stream.accept("}"):
+            return
+        while True:
+            key = stream.decode()
+            stream.expect(":")
+            if key != "benchmarks":
+                # eg. "context"
+                stream.decode()
             else:
-                if len(test_params) > num_params_dict[name]:
-                    num_params_dict[name] = len(test_params)
-
-        for each in tests:
-            #Get Benchmark Name and Test Parameters
-            name_and_params = pattern.findall(each["name"])
-            name = repoName + "." + name_and_params[0]
-            name = name.replace("<","[").replace(">","]").replace("::", "_")
-            test_params = name_and_params[1:]
-            param_values = []
-
-            for idx in range(num_params_dict[name]):
-                if idx < len(test_params):
-                    param_values.append((f"param{idx}", test_params[idx]))
-                else:
-                    param_values.append((f"param{idx}", "None"))
-
-            #Get result
+                stream.expect("[")
+                if not stream.accept("]"):
+                    yield stream.decode()
+                    while stream.accept(","):
+                        yield stream.decode()
+                    stream.expect("]")
+            if not stream.accept(","):
+                break
+        stream.expect("}")
+
+
+# The fields of a gbench entry that are not counters
+GBENCH_FIELDS = {"name", "family_index", "per_family_instance_index",
+                 "run_name", "run_type", "repetitions", "repetition_index",
+                 "threads", "iterations", "real_time", "cpu_time",
+                 "time_unit", "aggregate_name", "aggregate_unit", "label",
+                 "error_occurred", "error_message", "bytes_per_second",
+                 "items_per_second", "big_o", "real_coefficient",
+                 "cpu_coefficient", "rms"}
+
+# The aggregates gbench adds for --benchmark_repetitions, which older gbench
+# versions only tell apart from other entries by the suffix of their name
+REPETITION_AGGREGATES = ("mean", "median", "stddev", "cv")
+
+# The entries of the complexity (eg. "oN") fits of a benchmark
+COMPLEXITY_AGGREGATES = ("BigO", "RMS")
+
+
+def getEntryRun(each):
+    """
+    Return the (run name, aggregate name) of the gbench entry each, with an
+    aggregate name of None for an iteration entry.
+    """
+    name = each["name"]
+    runType = each.get("run_type")
+    if runType == "aggregate":
+        aggregate = each.get("aggregate_name")
+        if aggregate in COMPLEXITY_AGGREGATES:
+            # Kept as benchmarks of their own, eg. <name>_RMS
+            return (name, aggregate)
+        return (each.get("run_name", name), aggregate)
+    if runType is None:
+        # Written by a gbench version older than run_type
+        if "rms" in each:
+            return (name, "RMS")
+        if "big_o" in each:
+            return (name, "BigO")
+        for aggregate in REPETITION_AGGREGATES:
+            if name.endswith("_" + aggregate):
+                return (name[:-len(aggregate) - 1], aggregate)
+    return (each.get("run_name", name), None)
+
+
+def getEntryValues(each, counterUnits):
+    """
+    Return {suffix: (result, unit)} for the time and counters of the gbench
+    entry each, where the suffix is appended to the benchmark name.
+    """
+    # gbench's default time unit, which it always writes but older
+    # versions did not
+    timeUnit = each.get("time_unit", "ns")
+    values = {"": (each["real_time"], timeUnit)}
+    if "cpu_time" in each:
+        values["_cpu_time"] = (each["cpu_time"], timeUnit)
+    if "iterations" in each:
+        values["_iterations"] = (each["iterations"], "count")
+    if "bytes_per_second" in each:
+        values["_throughput"] = (each["bytes_per_second"], "bps")
+    if "items_per_second" in each:
+        values["_items_per_second"] = (each["items_per_second"],
+                                       "items/second")
+    for (counter, value) in each.items():
+        if (counter not in GBENCH_FIELDS) and \
+           isinstance(value, (int, float)) and not isinstance(value, bool):
+            values["_" + counter] = (value, counterUnits.get(counter, "count"))
+    return values
+
+
+def getRunResults(entries, aggregates, counterUnits):
+    """
+    Return [(suffix, result, unit)] for the results of a benchmark run from
+    its iteration entries, one per repetition, and its aggregate entries
+    ({aggregate name: entry}). The times and counters are the mean of the
+    repetitions, and the spread of the time across them is added as the
+    _median, _stddev and _cv results.
+    """
+    results = []
+    if entries:
+        repetitions = [getEntryValues(each, counterUnits) for each in entries]
+        if len(repetitions) == 1:
+            # Not repeated, the most common case
+            results += [(suffix, result, unit) for (suffix, (result, unit))
+                        in repetitions[0].items()]
+        else:
+            for (suffix, (_, unit)) in repetitions[0].items():
+                values = [rep[suffix][0] for rep in repetitions
+                          if suffix in rep]
+                results.append((suffix, math.fsum(values) / len(values), unit))
+            times = [rep[""][0] for rep in repetitions]
+            timeUnit = repetitions[0][""][1]
+            mean = math.fsum(times) / len(times)
+            stddev = statistics.stdev(times, mean)
+            results += [("_median", statistics.median(times), timeUnit),
+                        ("_stddev", stddev, timeUnit),
+                        ("_cv", (stddev / mean * 100) if mean else 0,
+                         "percent")]
+    elif "mean" in aggregates:
+        # Only the aggregates were reported (--benchmark_report_aggregates_only),
+        # whose iterations are the number of repetitions
+        results += [(suffix, result, unit) for (suffix, (result, unit))
+                    in getEntryValues(aggregates["mean"], counterUnits).items()
+                    if suffix != "_iterations"]
+
+    if not aggregates:
+        return results
+
+    # Any other aggregate, computed by gbench from the same repetitions (eg. a
+    # user-defined statistic)
+    computed = {suffix for (suffix, _, _) in results}
+    for (aggregate, each) in aggregates.items():
+        suffix = "_" + aggregate
+        if (aggregate == "mean") or (suffix in computed):
+            continue
+        if (aggregate == "cv") or (each.get("aggregate_unit") == "percentage"):
+            # gbench reports these as fractions
+            results.append((suffix, each["real_time"] * 100, "percent"))
+        else:
+            results.append((suffix, each["real_time"],
+                            each.get("time_unit", "ns")))
+    return results
+
+
+def getComplexityResults(each):
+    """
+    Return [(suffix, result, unit)] for the result of the complexity fit entry
+    each: the RMS error of the fit, or the coefficient of its Big-O.
+    """
+    if "rms" in each:
+        # gbench reports the normalized RMS as a fraction
+        return [("", each["rms"] * 100, "percent")]
+    if "real_coefficient" in each:
+        return [("", each["real_coefficient"], each.get("time_unit", "ns"))]
+    return []
+
+
+def convertGbenchFile(fileName, repoName, counterUnits=None):
+    """
+    Return the (funcName, argNameValuePairs, result, unit) of the results in
+    the gbench JSON output file fileName. Runs in the worker processes, so
+    only plain tuples are returned.
+
+    The repetitions of a benchmark (--benchmark_repetitions) and the
+    aggregates gbench computed from them are grouped into one benchmark (see
+    getRunResults()). counterUnits is the {counter: unit} of the user
+    counters, which gbench does not write, and default to "count".
+    """
+    counterUnits = counterUnits or {}
+    # {run name: ([iteration entries], {aggregate name: entry})}, in the
+    # order of the runs in the file
+    runs = {}
+    for each in iterGbenchEntries(fileName):
+        if each.get("error_occurred"):
+            continue
+        (runName, aggregate) = getEntryRun(each)
+        (entries, aggregates) = runs.setdefault(runName, ([], {}))
+        if aggregate is None:
             if "real_time" in each:
-                bench_result = each["real_time"]
-            elif "rms" in each:
-                bench_result = each["rms"]
+                entries.append(each)
+        else:
+            aggregates[aggregate] = each
+
+    # The name of each run is only parsed once, then its params are padded
+    # to the max number of params of the benchmark in the file
+    parsedRuns = []
+    num_params_dict = {}
+    for (runName, (entries, aggregates)) in runs.items():
+        #Get Benchmark Name and Test Parameters
+        name_and_params = NAME_PATTERN.findall(runName)
+        name = repoName + "." + name_and_params[0]
+        name = name.replace("<","[").replace(">","]").replace("::", "_")
+        test_params = name_and_params[1:]
+        num_params_dict[name] = max(num_params_dict.get(name, 0),
+                                    len(test_params))
 
-            if "time_unit" in each:
-                time_unit = each["time_unit"]
+        #Get results
+        if set(aggregates) & set(COMPLEXITY_AGGREGATES):
+            (each,) = aggregates.values()
+            run_results = getComplexityResults(each)
+        else:
+            run_results = getRunResults(entries, aggregates, counterUnits)
+        if run_results:
+            parsedRuns.append((name, test_params, run_results))
+
+    results = []
+    for (name, test_params, run_results) in parsedRuns:
+        param_values = []
+        for idx in range(num_params_dict[name]):
+            if idx < len(test_params):
+                param_values.append((f"param{idx}", test_params[idx]))
             else:
-                time_unit = "seconds"
-            
-            #Check if benchmark logged throughput
-            if "bytes_per_second" in each:
-                bResult = BenchmarkResult(
-                    funcName=name+"_throughput",
+                param_values.append((f"param{idx}", "None"))
+
+        for (suffix, result, unit) in run_results:
+            results.append((name + suffix, param_values, result, unit))
+
+    return results
+
+
+def genBenchmarkResults(fileList, repoName, numProcesses=1,
+                        counterUnits=None):
+    benchResults = []
+
+    def addFileResults(fileResults):
+        # The results of each file are made into BenchmarkResults as they
+        # come in. All of them are kept until the single addResults() call
+        for results in fileResults:
+            for (funcName, param_values, result, unit) in results:
+                benchResults.append(BenchmarkResult(
+                    funcName=funcName,
                     argNameValuePairs=param_values,
-                    result=each["bytes_per_second"],
-                    unit="bps"
-                )
-                benchResults.append(bResult)
-            
-            bResult = BenchmarkResult(
-                funcName=name,
-                argNameValuePairs=param_values,
-                result=bench_result,
-                unit=time_unit
-            )
-            
-            benchResults.append(bResult)
-        
+                    result=result,
+                    unit=unit
+                ))
+
+    # Each file is read by one of numProcesses processes
+    if (numProcesses > 1) and (len(fileList) > 1):
+        with ProcessPoolExecutor(min(numProcesses, len(fileList))) as pool:
+            addFileResults(pool.map(convertGbenchFile, fileList,
+                                    itertools.repeat(repoName),
+                                    itertools.repeat(counterUnits)))
+    else:
+        addFileResults(convertGbenchFile(file, repoName, counterUnits)
+                       for file in fileList)
+
     return benchResults
 
 
+# The files already added to the ASV results of each machine, stored in the
+# target directory by default
+MANIFEST_FILE_NAME = ".gbench_to_asv_manifest.json"
+
+
+def hashFile(fileName):
+    """
+    Return the SHA-256 hex digest of the contents of fileName.
+    """
+    sha = hashlib.sha256()
+    with open(fileName, 'rb') as in_file:
+        for chunk in iter(lambda: in_file.read(READ_SIZE), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def readManifest(manifestFile):
+    """
+    Return the manifest in manifestFile, or an empty one if it does not exist
+    yet. It has the form:
+
+        {machineName: {
+            "ingested": {content hash: {"file": file name,
+                                        "commit": commitHash}},
+            "files": {file name: [size, mtime_ns, content hash]}}}
+
+    where "ingested" are the contents added to the ASV results of the
+    machine, credited to the commit the results were added for, and "files"
+    caches the content hash of each file seen, so it is only computed again
+    when its size or modification time changes.
+    """
+    if not os.path.exists(manifestFile):
+        return {}
+    with open(manifestFile, 'r') as in_file:
+        return json.load(in_file)
+
+
+def writeManifest(manifestFile, manifest):
+    # Replaced atomically, so an interrupted run leaves the previous manifest
+    os.makedirs(os.path.dirname(os.path.abspath(manifestFile)), exist_ok=True)
+    with open(manifestFile + ".tmp", 'w') as out_file:
+        json.dump(manifest, out_file, indent=2, sort_keys=True)
+    os.replace(manifestFile + ".tmp", manifestFile)
+
+
+def getFileHash(fileName, fileCache):
+    """
+    Return the content hash of fileName, from fileCache ({file name: [size,
+    mtime_ns, content hash]}) if its size and modification time are those it
+    was hashed with, else hashing it and updating fileCache.
+    """
+    stat = os.stat(fileName)
+    name = os.path.basename(fileName)
+    cached = fileCache.get(name)
+    if (cached is not None) and \
+       (cached[:2] == [stat.st_size, stat.st_mtime_ns]):
+        return cached[2]
+    fileHash = hashFile(fileName)
+    fileCache[name] = [stat.st_size, stat.st_mtime_ns, fileHash]
+    return fileHash
+
+
+def getNewFiles(fileList, machineManifest):
+    """
+    Return the [(fileName, content hash)] of the files in fileList whose
+    contents were not added to the ASV results of the machine yet, whatever
+    commit they were added for, ie. the files that are new or changed since
+    they were added. machineManifest is the manifest of the machine (see
+    readManifest()), whose file hash cache is updated.
+    """
+    fileCache = machineManifest.setdefault("files", {})
+    ingested = machineManifest.setdefault("ingested", {})
+    newFiles = []
+    for fileName in fileList:
+        fileHash = getFileHash(fileName, fileCache)
+        if fileHash not in ingested:
+            newFiles.append((fileName, fileHash))
+    return newFiles
+
+
 def main(args):
     ns = build_argparse().parse_args(args)
     testResultDir = ns.d[0]
@@ -147,23 +497,57 @@ def main(args):
     outputDir = ns.t[0]
     branchName = ns.b[0]
     requirements = json.loads(ns.r[0])
+    numProcesses = ns.j[0]
+    counterUnits = json.loads(ns.u[0])
 
-    gbenchFileList = os.listdir(testResultDir)
-    repoUrl = getCommandOutput("git remote -v").split("\n")[-1].split()[1]
-
-    db = ASVDb(outputDir, repoUrl, [branchName])
+    gbenchFileList = [f"{testResultDir}/{each}"
+                      for each in sorted(os.listdir(testResultDir))
+                      if each.endswith(".json")]
+    manifestFile = ns.m[0] if ns.m else os.path.join(outputDir,
+                                                     MANIFEST_FILE_NAME)
 
-    for each in gbenchFileList:
-        if not ".json" in each:
-            gbenchFileList.remove(each)
-
-    for i,val in enumerate(gbenchFileList):
-        gbenchFileList[i] = f"{testResultDir}/{val}"
+    # Only the files whose contents were not added for this machine yet, for
+    # any commit, are added. Only the machine name and commit are needed to
+    # tell, so a dry run does not need a GPU.
+    machineName = getMachineName()
+    commitHash = getCommandOutput("git rev-parse HEAD")
+    manifest = readManifest(manifestFile)
+    machineManifest = manifest.setdefault(machineName, {})
+    newFiles = getNewFiles(gbenchFileList, machineManifest)
+    addedNames = {each["file"] for each in machineManifest["ingested"].values()}
+    for (fileName, _) in newFiles:
+        status = "changed" if os.path.basename(fileName) in addedNames \
+                 else "new"
+        print("%s %s (%s)" % ("Would add" if ns.dry_run else "Adding",
+                              fileName, status))
+    print("%d of %d files to add for machine %s, commit %s"
+          % (len(newFiles), len(gbenchFileList), machineName, commitHash))
+    if ns.dry_run:
+        return
+    if not newFiles:
+        # Keeps the file hashes computed for files that were touched
+        writeManifest(manifestFile, manifest)
+        return
 
     smi.nvmlInit()
     system_info = getSysInfo(requirements)
-    resultList = genBenchmarkResults(gbenchFileList, repoName)
+
+    repoUrl = getCommandOutput("git remote -v").split("\n")[-1].split()[1]
+
+    db = ASVDb(outputDir, repoUrl, [branchName])
+
+    resultList = genBenchmarkResults([fileName for (fileName, _) in newFiles],
+                                     repoName, numProcesses, counterUnits)
+    # All results are added in one batch, since each call rewrites the
+    # database files
     db.addResults(system_info, resultList)
 
+    # Only recorded once the results were added, so files are added again if
+    # the run fails before then
+    machineManifest["ingested"].update(
+        (fileHash, {"file": os.path.basename(fileName), "commit": commitHash})
+        for (fileName, fileHash) in newFiles)
+    writeManifest(manifestFile, manifest)
+
 if __name__ == '__main__':
     main(sys.argv[1:])
@@ -0,0 +1,255 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import GBenchToASV  # noqa: E402
+
+
+def iteration(name, real_time, repetition_index=0, **fields):
+    return dict({"name": name, "run_name": name, "run_type": "iteration",
+                 "repetitions": 1, "repetition_index": repetition_index,
+                 "threads": 1, "iterations": 100, "real_time": real_time,
+                 "cpu_time": real_time + 1, "time_unit": "us"}, **fields)
+
+
+def aggregate(run_name, aggregate_name, real_time, **fields):
+    return dict({"name": f"{run_name}_{aggregate_name}", "run_name": run_name,
+                 "run_type": "aggregate", "aggregate_name": aggregate_name,
+                 "repetitions": 3, "threads": 1, "iterations": 3,
+                 "real_time": real_time, "cpu_time": real_time,
+                 "time_unit": "us"}, **fields)
+
+
+@pytest.fixture
+def convert(tmp_path):
+    """
+    Return a function that converts the gbench entries it is given, written
+    to a gbench JSON output file, and returns the {name: (result, unit)} and
+    {name: argNameValuePairs} of the results.
+    """
+    def convert(entries, counterUnits=None):
+        path = tmp_path / "BENCH.json"
+        with open(path, "w") as f:
+            json.dump({"context": {"executable": "./BENCH"},
+                       "benchmarks": entries}, f)
+        results = GBenchToASV.convertGbenchFile(str(path), "repo",
+                                                counterUnits)
+        return ({name: (result, unit) for (name, _, result, unit) in results},
+                {name: params for (name, params, _, _) in results})
+    return convert
+
+
+def test_counters_and_units(convert):
+    (results, params) = convert(
+        [iteration("BM_op<int>/8/manual_time", 10,
+                   bytes_per_second=1e9, items_per_second=5e6,
+                   bandwidth=12.5, num_rows=1000, label="x"),
+         # Older gbench versions did not always write the time unit
+         {"name": "BM_other", "iterations": 5, "real_time": 3}],
+        counterUnits={"bandwidth": "GB/s"})
+
+    assert results == {
+        "repo.BM_op[int]": (10, "us"),
+        "repo.BM_op[int]_cpu_time": (11, "us"),
+        "repo.BM_op[int]_iterations": (100, "count"),
+        "repo.BM_op[int]_throughput": (1e9, "bps"),
+        "repo.BM_op[int]_items_per_second": (5e6, "items/second"),
+        "repo.BM_op[int]_bandwidth": (12.5, "GB/s"),
+        "repo.BM_op[int]_num_rows": (1000, "count"),
+        "repo.BM_other": (3, "ns"),
+        "repo.BM_other_iterations": (5, "count"),
+    }
+    assert params["repo.BM_op[int]"] == [("param0", "8"),
+                                         ("param1", "manual_time")]
+
+
+def test_repetitions_grouped(convert):
+    name = "BM_op/8"
+    (results, params) = convert(
+        [iteration(name, t, repetition_index=i, repetitions=3)
+         for (i, t) in enumerate([10, 12, 14])] +
+        [aggregate(name, "mean", 12), aggregate(name, "median", 12),
+         aggregate(name, "stddev", 2),
+         aggregate(name, "cv", 1 / 6, aggregate_unit="percentage"),
+         # A user-defined statistic
+         aggregate(name, "max", 14)])
+
+    # One benchmark, with the mean of the repetitions and the spread of the
+    # time across them
+    assert set(params) == {"repo.BM_op" + suffix for suffix in
+                           ["", "_cpu_time", "_iterations", "_median",
+                            "_stddev", "_cv", "_max"]}
+    assert results["repo.BM_op"] == (12, "us")
+    assert results["repo.BM_op_cpu_time"] == (13, "us")
+    assert results["repo.BM_op_iterations"] == (100, "count")
+    assert results["repo.BM_op_median"] == (12, "us")
+    assert results["repo.BM_op_stddev"] == (2, "us")
+    assert results["repo.BM_op_cv"] == (pytest.approx(100 / 6), "percent")
+    assert results["repo.BM_op_max"] == (14, "us")
+
+
+def test_aggregates_only(convert):
+    # --benchmark_report_aggregates_only
+    name = "BM_op/8"
+    (results, _) = convert(
+        [aggregate(name, "mean", 12, bytes_per_second=2e9),
+         aggregate(name, "stddev", 2),
+         aggregate(name, "cv", 1 / 6, aggregate_unit="percentage")])
+
+    assert results == {
+        "repo.BM_op": (12, "us"),
+        "repo.BM_op_cpu_time": (12, "us"),
+        "repo.BM_op_throughput": (2e9, "bps"),
+        "repo.BM_op_stddev": (2, "us"),
+        "repo.BM_op_cv": (pytest.approx(100 / 6), "percent"),
+    }
+
+
+def test_older_gbench_aggregates(convert):
+    # No run_type, run_name or aggregate_name, only the name suffix
+    entries = [{"name": "BM_op/8", "iterations": 5, "real_time": t,
+                "cpu_time": t, "time_unit": "ns"} for t in (3, 5)]
+    entries += [{"name": "BM_op/8_mean", "iterations": 2, "real_time": 4,
+                 "cpu_time": 4, "time_unit": "ns"},
+                {"name": "BM_op/8_stddev", "iterations": 2,
+                 "real_time": 2 ** 0.5, "cpu_time": 0, "time_unit": "ns"}]
+    (results, params) = convert(entries)
+
+    assert results["repo.BM_op"] == (4, "ns")
+    assert results["repo.BM_op_stddev"] == (pytest.approx(2 ** 0.5), "ns")
+    assert params["repo.BM_op"] == [("param0", "8")]
+    assert "repo.BM_op_mean" not in results
+
+
+def test_complexity_and_errors(convert):
+    (results, params) = convert(
+        [iteration("BM_sort/1024", 10),
+         iteration("BM_sort/4096", 0, error_occurred=True,
+                   error_message="out of memory"),
+         aggregate("BM_sort", "BigO", 0, name="BM_sort_BigO",
+                   real_coefficient=2.5, cpu_coefficient=2.0, big_o="N",
+                   time_unit="ns"),
+         {"name": "BM_sort_RMS", "run_name": "BM_sort",
+          "run_type": "aggregate", "aggregate_name": "RMS", "rms": 0.02}])
+
+    assert results["repo.BM_sort_BigO"] == (2.5, "ns")
+    assert results["repo.BM_sort_RMS"] == (pytest.approx(2), "percent")
+    # The failed run is skipped rather than reported as 0
+    assert results["repo.BM_sort"] == (10, "us")
+    assert params["repo.BM_sort"] == [("param0", "1024")]
+
+
+@pytest.fixture
+def ingest(tmp_path, monkeypatch):
+    """
+    Return a function that runs GBenchToASV.main() on tmp_path/results, at
+    the commit it is given, with the ASV database, the system info and git
+    replaced by stand-ins recording what was added.
+    """
+    added = []
+    commit = {}
+
+    class RecordingASVDb:
+        def __init__(self, dbDir, repo, branches):
+            pass
+
+        def addResults(self, bInfo, resultList):
+            added.append((bInfo.commitHash,
+                          sorted({r.funcName for r in resultList})))
+
+    def getSysInfo(requirements):
+        # Needs a GPU
+        assert smi.initialized
+        return GBenchToASV.BenchmarkInfo(machineName="machine",
+                                         commitHash=commit["hash"])
+
+    def getCommandOutput(cmd):
+        if cmd == "git rev-parse HEAD":
+            return commit["hash"]
+        assert cmd == "git remote -v"
+        return "origin\thttps://github.com/rapidsai/repo (push)"
+
+    smi = type("smi", (), dict(initialized=False))
+    smi.nvmlInit = lambda: setattr(smi, "initialized", True)
+    monkeypatch.setattr(GBenchToASV, "ASVDb", RecordingASVDb)
+    monkeypatch.setattr(GBenchToASV, "getSysInfo", getSysInfo)
+    monkeypatch.setattr(GBenchToASV, "getCommandOutput", getCommandOutput)
+    monkeypatch.setattr(GBenchToASV, "smi", smi)
+    monkeypatch.setenv("ASV_LABEL", "machine")
+    (tmp_path / "results").mkdir()
+
+    def ingest(commitHash, *args):
+        commit["hash"] = commitHash
+        smi.initialized = False
+        del added[:]
+        GBenchToASV.main(["-d", str(tmp_path / "results"), "-n", "repo",
+                          "-t", str(tmp_path / "asv"), "-b", "main",
+                          *args])
+        return list(added)
+    return ingest
+
+
+def write_results(tmp_path, name, real_time):
+    with open(tmp_path / "results" / f"{name}.json", "w") as f:
+        json.dump({"benchmarks": [iteration(f"BM_{name}", real_time)]}, f)
+
+
+def test_manifest_adds_new_and_changed_files(tmp_path, ingest, capsys):
+    write_results(tmp_path, "a", 1)
+    write_results(tmp_path, "b", 2)
+    assert ingest("commit1") == [("commit1", [
+        "repo.BM_a", "repo.BM_a_cpu_time", "repo.BM_a_iterations",
+        "repo.BM_b", "repo.BM_b_cpu_time", "repo.BM_b_iterations"])]
+
+    # Unchanged files are not added again, even for a later commit
+    assert ingest("commit1") == []
+    assert ingest("commit2") == []
+
+    write_results(tmp_path, "b", 3)
+    write_results(tmp_path, "c", 4)
+    capsys.readouterr()
+    assert ingest("commit2") == [("commit2", [
+        "repo.BM_b", "repo.BM_b_cpu_time", "repo.BM_b_iterations",
+        "repo.BM_c", "repo.BM_c_cpu_time", "repo.BM_c_iterations"])]
+    out = capsys.readouterr().out
+    assert "b.json (changed)" in out
+    assert "c.json (new)" in out
+    assert "2 of 3 files to add" in out
+
+
+def test_manifest_caches_file_hashes(tmp_path, ingest, monkeypatch):
+    write_results(tmp_path, "a", 1)
+    ingest("commit1")
+
+    hashed = []
+    hashFile = GBenchToASV.hashFile
+    monkeypatch.setattr(GBenchToASV, "hashFile",
+                        lambda fileName: hashed.append(fileName) or
+                        hashFile(fileName))
+    assert ingest("commit2") == []
+    assert hashed == []
+
+    # Touched but unchanged, so hashed again but not added
+    path = tmp_path / "results" / "a.json"
+    os.utime(path, ns=(0, 0))
+    assert ingest("commit2") == []
+    assert hashed == [str(path)]
+
+
+def test_manifest_dry_run(tmp_path, ingest, capsys, monkeypatch):
+    write_results(tmp_path, "a", 1)
+
+    # Does not need a GPU or open the ASV database, or record anything
+    smi = GBenchToASV.smi
+    monkeypatch.setattr(GBenchToASV, "smi", None)
+    assert ingest("commit1", "--dry-run") == []
+    assert "Would add" in capsys.readouterr().out
+    assert not (tmp_path / "asv").exists()
+    monkeypatch.setattr(GBenchToASV, "smi", smi)
+
+    assert len(ingest("commit1")) == 1
+    assert ingest("commit1", "--dry-run") == []
+    assert "0 of 1 files to add" in capsys.readouterr().out
@@ -0,0 +1,80 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare the wall time of a gpubenchmark suite run for a fixed time per
+benchmark (the default --benchmark-max-time=1) and with
+--benchmark-target-precision=2%, for a stable benchmark and a noisy one
+(whose calls take call_time +/- a uniformly random 10%).
+
+The stable benchmarks should reach the target precision in a few rounds and
+the noisy ones take longer, but both should take less time than the fixed
+rounds. The mean rounds of the suite's benchmarks, and with adaptive rounds
+the worst precision they reached, are saved in extra_info.
+
+    cd benchmarks && pytest bench_adaptive_rounds.py
+"""
+
+import json
+
+import pytest
+
+pytest_plugins = "pytester"
+
+
+SUITE = """
+import random
+import time
+
+import pytest
+
+
+def work(call_time, noise):
+    time.sleep(call_time * (1 + noise * (random.random() - 0.5)))
+
+
+@pytest.mark.parametrize("i", range(NUM_BENCHMARKS))
+def bench_work(gpubenchmark, i):
+    gpubenchmark(work, CALL_TIME, NOISE)
+"""
+
+
+@pytest.mark.parametrize("noise", [0, 0.2], ids=["stable", "noisy"])
+@pytest.mark.parametrize("rounds", ["fixed", "adaptive"])
+def bench_adaptive_rounds(benchmark, pytester, rounds, noise):
+    num_benchmarks = 3
+    benchmark.group = f"adaptive_rounds[noise={noise}]"
+    pytester.makepyfile(
+        bench_suite=SUITE.replace("CALL_TIME", "0.001")
+                         .replace("NOISE", str(noise))
+                         .replace("NUM_BENCHMARKS", str(num_benchmarks)))
+    args = ["-o", "python_files=bench_*",
+            "-o", "python_functions=bench_*",
+            "--benchmark-gpu-tracker=fake",
+            "--benchmark-gpu-max-rounds=1",
+            "--benchmark-json=suite.json"]
+    if rounds == "adaptive":
+        args.append("--benchmark-target-precision=2%")
+
+    def run_suite():
+        result = pytester.runpytest_subprocess(*args)
+        result.assert_outcomes(passed=num_benchmarks)
+
+    benchmark.pedantic(run_suite, rounds=3)
+
+    with open(pytester.path / "suite.json") as f:
+        suite_benchmarks = json.load(f)["benchmarks"]
+    benchmark.extra_info["suite_rounds"] = \
+        sum(b["stats"]["rounds"] for b in suite_benchmarks) / num_benchmarks
+    benchmark.extra_info["suite_precision"] = \
+        max(b["stats"]["precision"] for b in suite_benchmarks)
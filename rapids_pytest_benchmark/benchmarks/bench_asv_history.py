@@ -0,0 +1,118 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare the time to look up the recent results of every benchmark in a
+session, as --benchmark-asv-regression-gate does, in an ASV database with 100
+to 3000 nightly results files (up to about 8 years) of 500 results each: by
+reading every results file, and with the ASVHistory index once it is up to
+date with all but the latest nightly results file. Also compare the time to
+check whether every benchmark already has a result for the latest night, as
+--benchmark-asv-skip-existing does at collection time.
+
+    cd benchmarks && pytest bench_asv_history.py
+"""
+
+import json
+import os
+
+import pytest
+
+from rapids_pytest_benchmark.asv_history import ASVHistory, paramsKey
+from rapids_pytest_benchmark.asv_history import _iterResults
+
+NUM_BENCHMARKS = 50
+NUM_PARAMS = 10
+NUM_RECENT = 20
+
+
+def _write_nightly(results_dir, night):
+    results = {
+        f"bench_mod.bench_{b}_time": {
+            "result": [night + b + p / 10 for p in range(NUM_PARAMS)],
+            "params": [[str(p) for p in range(NUM_PARAMS)]]}
+        for b in range(NUM_BENCHMARKS)}
+    with open(os.path.join(results_dir, "machine",
+                           f"{night:08x}-python3.10.json"), "w") as f:
+        json.dump({"commit_hash": f"{night:08x}", "date": night,
+                   "results": results, "version": 1}, f)
+
+
+@pytest.fixture(scope="module", params=[100, 1000, 3000],
+                ids=lambda n: f"num_nights={n}")
+def asv_dir(request, tmp_path_factory):
+    asv_dir = tmp_path_factory.mktemp("asv")
+    results_dir = asv_dir / "results"
+    (results_dir / "machine").mkdir(parents=True)
+    with open(results_dir / "benchmarks.json", "w") as f:
+        json.dump({f"bench_mod.bench_{b}_time": {"param_names": ["n"]}
+                   for b in range(NUM_BENCHMARKS)}, f)
+    for night in range(request.param):
+        _write_nightly(results_dir, night)
+    return asv_dir
+
+
+def _rescan_lookup(asv_dir):
+    results_dir = os.path.join(asv_dir, "results", "machine")
+    history = {}
+    with open(os.path.join(asv_dir, "results", "benchmarks.json")) as f:
+        param_names = {name: b["param_names"]
+                       for (name, b) in json.load(f).items()}
+    for file_name in os.listdir(results_dir):
+        with open(os.path.join(results_dir, file_name)) as f:
+            results_file = json.load(f)
+        for (name, key, value) in _iterResults(results_file, param_names):
+            history.setdefault((name, key), []).append(
+                (results_file["date"], value))
+    return [sorted(history[(f"bench_mod.bench_{b}_time",
+                            paramsKey({"n": p}))])[-NUM_RECENT:]
+            for b in range(NUM_BENCHMARKS) for p in range(NUM_PARAMS)]
+
+
+def _indexed_lookup(asv_dir):
+    history = ASVHistory(str(asv_dir))
+    found = [history.get_history("machine", f"bench_mod.bench_{b}_time",
+                                 {"n": p}, limit=NUM_RECENT)
+             for b in range(NUM_BENCHMARKS) for p in range(NUM_PARAMS)]
+    history.close()
+    return found
+
+
+def _indexed_existing(asv_dir):
+    history = ASVHistory(str(asv_dir))
+    latest = "%08x" % (len(os.listdir(asv_dir / "results" / "machine")) - 1)
+    found = [history.has_result("machine", latest,
+                                f"bench_mod.bench_{b}_time", {"n": p})
+             for b in range(NUM_BENCHMARKS) for p in range(NUM_PARAMS)]
+    history.close()
+    return found
+
+
+@pytest.mark.parametrize("lookup",
+                         [_rescan_lookup, _indexed_lookup, _indexed_existing],
+                         ids=["rescan", "indexed", "indexed_existing"])
+def bench_asv_history(benchmark, asv_dir, lookup):
+    benchmark.group = f"asv_history[{asv_dir.name}]"
+    # Index all but the latest night, as left by the previous session
+    latest = os.path.join(asv_dir, "results", "machine",
+                          sorted(os.listdir(asv_dir / "results" /
+                                            "machine"))[-1])
+    os.rename(latest, latest + ".new")
+    ASVHistory(str(asv_dir)).close()
+    os.rename(latest + ".new", latest)
+
+    def setup():
+        # Make the latest night new to the index again
+        os.utime(latest)
+
+    benchmark.pedantic(lookup, args=(asv_dir,), setup=setup, rounds=3)
@@ -0,0 +1,84 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare the time pytest_sessionfinish takes to write a session's results to an
+ASV database for 10 to 10^4 benchmarks, when adding the results of each
+benchmark with its own addResults() call (as it originally did) and when
+adding all of them in one batch.
+
+    cd benchmarks && pytest bench_asv_write.py
+"""
+
+import pytest
+
+from asvdb import ASVDb, BenchmarkInfo, BenchmarkResult
+
+from rapids_pytest_benchmark.asv_output import writeASVResults
+
+
+# The mean, gpu_mem, gpu_leaked_mem, gpu_util and gpu_leaked_allocs results
+# written for every benchmark by default.
+STAT_SUFFIXES = ["time", "gpumem", "gpu_leaked_mem", "gpuutil",
+                 "gpu_leaked_allocs"]
+
+
+def _make_results(num_benchmarks):
+    """
+    Return a list of the results of each of num_benchmarks benchmarks, as
+    pytest_sessionfinish builds them.
+    """
+    results = []
+    for i in range(num_benchmarks):
+        params = [("param", i % 10)]
+        results.append([
+            BenchmarkResult(funcName=f"bench_mod.bench_{i // 10}_{suffix}",
+                            argNameValuePairs=params, result=float(i))
+            for suffix in STAT_SUFFIXES])
+    return results
+
+
+def _per_benchmark_write(asv_dir, b_info, results):
+    db = ASVDb(str(asv_dir), "repo", ["main"])
+    for benchmark_results in results:
+        db.addResults(b_info, benchmark_results)
+
+
+def _batched_write(asv_dir, b_info, results):
+    writeASVResults(str(asv_dir), "repo", "main", b_info,
+                    [r for benchmark_results in results
+                     for r in benchmark_results], [])
+
+
+@pytest.mark.parametrize("num_benchmarks", [10, 100, 1000, 10000],
+                         ids=lambda n: f"num_benchmarks={n}")
+@pytest.mark.parametrize("writer", [_per_benchmark_write, _batched_write],
+                         ids=["per_benchmark", "batched"])
+def bench_asv_write(benchmark, tmp_path_factory, writer, num_benchmarks):
+    if (writer is _per_benchmark_write) and (num_benchmarks > 1000):
+        pytest.skip("takes too long")
+    benchmark.group = f"asv_write[num_benchmarks={num_benchmarks}]"
+    b_info = BenchmarkInfo(machineName="machine", cudaVer="11.8",
+                           osType="ubuntu-22.04", pythonVer="3.10",
+                           commitHash="0123456789abcdef",
+                           commitTime=1700000000, branch="main",
+                           gpuType="FastGPU3", cpuType="x86_64",
+                           arch="x86_64", ram="1000000000",
+                           gpuRam="1000000000")
+    results = _make_results(num_benchmarks)
+
+    def setup():
+        # A new, empty database for each round
+        return ((tmp_path_factory.mktemp("asv"), b_info, results), {})
+
+    benchmark.pedantic(writer, setup=setup, rounds=3)
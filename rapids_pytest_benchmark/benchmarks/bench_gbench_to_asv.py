@@ -0,0 +1,134 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare the time parser/GBenchToASV.py takes to convert a nightly's worth of
+synthetic gbench JSON output (NUM_FILES files of NUM_ENTRIES entries each,
+like libcudf's) to ASV results: the way it used to, loading each file whole
+and parsing each name twice, one file after another, and with
+genBenchmarkResults() streaming each file and parsing each name once, in 1
+and 4 processes. The peak Python memory used to convert one file, which the
+streaming reader keeps from growing with the size of the file, is saved in
+extra_info for the single process runs.
+
+    cd benchmarks && pytest bench_gbench_to_asv.py
+"""
+
+import json
+import os
+import re
+import sys
+import tracemalloc
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..",
+                                "parser"))
+import GBenchToASV  # noqa: E402
+from asvdb import BenchmarkResult  # noqa: E402
+
+NUM_FILES = 40
+NUM_ENTRIES = 5000
+
+
+def _write_gbench_file(path, file_num):
+    benchmarks = []
+    for i in range(NUM_ENTRIES):
+        benchmarks.append({
+            "name": f"BM_op{file_num}_{i % 50}<int32_t>/{i}/{i % 7}/manual_time",
+            "run_name": f"BM_op{file_num}_{i % 50}<int32_t>/{i}/{i % 7}",
+            "run_type": "iteration",
+            "repetitions": 1, "repetition_index": 0, "threads": 1,
+            "iterations": 1000 + i,
+            "real_time": 1234.5 + i, "cpu_time": 1300.25 + i,
+            "time_unit": "ns",
+            "bytes_per_second": 1.5e9 + i,
+        })
+    with open(path, "w") as f:
+        json.dump({"context": {"date": "2023-01-01T00:00:00",
+                               "executable": f"./benchmarks/OP{file_num}_BENCH",
+                               "num_cpus": 64, "caches": []},
+                   "benchmarks": benchmarks}, f, indent=2)
+
+
+@pytest.fixture(scope="module")
+def gbench_files(tmp_path_factory):
+    results_dir = tmp_path_factory.mktemp("gbench")
+    paths = []
+    for file_num in range(NUM_FILES):
+        path = str(results_dir / f"OP{file_num}_BENCH.json")
+        _write_gbench_file(path, file_num)
+        paths.append(path)
+    return paths
+
+
+def _baseline_convert(file_list, repo_name):
+    """
+    The conversion genBenchmarkResults() used to do.
+    """
+    pattern = re.compile(r"([^\/]+)")
+    bench_results = []
+    for file in file_list:
+        with open(file, "r") as in_file:
+            tests = json.load(in_file)["benchmarks"]
+        num_params_dict = {}
+        for each in tests:
+            name_and_params = pattern.findall(each["name"])
+            name = repo_name + "." + name_and_params[0]
+            name = name.replace("<", "[").replace(">", "]").replace("::", "_")
+            num_params_dict[name] = max(num_params_dict.get(name, 0),
+                                        len(name_and_params[1:]))
+        for each in tests:
+            name_and_params = pattern.findall(each["name"])
+            name = repo_name + "." + name_and_params[0]
+            name = name.replace("<", "[").replace(">", "]").replace("::", "_")
+            test_params = name_and_params[1:]
+            param_values = [(f"param{idx}", test_params[idx]
+                             if idx < len(test_params) else "None")
+                            for idx in range(num_params_dict[name])]
+            bench_results.append(BenchmarkResult(
+                funcName=name + "_throughput", argNameValuePairs=param_values,
+                result=each["bytes_per_second"], unit="bps"))
+            bench_results.append(BenchmarkResult(
+                funcName=name, argNameValuePairs=param_values,
+                result=each["real_time"], unit=each["time_unit"]))
+    return bench_results
+
+
+CONVERTERS = dict(baseline=_baseline_convert,
+                  streaming=GBenchToASV.genBenchmarkResults)
+
+# The baseline only kept the time and throughput of each entry, the streaming
+# converter also keeps its cpu_time and iterations
+RESULTS_PER_ENTRY = dict(baseline=2, streaming=4)
+
+
+@pytest.mark.parametrize("converter,num_processes",
+                         [("baseline", 1), ("streaming", 1),
+                          ("streaming", 4)],
+                         ids=["baseline", "streaming-1proc",
+                              "streaming-4procs"])
+def bench_gbench_to_asv(benchmark, gbench_files, converter, num_processes):
+    benchmark.group = "gbench_to_asv"
+    args = (gbench_files, "cudf")
+    if converter == "streaming":
+        args += (num_processes,)
+    results = benchmark.pedantic(CONVERTERS[converter], args=args, rounds=3)
+    assert len(results) == \
+        NUM_FILES * NUM_ENTRIES * RESULTS_PER_ENTRY[converter]
+
+    if num_processes == 1:
+        tracemalloc.start()
+        CONVERTERS[converter](gbench_files[:1], *args[1:])
+        benchmark.extra_info["peak_mem"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
@@ -0,0 +1,85 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare the wall time of a gpubenchmark suite run with
+--benchmark-gpu-mode=separate and --benchmark-gpu-mode=inline, and the
+runtime and GPU memory each mode reports for the same benchmarks.
+
+The suite's benchmarks are slow (call_time seconds per call), so
+pytest-benchmark runs them for its min_rounds. Separate mode then runs each
+one again for its GPU round, which inline mode does not, so inline mode
+should save about one call_time per benchmark per run. The reported mean and
+GPU mem (saved in extra_info) should be the same in both modes, as inline
+mode measures the untimed call made for the return value.
+
+    cd benchmarks && pytest bench_gpu_mode.py
+"""
+
+import json
+
+import pytest
+
+pytest_plugins = "pytester"
+
+
+SUITE = """
+import time
+
+import pytest
+
+from rapids_pytest_benchmark.rmm_resource_analyzer import fake_allocator
+
+
+def work(call_time):
+    tmp = fake_allocator.allocate(1 << 20)
+    time.sleep(call_time)
+    fake_allocator.deallocate(tmp)
+
+
+@pytest.mark.parametrize("call_time", [CALL_TIME] * NUM_BENCHMARKS)
+def bench_work(gpubenchmark, call_time):
+    gpubenchmark(work, call_time)
+"""
+
+
+@pytest.mark.parametrize("call_time", [0.01, 0.1])
+@pytest.mark.parametrize("gpu_mode", ["separate", "inline"])
+def bench_gpu_mode(benchmark, pytester, gpu_mode, call_time):
+    num_benchmarks = 5
+    benchmark.group = f"gpu_mode[call_time={call_time}]"
+    pytester.makepyfile(
+        bench_suite=SUITE.replace("CALL_TIME", str(call_time))
+                         .replace("NUM_BENCHMARKS", str(num_benchmarks)))
+
+    def run_suite():
+        result = pytester.runpytest(
+            "-o", "python_files=bench_*",
+            "-o", "python_functions=bench_*",
+            "--benchmark-gpu-tracker=fake",
+            f"--benchmark-gpu-mode={gpu_mode}",
+            "--benchmark-gpu-max-rounds=1",
+            "--benchmark-max-time=0",
+            "--benchmark-min-rounds=3",
+            "--benchmark-json=suite.json",
+        )
+        result.assert_outcomes(passed=num_benchmarks)
+
+    benchmark.pedantic(run_suite, rounds=3)
+
+    with open(pytester.path / "suite.json") as f:
+        suite_benchmarks = json.load(f)["benchmarks"]
+    benchmark.extra_info["suite_mean"] = \
+        sum(b["stats"]["mean"] for b in suite_benchmarks) / num_benchmarks
+    benchmark.extra_info["suite_gpu_mem"] = \
+        max(b["stats"]["gpu_mem"] for b in suite_benchmarks)
@@ -0,0 +1,98 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare the original row-at-a-time RMM log parser to the batched NumPy parser
+used by RMMLogTracker on synthetic logs of 10^5 to 10^8 rows.
+
+    cd benchmarks && pytest bench_rmm_log_parser.py --max-num-rows=100000000
+"""
+
+import csv
+
+import pytest
+
+from rapids_pytest_benchmark.rmm_resource_analyzer import RMMLogTracker
+
+
+ROWS_PER_BLOCK = 10**5
+
+
+def _make_block():
+    """
+    Return a template for ROWS_PER_BLOCK log rows that allocate a ramp of
+    buffers then free most of them, leaving a small leak behind. "HH:MM:SS"
+    is replaced with a different time for each block so the timestamps
+    increase throughout the log.
+    """
+    lines = []
+    for i in range(ROWS_PER_BLOCK // 2):
+        lines.append(f"1234,HH:MM:SS.{i:06d},allocate,"
+                     f"{hex(0x7f0000000000 + i)},{(i % 4096) + 1},0x0\n")
+    for i in range(ROWS_PER_BLOCK // 2):
+        action = "allocate" if (i % 100) == 0 else "free"
+        lines.append(f"1234,HH:MM:SS.{(ROWS_PER_BLOCK // 2) + i:06d},{action},"
+                     f"{hex(0x7f0000000000 + i)},{(i % 4096) + 1},0x0\n")
+    return "".join(lines)
+
+
+def _reference_parse(log_files):
+    max_gpu_mem_usage = 0
+    current_mem_usage = 0
+    for _, log_file in log_files.items():
+        with open(log_file, mode="r") as csv_file:
+            for row in csv.DictReader(csv_file):
+                row_action = row["Action"]
+                row_size = int(row["Size"])
+                if row_action == "allocate":
+                    current_mem_usage += row_size
+                    if current_mem_usage > max_gpu_mem_usage:
+                        max_gpu_mem_usage = current_mem_usage
+                if row_action == "free":
+                    current_mem_usage -= row_size
+    return (max_gpu_mem_usage, current_mem_usage)
+
+
+def _batched_parse(log_files):
+    tracker = RMMLogTracker()
+    tracker._parse_results(log_files)
+    return (tracker.max_gpu_mem_usage, tracker.leaked_memory)
+
+
+@pytest.fixture(scope="module",
+                params=[10**5, 10**6, 10**7, 10**8],
+                ids=lambda n: f"num_rows={n}")
+def rmm_log(request, tmp_path_factory):
+    num_rows = request.param
+    if num_rows > request.config.getoption("max_num_rows"):
+        pytest.skip(f"{num_rows} rows is larger than --max-num-rows")
+    log_file = tmp_path_factory.mktemp("rmm_log") / "rapids_pytest_benchmarks_log.dev0"
+    block = _make_block()
+    with open(log_file, mode="w") as f:
+        f.write("Thread,Time,Action,Pointer,Size,Stream\n")
+        for i in range(num_rows // ROWS_PER_BLOCK):
+            f.write(block.replace("HH:MM:SS", "%02d:%02d:%02d"
+                                  % (i // 3600, (i // 60) % 60, i % 60)))
+    yield (num_rows, {0: str(log_file)})
+    log_file.unlink()
+
+
+@pytest.mark.parametrize("parser", [_reference_parse, _batched_parse],
+                         ids=["row_at_a_time", "batched"])
+def bench_parse_rmm_log(benchmark, rmm_log, parser):
+    (num_rows, log_files) = rmm_log
+    benchmark.group = f"parse_rmm_log[num_rows={num_rows}]"
+    rounds = 1 if num_rows >= 10**7 else 3
+    result = benchmark.pedantic(parser, args=(log_files,), rounds=rounds)
+    if num_rows <= 10**6:
+        assert result == _reference_parse(log_files)
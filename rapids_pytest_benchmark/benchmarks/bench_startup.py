@@ -0,0 +1,65 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measure what the plugin adds to the startup of a pytest run that uses no
+gpubenchmark fixtures: the wall time of running a single plain test with and
+without the plugin (-p no:rapids_benchmark), and the cumulative import time
+of rapids_pytest_benchmark.plugin reported by "python -X importtime" (saved
+in extra_info). The plugin is loaded by every pytest run through its pytest11
+entry point, so neither should include importing rmm, pynvml, asvdb, psutil
+or numpy.
+
+    cd benchmarks && pytest bench_startup.py
+"""
+
+import re
+import subprocess
+import sys
+
+import pytest
+
+PLAIN_TEST = """
+def test_plain():
+    pass
+"""
+
+
+def _plugin_import_time():
+    """
+    Return the cumulative time in microseconds "python -X importtime" reports
+    for importing rapids_pytest_benchmark.plugin in a new interpreter.
+    """
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         "import rapids_pytest_benchmark.plugin"],
+        check=True, capture_output=True, text=True).stderr
+    match = re.search(r"\|\s*(\d+) \| rapids_pytest_benchmark\.plugin$",
+                      output, re.MULTILINE)
+    return int(match.group(1))
+
+
+@pytest.mark.parametrize("plugin", ["enabled", "disabled"])
+def bench_startup(benchmark, tmp_path, plugin):
+    benchmark.group = "startup"
+    (tmp_path / "test_plain.py").write_text(PLAIN_TEST)
+    args = [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider",
+            str(tmp_path / "test_plain.py")]
+    if plugin == "disabled":
+        args += ["-p", "no:rapids_benchmark"]
+
+    benchmark.pedantic(subprocess.run, args=(args,),
+                       kwargs=dict(check=True, capture_output=True), rounds=5)
+
+    if plugin == "enabled":
+        benchmark.extra_info["plugin_import_us"] = _plugin_import_time()
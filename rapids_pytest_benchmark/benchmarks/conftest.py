@@ -0,0 +1,33 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmarks for rapids-pytest-benchmark itself. These use the standard
+pytest-benchmark "benchmark" fixture and do not need a GPU.
+"""
+
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--max-num-rows", default=10**7, type=int,
+        help="Skip benchmark params with synthetic inputs larger than this "
+        "many rows/entries. The largest inputs take several GB of disk and "
+        "many minutes to run."
+    )
+
+
+@pytest.fixture
+def max_num_rows(request):
+    return request.config.getoption("max_num_rows")
@@ -0,0 +1,115 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The precision of the runtime stats of a benchmark as rounds are added, used
+to stop running rounds once the stat is known well enough (see
+--benchmark-target-precision). The precision is the half-width of the 95%
+confidence interval of the stat relative to the stat, ie. 0.02 means the stat
+is known to within +/-2%.
+"""
+
+import math
+
+# The 97.5th percentile of Student's t-distribution for 1 to 30 degrees of
+# freedom, for the 95% confidence interval of the mean of few rounds.
+_T_975 = (12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262,
+          2.228, 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101,
+          2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052,
+          2.048, 2.045, 2.042)
+_Z_975 = 1.960
+
+# The median's precision is checked when the number of rounds has grown by
+# this factor since it was last checked, since that requires sorting them.
+_MEDIAN_CHECK_GROWTH = 1.1
+
+
+class MeanPrecision:
+    """
+    Tracks the precision of the mean of the rounds added, from the running
+    mean and variance (Welford's algorithm), so adding a round is O(1).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (value - self._mean)
+
+    def should_check(self):
+        """
+        Return True if precision should be checked for the rounds added so
+        far, which is always as it is cheap to compute.
+        """
+        return True
+
+    @property
+    def precision(self):
+        if (self.count < 2) or (self._mean <= 0):
+            return math.inf
+        df = self.count - 1
+        t = _T_975[df - 1] if df <= len(_T_975) else _Z_975
+        stderr = math.sqrt(self._m2 / df / self.count)
+        return t * stderr / self._mean
+
+
+class MedianPrecision:
+    """
+    Tracks the precision of the median of the rounds added, from the
+    distribution-free confidence interval between the order statistics
+    around it (with the normal approximation to the binomial for their
+    ranks).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._values = []
+        self._next_check = 2
+
+    def add(self, value):
+        self.count += 1
+        self._values.append(value)
+
+    def should_check(self):
+        """
+        Return True if precision should be checked for the rounds added so
+        far: each time their number has grown by _MEDIAN_CHECK_GROWTH.
+        """
+        if self.count < self._next_check:
+            return False
+        self._next_check = max(int(self.count * _MEDIAN_CHECK_GROWTH),
+                               self.count + 1)
+        return True
+
+    @property
+    def precision(self):
+        if self.count < 2:
+            return math.inf
+        self._values.sort()
+        n = self.count
+        offset = _Z_975 * math.sqrt(n) / 2
+        low = max(int(math.floor(n / 2 - offset)), 0)
+        high = min(int(math.ceil(n / 2 + offset)), n - 1)
+        median = self._values[n // 2] if n % 2 else \
+            (self._values[n // 2 - 1] + self._values[n // 2]) / 2
+        if median <= 0:
+            return math.inf
+        return (self._values[high] - self._values[low]) / 2 / median
+
+
+PRECISION_TRACKERS = {"mean": MeanPrecision, "median": MedianPrecision}
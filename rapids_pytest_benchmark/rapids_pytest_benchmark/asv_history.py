@@ -0,0 +1,246 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Looks up past results in an ASV "database" directory. Reading every results
+file in a directory with years of nightly results for every lookup is too
+slow, so the results are kept in an SQLite index in the directory, which is
+brought up to date by parsing only the results files that are new or changed
+since it was last used.
+"""
+
+import itertools
+import json
+import os
+import sqlite3
+
+ASV_INDEX_FILE_NAME = ".rapids_pytest_benchmark_index.sqlite"
+
+# Bumped when the index schema or the parsing of the results files changes,
+# to rebuild existing indexes.
+INDEX_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER,
+    size INTEGER
+);
+CREATE TABLE IF NOT EXISTS results (
+    path TEXT,
+    machine TEXT,
+    commit_hash TEXT,
+    date INTEGER,
+    name TEXT,
+    params TEXT,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS results_by_benchmark
+    ON results (machine, name, params, date);
+CREATE INDEX IF NOT EXISTS results_by_commit
+    ON results (commit_hash, machine, name, params);
+CREATE INDEX IF NOT EXISTS results_by_path ON results (path);
+"""
+
+
+def _normalizeParamValue(value):
+    """
+    Return the string used to compare a param value. ASV results files store
+    param values as strings, which may be the repr() of the value.
+    """
+    value = str(value)
+    if (len(value) >= 2) and (value[0] == value[-1]) and (value[0] in "'\""):
+        return value[1:-1]
+    return value
+
+
+def paramsKey(params):
+    """
+    Return the key identifying a combination of params, given as a dict or
+    list of (name, value) pairs, in the index.
+    """
+    items = params.items() if isinstance(params, dict) else params
+    return json.dumps(sorted((str(name), _normalizeParamValue(value))
+                             for (name, value) in items))
+
+
+def _readJson(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _iterResults(resultsFile, paramNames):
+    """
+    Yield (name, paramsKey, value) for each result in the parsed ASV results
+    file resultsFile. paramNames is {benchmark name: [param names]}, from the
+    benchmarks.json file. Results are lists of values for each combination
+    of the params lists, in itertools.product() order, or a single value if
+    the benchmark has no params.
+    """
+    columns = resultsFile.get("result_columns")
+    for (name, entry) in (resultsFile.get("results") or {}).items():
+        # ASV results format version 1 uses a dict per benchmark, version 2 a
+        # list of the result_columns.
+        if columns is not None:
+            entry = dict(zip(columns, entry))
+        if isinstance(entry, dict):
+            (result, params) = (entry.get("result"), entry.get("params") or [])
+        else:
+            (result, params) = (entry, [])
+        if not params:
+            result = result[0] if isinstance(result, list) and result \
+                else result
+            if isinstance(result, (int, float)):
+                yield (name, paramsKey([]), result)
+            continue
+        names = paramNames.get(name) or \
+            ["param%d" % (i + 1) for i in range(len(params))]
+        for (values, value) in zip(itertools.product(*params), result or []):
+            if isinstance(value, (int, float)):
+                yield (name, paramsKey(zip(names, values)), value)
+
+
+def _initIndex(conn):
+    """
+    Create the index tables in the SQLite database conn, dropping any made by
+    another INDEX_VERSION.
+    """
+    if conn.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+        conn.executescript("DROP TABLE IF EXISTS files;"
+                           "DROP TABLE IF EXISTS results;")
+    conn.executescript(_SCHEMA)
+    conn.execute("PRAGMA user_version = %d" % INDEX_VERSION)
+
+
+class ASVHistory:
+    """
+    The results in the ASV database in asv_dir, indexed by machine, benchmark
+    name, params and commit. The index is updated when the object is created,
+    and kept in asv_dir (or in memory if it cannot be written there).
+    """
+
+    def __init__(self, asv_dir):
+        self.asv_dir = asv_dir
+        self.results_dir = os.path.join(asv_dir, "results")
+        self._conn = self._connect(os.path.join(asv_dir, ASV_INDEX_FILE_NAME))
+        self.sync()
+
+    @staticmethod
+    def _connect(index_file):
+        try:
+            conn = sqlite3.connect(index_file, timeout=60,
+                                   isolation_level=None)
+            _initIndex(conn)
+        except sqlite3.Error:
+            conn = sqlite3.connect(":memory:", isolation_level=None)
+            _initIndex(conn)
+        return conn
+
+    def _list_results_files(self):
+        """
+        Return {path relative to asv_dir: (mtime_ns, size)} for each results
+        file in the database.
+        """
+        files = {}
+        if not os.path.isdir(self.results_dir):
+            return files
+        for machineEntry in os.scandir(self.results_dir):
+            if not machineEntry.is_dir():
+                continue
+            for entry in os.scandir(machineEntry.path):
+                if entry.name.endswith(".json") and \
+                   (entry.name != "machine.json") and entry.is_file():
+                    st = entry.stat()
+                    files[os.path.relpath(entry.path, self.asv_dir)] = \
+                        (st.st_mtime_ns, st.st_size)
+        return files
+
+    def sync(self):
+        """
+        Update the index with the results files added, changed or removed
+        since it was last updated.
+        """
+        files = self._list_results_files()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            indexed = {path: (mtime, size) for (path, mtime, size) in
+                       self._conn.execute("SELECT * FROM files")}
+            changed = [path for (path, stat) in files.items()
+                       if indexed.get(path) != stat]
+            removed = [path for path in indexed if path not in files]
+            paramNames = {}
+            if changed:
+                benchmarks = _readJson(
+                    os.path.join(self.results_dir, "benchmarks.json")) or {}
+                paramNames = {name: b.get("param_names")
+                              for (name, b) in benchmarks.items()
+                              if isinstance(b, dict)}
+            for path in changed + removed:
+                self._conn.execute("DELETE FROM results WHERE path = ?",
+                                   (path,))
+                self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+            for path in changed:
+                self._index_file(path, files[path], paramNames)
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _index_file(self, path, stat, paramNames):
+        resultsFile = _readJson(os.path.join(self.asv_dir, path))
+        if isinstance(resultsFile, dict) and ("commit_hash" in resultsFile):
+            machine = os.path.basename(os.path.dirname(path))
+            commitHash = resultsFile["commit_hash"]
+            date = resultsFile.get("date") or 0
+            self._conn.executemany(
+                "INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((path, machine, commitHash, date, name, key, value)
+                 for (name, key, value) in _iterResults(resultsFile,
+                                                        paramNames)))
+        # Files that are not results files are recorded too, so they are not
+        # read again until they change.
+        self._conn.execute("INSERT INTO files VALUES (?, ?, ?)",
+                           (path, stat[0], stat[1]))
+
+    def get_history(self, machine, name, params, exclude_commit=None,
+                    limit=None):
+        """
+        Return [(commit_hash, value)] for the results of the benchmark name
+        with params (see paramsKey()) on machine, most recent commit first.
+        Results for exclude_commit are left out.
+        """
+        query = "SELECT commit_hash, value FROM results " \
+                "WHERE machine = ? AND name = ? AND params = ? " \
+                "AND commit_hash != ? ORDER BY date DESC"
+        args = [machine, name, paramsKey(params), exclude_commit or ""]
+        if limit is not None:
+            query += " LIMIT ?"
+            args.append(limit)
+        return self._conn.execute(query, args).fetchall()
+
+    def has_result(self, machine, commit_hash, name, params):
+        """
+        Return True if there is a result of the benchmark name with params
+        (see paramsKey()) for commit_hash on machine.
+        """
+        return self._conn.execute(
+            "SELECT 1 FROM results WHERE commit_hash = ? AND machine = ? "
+            "AND name = ? AND params = ? LIMIT 1",
+            (commit_hash, machine, name, paramsKey(params))).fetchone() \
+            is not None
+
+    def close(self):
+        self._conn.close()
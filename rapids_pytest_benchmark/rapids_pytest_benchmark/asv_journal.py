@@ -0,0 +1,153 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Journal of the ASV results of a session's benchmarks, written with
+--benchmark-asv-journal as each benchmark finishes, so the results taken so
+far are kept if the session crashes, is killed or times out, and its progress
+can be followed with "tail -f".
+
+The journal is a JSON lines file with a record per benchmark, appended to and
+fsync'd under an exclusive lock, so sessions (and --benchmark-gpu-workers
+workers) can share one. A record is cut short only if the session died while
+writing it, in which case it is skipped when the journal is read.
+
+Journals are added to an ASV database with:
+
+    python -m rapids_pytest_benchmark.asv_journal ASV_DB_DIR JOURNAL [...]
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import sys
+
+from .asv_output import makeASVBenchmarkResults, writeASVResults
+
+JOURNAL_VERSION = 1
+
+
+def _toJson(value):
+    """
+    Return value, which json cannot serialize, as a value it can: numpy
+    scalars as the Python number, anything else (eg. a param value) as its
+    str().
+    """
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def appendRecords(path, records):
+    """
+    Append records (JSON-serializable dicts) to the journal at path and wait
+    for them to be written to disk.
+    """
+    data = "".join(json.dumps(record, default=_toJson) + "\n"
+                   for record in records).encode()
+    created = not os.path.exists(path)
+    fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        # Start on a new line if the last record written was cut short
+        size = os.fstat(fd).st_size
+        if size and (os.pread(fd, 1, size - 1) != b"\n"):
+            data = b"\n" + data
+        while data:
+            data = data[os.write(fd, data):]
+        os.fsync(fd)
+    finally:
+        # Also releases the lock
+        os.close(fd)
+    if created:
+        # Make sure the new file itself is on disk too
+        dirFd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+        try:
+            os.fsync(dirFd)
+        finally:
+            os.close(dirFd)
+
+
+def readRecords(path):
+    """
+    Yield the records in the journal at path, skipping any cut short.
+    """
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and \
+               (record.get("version") == JOURNAL_VERSION):
+                yield record
+
+
+def journalsToASV(asvOutputDir, paths):
+    """
+    Add the results in the journals at paths to the ASV database in
+    asvOutputDir, in a single write per machine and commit. If a benchmark
+    was journaled more than once for a machine and commit (eg. by a session
+    resumed after it crashed), its last record is used. Return the number of
+    benchmarks added.
+    """
+    from asvdb import BenchmarkInfo
+
+    # {(info, repo): {benchmark: record}}
+    sessions = {}
+    for path in paths:
+        for record in readRecords(path):
+            key = (json.dumps(record["info"], sort_keys=True),
+                   record["repo"])
+            sessions.setdefault(key, {})[record["benchmark"]] = record
+
+    for ((info, repo), records) in sessions.items():
+        info = json.loads(info)
+        resultList = []
+        gpuTimelines = []
+        roundTimings = []
+        for record in records.values():
+            params = dict(record["params"])
+            resultList += makeASVBenchmarkResults(params, record["results"])
+            if record.get("gpu_timeline") is not None:
+                gpuTimelines.append((record["name"], params,
+                                     record["gpu_timeline"]))
+            if record.get("round_timings") is not None:
+                roundTimings.append((record["name"], params,
+                                     record["round_timings"]))
+        writeASVResults(asvOutputDir, repo, info["branch"],
+                        BenchmarkInfo(**info), resultList, gpuTimelines,
+                        roundTimings)
+    return sum(len(records) for records in sessions.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m rapids_pytest_benchmark.asv_journal",
+        description="Add the results in journals written with "
+        "--benchmark-asv-journal to an ASV database.")
+    parser.add_argument("asv_output_dir", metavar="ASV_DB_DIR",
+                        help='ASV "database" directory to update.')
+    parser.add_argument("journals", metavar="JOURNAL", nargs="+",
+                        help="Journal file to add the results of.")
+    args = parser.parse_args(argv)
+
+    numBenchmarks = journalsToASV(args.asv_output_dir, args.journals)
+    print("Added the results of %d benchmarks to %s"
+          % (numBenchmarks, args.asv_output_dir))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import ctypes
+import json
+import os
+import platform
+import re
+
+# The metadata that does not change until the machine is rebooted or its GPU
+# driver is changed, which is kept in the machine profile.
+MACHINE_PROFILE_FIELDS = ("osType", "cudaVer", "gpuType", "cpuType", "ram",
+                          "gpuRam")
+
+
+def _readBootId():
+    """
+    Return the ID of the current boot of this machine, or None if not
+    available (requires Linux).
+    """
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _readDriverVersion():
+    """
+    Return the version of the loaded NVIDIA kernel driver, or None if there is
+    none, ie. this machine has no GPU.
+    """
+    try:
+        with open("/proc/driver/nvidia/version") as f:
+            match = re.search(r"Kernel Module\s+([\d.]+)", f.read())
+    except OSError:
+        return None
+    return match.group(1) if match else "unknown"
+
+
+def _getOSName():
+    """
+    Return "<ID>-<VERSION_ID>" from /etc/os-release, eg. "ubuntu-22.04", or
+    None if not available.
+    """
+    osRelease = {}
+    try:
+        with open("/etc/os-release") as f:
+            for line in f:
+                (name, _, value) = line.strip().partition("=")
+                osRelease[name] = value.strip("\"'")
+    except OSError:
+        return None
+    if "ID" not in osRelease:
+        return None
+    return "%s-%s" % (osRelease["ID"], osRelease.get("VERSION_ID", ""))
+
+
+def _getCudaVersion():
+    """
+    Get the CUDA version from the CUDA DLL/.so if possible, otherwise return
+    None. (NOTE: is this better than screen scraping nvidia-smi?)
+    """
+    try :
+        lib = ctypes.CDLL("libcudart.so")
+        function = getattr(lib,"cudaRuntimeGetVersion")
+        result = ctypes.c_int()
+        resultPtr = ctypes.pointer(result)
+        function(resultPtr)
+        # The version is returned as (1000 major + 10 minor). For example, CUDA
+        # 9.2 would be represented by 9020
+        major = int(result.value / 1000)
+        minor = int((result.value - (major * 1000)) / 10)
+        return f"{major}.{minor}"
+    except (OSError, AttributeError):
+        return None
+
+
+def defaultProfileFile():
+    """
+    Return the path of the machine profile: machine_profile.json in the
+    rapids_pytest_benchmark directory of the user's cache dir.
+    """
+    cacheDir = os.environ.get("XDG_CACHE_HOME") or \
+        os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cacheDir, "rapids_pytest_benchmark",
+                        "machine_profile.json")
+
+
+class ASVMetadata:
+    """
+    The metadata for the ASV results of a session, resolved lazily: each field
+    is looked up when first used, in the metadata provided with
+    --benchmark-asv-metadata, then, for the MACHINE_PROFILE_FIELDS, in the
+    machine profile, and only probed from the machine, git or the GPU if not
+    found. Probed profile fields are added to the profile file, which is only
+    used while the boot ID and driver version it was made with are current.
+
+    On machines without a GPU driver, the GPU fields and the CUDA version are
+    "unknown" and NVML and the CUDA runtime are never loaded.
+    """
+
+    def __init__(self, provided, gpu_device=0, profile_file=None):
+        self.provided = provided
+        self.gpu_device = gpu_device
+        self.profile_file = profile_file or defaultProfileFile()
+        self._profile = None
+        self._driver_version = None
+        self._commit_info = None
+        self._repo_info = None
+        self._gpu_handle = None
+        self._probes = dict(
+            machineName=lambda: platform.uname().machine,
+            cpuType=lambda: platform.uname().processor,
+            arch=lambda: platform.uname().machine,
+            pythonVer=lambda: ".".join(platform.python_version_tuple()[:-1]),
+            cudaVer=lambda: self._if_gpu(
+                lambda: _getCudaVersion() or "unknown"),
+            osType=lambda: _getOSName() or "unknown",
+            gpuType=lambda: self._if_gpu(self._probe_gpu_type),
+            ram=self._probe_ram,
+            gpuRam=lambda: self._if_gpu(self._probe_gpu_ram, "0"),
+            commitHash=lambda: self._get_commit_info()[0],
+            commitTime=lambda: self._get_commit_info()[1],
+            commitRepo=lambda: self._get_repo_info()[0],
+            commitBranch=lambda: self._get_repo_info()[1],
+            requirements=lambda: "{}",
+        )
+
+    def __getitem__(self, field):
+        if field in self.provided:
+            return self.provided[field]
+        if field not in MACHINE_PROFILE_FIELDS:
+            return self._probes[field]()
+        profile = self._get_profile()
+        if field not in profile["fields"]:
+            profile["fields"][field] = self._probes[field]()
+            self._save_profile()
+        return profile["fields"][field]
+
+    def _get_profile(self):
+        if self._profile is not None:
+            return self._profile
+        self._driver_version = _readDriverVersion()
+        key = "%s:%s:%s" % (_readBootId(), self._driver_version,
+                            self.gpu_device)
+        self._profile = {"key": key, "fields": {}}
+        # Without a boot ID there is no telling if the profile is current
+        if key.startswith("None:"):
+            self._profile["key"] = None
+            return self._profile
+        try:
+            with open(self.profile_file) as f:
+                profile = json.load(f)
+            if profile.get("key") == key:
+                self._profile = profile
+        except (OSError, ValueError):
+            pass
+        return self._profile
+
+    def _save_profile(self):
+        if self._profile["key"] is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.profile_file), exist_ok=True)
+            # GPU workers can resolve metadata at the same time, so each
+            # process writes its own temp file
+            tmpFile = "%s.%d.tmp" % (self.profile_file, os.getpid())
+            with open(tmpFile, "w") as f:
+                json.dump(self._profile, f)
+            os.replace(tmpFile, self.profile_file)
+        except OSError:
+            pass
+
+    def _if_gpu(self, probe, default="unknown"):
+        self._get_profile()
+        return default if self._driver_version is None else probe()
+
+    def _get_gpu_handle(self):
+        from pynvml import smi
+        if self._gpu_handle is None:
+            smi.nvmlInit()
+            self._gpu_handle = smi.nvmlDeviceGetHandleByIndex(self.gpu_device)
+        return self._gpu_handle
+
+    def _probe_gpu_type(self):
+        from pynvml import smi
+        return smi.nvmlDeviceGetName(self._get_gpu_handle()).decode()
+
+    def _probe_gpu_ram(self):
+        from pynvml import smi
+        return "%d" % smi.nvmlDeviceGetMemoryInfo(self._get_gpu_handle()).total
+
+    def _probe_ram(self):
+        import psutil
+        return "%d" % psutil.virtual_memory().total
+
+    def _get_commit_info(self):
+        import asvdb.utils as asvdbUtils
+        if self._commit_info is None:
+            self._commit_info = asvdbUtils.getCommitInfo()
+        return self._commit_info
+
+    def _get_repo_info(self):
+        import asvdb.utils as asvdbUtils
+        if self._repo_info is None:
+            self._repo_info = asvdbUtils.getRepoInfo()
+        return self._repo_info
@@ -0,0 +1,110 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Writing results to an ASV "database" directory, shared by the plugin, which
+writes the results of a session, and asv_journal, which writes those of
+journals.
+"""
+
+import contextlib
+import fcntl
+import json
+import os
+
+# Locked by sessions while they update the ASV output dir
+ASV_LOCK_FILE_NAME = ".rapids_pytest_benchmark.lock"
+
+
+def makeASVBenchmarkResults(params, results):
+    """
+    Return an asvdb BenchmarkResult for each (name, result, unit) in results,
+    with params.
+    """
+    from asvdb import BenchmarkResult
+    bResults = []
+    for (name, result, unit) in results:
+        bResult = BenchmarkResult(funcName=name,
+                                  argNameValuePairs=list(params.items()),
+                                  result=result)
+        bResult.unit = unit
+        bResults.append(bResult)
+    return bResults
+
+
+@contextlib.contextmanager
+def lockASVOutputDir(asvOutputDir):
+    """
+    Hold an exclusive lock on asvOutputDir, so sessions sharing it update it
+    one at a time rather than overwriting each other's changes.
+    """
+    os.makedirs(asvOutputDir, exist_ok=True)
+    with open(os.path.join(asvOutputDir, ASV_LOCK_FILE_NAME), "w") as lockFile:
+        fcntl.flock(lockFile, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lockFile, fcntl.LOCK_UN)
+
+
+def writeASVResults(asvOutputDir, commitRepo, commitBranch, bInfo,
+                     resultList, gpuTimelines, roundTimings=None):
+    """
+    Add all the results of a session to the ASV database in asvOutputDir in a
+    single addResults() call, since each call rewrites the database files,
+    and write the GPU timelines and round timings, if any, while holding the
+    lock on asvOutputDir.
+    """
+    with lockASVOutputDir(asvOutputDir):
+        from asvdb import ASVDb
+        db = ASVDb(asvOutputDir, commitRepo, [commitBranch])
+        if resultList:
+            db.addResults(bInfo, resultList)
+        if gpuTimelines:
+            writeBenchmarkDataFile(asvOutputDir, "gpu_timelines", "timeline",
+                                    bInfo, gpuTimelines)
+        if roundTimings:
+            writeBenchmarkDataFile(asvOutputDir, "round_timings", "timings",
+                                    bInfo, roundTimings)
+
+
+def writeBenchmarkDataFile(asvOutputDir, dirName, dataName, bInfo,
+                            benchData):
+    """
+    Write the (benchName, params, data) of this session's benchData to
+    <asvOutputDir>/<dirName>/<machineName>/<commitHash>.json, which has the
+    form {benchName: [{"params": {...}, <dataName>: data}]}, eg. the GPU
+    memory timelines as "timeline": [[sec, bytes], ...]. Data already in the
+    file for other benchmarks/params is kept, so multiple sessions for the
+    same commit can add to it. The file is replaced atomically, so it is
+    never seen partially written.
+    """
+    dataDir = os.path.join(asvOutputDir, dirName, bInfo.machineName)
+    os.makedirs(dataDir, exist_ok=True)
+    dataFile = os.path.join(dataDir, "%s.json" % bInfo.commitHash)
+
+    allData = {}
+    if os.path.exists(dataFile):
+        with open(dataFile) as f:
+            allData = json.load(f)
+
+    for (benchName, params, data) in benchData:
+        params = {name: str(value) for (name, value) in params.items()}
+        entries = [e for e in allData.get(benchName, [])
+                   if e["params"] != params]
+        entries.append({"params": params, dataName: data})
+        allData[benchName] = entries
+
+    with open(dataFile + ".tmp", "w") as f:
+        json.dump(allData, f)
+    os.replace(dataFile + ".tmp", dataFile)
@@ -0,0 +1,220 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import abc
+import os
+import threading
+import warnings
+
+
+class DeviceBackend(abc.ABC):
+    """
+    Base class for the backends DeviceSampler uses to read device-level
+    metrics. open() is called once before sampling starts, sample() returns
+    {device: (utilization percent, memory used in bytes)} for the opened
+    devices, and close() is called once sampling is done. open() raises
+    RuntimeError if the devices cannot be read. A backend can be opened and
+    closed again for each sampling run (eg. each GPU measurement round), and
+    shutdown() releases anything it kept open across them once it is no
+    longer used.
+    """
+    name = None
+
+    @abc.abstractmethod
+    def open(self, devices):
+        pass
+
+    @abc.abstractmethod
+    def sample(self):
+        pass
+
+    def close(self):
+        pass
+
+    def shutdown(self):
+        pass
+
+
+class NVMLDeviceBackend(DeviceBackend):
+    """
+    Reads utilization and memory used through NVML. Device numbers are CUDA
+    device numbers: NVML ignores CUDA_VISIBLE_DEVICES, so if it is set they
+    are translated to the NVML device (by index or UUID) it lists.
+
+    NVML is initialized by the first open(), and it and the device handles
+    are kept until shutdown(), so opening the backend again is cheap.
+    """
+    name = "nvml"
+
+    def __init__(self):
+        self._initialized = False
+        # {device: handle} of every device opened so far
+        self._handles = {}
+        self._devices = []
+
+    def open(self, devices):
+        from pynvml import smi
+        try:
+            if not self._initialized:
+                smi.nvmlInit()
+                self._initialized = True
+            for device in devices:
+                if device not in self._handles:
+                    self._handles[device] = self._get_handle(device)
+        except smi.NVMLError as e:
+            raise RuntimeError(f"could not open NVML devices {devices}: {e}") \
+                from e
+        self._devices = list(devices)
+
+    def _get_handle(self, device):
+        from pynvml import smi
+        visible = os.environ.get("CUDA_VISIBLE_DEVICES")
+        if visible is None:
+            return smi.nvmlDeviceGetHandleByIndex(device)
+        visible = [d.strip() for d in visible.split(",")]
+        if device >= len(visible):
+            raise RuntimeError(f"device {device} is not in "
+                               f"CUDA_VISIBLE_DEVICES={','.join(visible)}")
+        if visible[device].isdecimal():
+            return smi.nvmlDeviceGetHandleByIndex(int(visible[device]))
+        return smi.nvmlDeviceGetHandleByUUID(visible[device].encode())
+
+    def sample(self):
+        from pynvml import smi
+        handles = [(device, self._handles[device]) for device in self._devices]
+        return {device: (smi.nvmlDeviceGetUtilizationRates(handle).gpu,
+                         smi.nvmlDeviceGetMemoryInfo(handle).used)
+                for (device, handle) in handles}
+
+    def close(self):
+        self._devices = []
+
+    def shutdown(self):
+        from pynvml import smi
+        self._handles = {}
+        self._devices = []
+        if self._initialized:
+            smi.nvmlShutdown()
+            self._initialized = False
+
+
+class FakeDeviceBackend(DeviceBackend):
+    """
+    Deterministic stand-in for NVML. Each sample returns the values last set
+    with set_utilization() and set_memory_used() (0 if never set), so code
+    under test can drive what the sampler sees on machines without a GPU.
+    """
+    name = "fake"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._devices = []
+        self._utilization = {}
+        self._memory_used = {}
+
+    def set_utilization(self, percent, device=0):
+        with self._lock:
+            self._utilization[device] = percent
+
+    def set_memory_used(self, nbytes, device=0):
+        with self._lock:
+            self._memory_used[device] = nbytes
+
+    def open(self, devices):
+        self._devices = list(devices)
+
+    def sample(self):
+        with self._lock:
+            return {device: (self._utilization.get(device, 0),
+                             self._memory_used.get(device, 0))
+                    for device in self._devices}
+
+
+# The backend used by DeviceSampler for the "fake" backend name.
+fake_device_backend = FakeDeviceBackend()
+
+DEVICE_BACKENDS = {
+    NVMLDeviceBackend.name: NVMLDeviceBackend,
+    FakeDeviceBackend.name: lambda: fake_device_backend,
+}
+
+
+class DeviceSampler(threading.Thread):
+    """
+    Background thread that samples the utilization and memory used of a set
+    of devices every interval seconds, from start() until stop(). A sample is
+    also taken when starting and when stopping, so short runs get at least
+    two. The results are the max and mean utilization and the max memory
+    used across all samples of all devices, or -1 if nothing was sampled (eg.
+    because the backend could not be opened, which is reported as a warning).
+    """
+
+    def __init__(self, backend, devices, interval=0.05):
+        super().__init__(name="DeviceSampler", daemon=True)
+        self.backend = backend
+        self.devices = devices
+        self.interval = interval
+        self.max_utilization = -1
+        self.mean_utilization = -1
+        self.max_memory_used = -1
+        self._utilization_sum = 0
+        self._num_samples = 0
+        self._opened = False
+        self._stop_event = threading.Event()
+
+    def start(self):
+        try:
+            self.backend.open(self.devices)
+        except RuntimeError as e:
+            warnings.warn(f"GPU utilization will not be measured: {e}",
+                          RuntimeWarning)
+            return
+        self._opened = True
+        self.sample()
+        super().start()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        if not self._opened:
+            return
+        self._stop_event.set()
+        self.join()
+        self.sample()
+        self.backend.close()
+        self._opened = False
+
+    def sample(self):
+        """
+        Take one sample of all devices and fold it into the results.
+        """
+        for (utilization, memory_used) in self.backend.sample().values():
+            self.max_utilization = max(self.max_utilization, utilization)
+            self.max_memory_used = max(self.max_memory_used, memory_used)
+            self._utilization_sum += utilization
+            self._num_samples += 1
+        if self._num_samples:
+            self.mean_utilization = self._utilization_sum / self._num_samples
+
+
+def makeDeviceSampler(backend, devices, interval=0.05):
+    """
+    Return a new DeviceSampler for devices using backend, a DeviceBackend or
+    the name of one registered in DEVICE_BACKENDS, in which case a new
+    instance of it is used.
+    """
+    if isinstance(backend, str):
+        backend = DEVICE_BACKENDS[backend]()
+    return DeviceSampler(backend, devices, interval)
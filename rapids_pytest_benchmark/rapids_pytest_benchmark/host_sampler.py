@@ -0,0 +1,111 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import threading
+
+import psutil
+
+
+def _resetPeakRSS():
+    """
+    Reset the kernel's record of this process' peak RSS (VmHWM) to the
+    current RSS. Returns False if this is not supported (requires Linux 4.0+).
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _readPeakRSS():
+    """
+    Return this process' peak RSS (VmHWM) in bytes, or None if not available.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class HostSampler(threading.Thread):
+    """
+    Measures the host memory and CPU use of this process from start() until
+    stop(): the peak RSS, the RSS growth (memory not given back, eg. a host
+    leak), the CPU time used (user + system) and the CPU utilization (CPU
+    time / wall time, summed across cores as in psutil, so it can exceed
+    100).
+
+    On Linux the peak RSS comes from the kernel's high water mark, which is
+    reset at start(), so no peak is missed. Elsewhere it is the max of the
+    RSS sampled every interval seconds by a background thread.
+    """
+
+    def __init__(self, interval=0.05):
+        super().__init__(name="HostSampler", daemon=True)
+        self.interval = interval
+        self.max_rss = -1
+        self.rss_growth = 0
+        self.cpu_time = -1
+        self.cpu_util = -1
+        self._process = psutil.Process()
+        self._exact_peak = False
+        self._start_rss = 0
+        self._start_cpu_time = 0
+        self._start_wall_time = 0
+        self._stop_event = threading.Event()
+
+    def start(self):
+        self._exact_peak = _resetPeakRSS()
+        self._start_rss = self.sample()
+        self._start_cpu_time = self._cpu_time()
+        self._start_wall_time = time.perf_counter()
+        # The high water mark makes sampling unnecessary
+        if not self._exact_peak:
+            super().start()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        wall_time = time.perf_counter() - self._start_wall_time
+        self.cpu_time = self._cpu_time() - self._start_cpu_time
+        if wall_time > 0:
+            self.cpu_util = 100 * self.cpu_time / wall_time
+        if self.is_alive():
+            self._stop_event.set()
+            self.join()
+        self.rss_growth = self.sample() - self._start_rss
+        if self._exact_peak:
+            peak = _readPeakRSS()
+            if peak is not None:
+                self.max_rss = max(self.max_rss, peak)
+
+    def sample(self):
+        """
+        Sample the current RSS, fold it into the peak and return it.
+        """
+        rss = self._process.memory_info().rss
+        self.max_rss = max(self.max_rss, rss)
+        return rss
+
+    def _cpu_time(self):
+        times = self._process.cpu_times()
+        return times.user + times.system
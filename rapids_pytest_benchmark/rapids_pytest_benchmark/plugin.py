@@ -12,33 +12,101 @@
 # limitations under the License.
 
 from functools import partial
+import os
 import time
-import platform
-import ctypes
 import argparse
-import subprocess
 import json
+import statistics
+import shutil
+import tempfile
 
 import pytest
 from pytest_benchmark import stats as pytest_benchmark_stats
 from pytest_benchmark import utils as pytest_benchmark_utils
 from pytest_benchmark import fixture as pytest_benchmark_fixture
 from pytest_benchmark import session as pytest_benchmark_session
-from pytest_benchmark import compat as pytest_benchmark_compat
-import asvdb.utils as asvdbUtils
-from asvdb import ASVDb, BenchmarkInfo, BenchmarkResult
-from pynvml import smi
-import psutil
 
 from . import __version__
-from .rmm_resource_analyzer import RMMResourceAnalyzer
-from .reporting import GPUTableResults
+from .device_sampler import DEVICE_BACKENDS, makeDeviceSampler
+from . import scheduler
+from .asv_metadata import ASVMetadata
+from . import regression_gate
+from .round_timings import encodeRoundTimings
+from .asv_output import makeASVBenchmarkResults, writeASVResults
+from . import asv_journal
+from .adaptive_rounds import PRECISION_TRACKERS
+from .reporting import (GPUTableResults, isDeviceColumn, isAttributionColumn,
+                        sortAttributionColumns, displayLeakReports,
+                        displayRegressionReport)
 
 # FIXME: find a better place to do this and/or a better way
 pytest_benchmark_utils.ALLOWED_COLUMNS.append("gpu_mem")
 pytest_benchmark_utils.ALLOWED_COLUMNS.append("gpu_leaked_mem")
 pytest_benchmark_utils.ALLOWED_COLUMNS.append("gpu_util")
 pytest_benchmark_utils.ALLOWED_COLUMNS.append("gpu_rounds")
+pytest_benchmark_utils.ALLOWED_COLUMNS.append("precision")
+
+# Distribution of the per-round GPU memory measurements. gpu_mem and
+# gpu_leaked_mem are the max.
+GPU_ROUND_STATS = ("gpu_mem_min", "gpu_mem_median", "gpu_mem_stddev",
+                   "gpu_leaked_mem_min", "gpu_leaked_mem_median",
+                   "gpu_leaked_mem_stddev")
+
+# The names of rmm_resource_analyzer.TRACKERS. This plugin is loaded by every
+# pytest run, so the modules needing numpy, psutil, rmm or asvdb are only
+# imported once a gpubenchmark fixture is run or ASV results are written.
+GPU_TRACKERS = ("rmm-log", "rmm-stats", "fake")
+
+# GPU rounds used to be padded to this many seconds to give the metric
+# backends time to capture them. The backends now capture the window when
+# they are stopped, and the time no longer spent waiting is reported.
+FIXED_GPU_ROUND_WAIT = 0.1
+
+# The runtime stats that can be added to the ASV results with
+# --benchmark-asv-stats, and their units
+ASV_RUNTIME_STATS = dict(min="seconds", max="seconds", median="seconds",
+                         stddev="seconds", iqr="seconds", q1="seconds",
+                         q3="seconds", ld15iqr="seconds", hd15iqr="seconds",
+                         iqr_outliers="count", stddev_outliers="count",
+                         rounds="count", ops="ops/second")
+
+# The suffix of the ASV result name (<benchmark>_<suffix>) of each stat, and
+# the unit of its results
+ASV_STAT_SUFFIXES = dict(gpu_util="gpuutil",
+                         gpu_mem="gpumem",
+                         gpu_leaked_mem="gpu_leaked_mem",
+                         gpu_leaked_allocs="gpu_leaked_allocs",
+                         gpu_util_mean="gpuutil_mean",
+                         gpu_used_mem="gpu_used_mem",
+                         host_mem="hostmem",
+                         host_leaked_mem="host_leaked_mem",
+                         cpu_time="cpu_time",
+                         cpu_util="cpuutil",
+                         gpu_mem_min="gpumem_min",
+                         gpu_mem_median="gpumem_median",
+                         gpu_mem_stddev="gpumem_stddev",
+                         gpu_leaked_mem_min="gpu_leaked_mem_min",
+                         gpu_leaked_mem_median="gpu_leaked_mem_median",
+                         gpu_leaked_mem_stddev="gpu_leaked_mem_stddev",
+                         gpu_allocs="gpu_allocs",
+                         gpu_alloc_bytes="gpu_alloc_bytes",
+                         mean="time",
+)
+ASV_STAT_UNITS = dict(gpu_util="percent",
+                      gpu_mem="bytes",
+                      gpu_leaked_mem="bytes",
+                      gpu_leaked_allocs="count",
+                      gpu_util_mean="percent",
+                      gpu_used_mem="bytes",
+                      host_mem="bytes",
+                      host_leaked_mem="bytes",
+                      cpu_time="seconds",
+                      cpu_util="percent",
+                      **{statType: "bytes" for statType in GPU_ROUND_STATS},
+                      gpu_allocs="count",
+                      gpu_alloc_bytes="bytes",
+                      mean="seconds",
+)
 
 
 def pytest_addoption(parser):
@@ -46,30 +114,155 @@ def pytest_addoption(parser):
     # FIXME: add check for valid dir, similar to "parse_save()" in
     # pytest-benchmark
 
-    # FIXME: when multi-GPU supported, update the help to mention that the user
-    # can specify this option multiple times to observe multiple GPUs? This is
-    # why action=append.
     group.addoption(
         "--benchmark-gpu-device",
         metavar="GPU_DEVICENO", default=[0], type=_parseSaveGPUDeviceNum,
-        action="append", help="GPU device number to include in benchmark metadata."
+        action="append", help="GPU device number(s) to observe for GPU memory "
+        "metrics, as a comma-separated list. Can be specified multiple times. "
+        "When more than one device is observed, the peak and leaked memory of "
+        "each device are also reported. The first device is used for the "
+        "benchmark metadata. Default is 0."
     )
     group.addoption(
         "--benchmark-gpu-max-rounds", default=1, type=_parseGpuMaxRounds,
         help="Maximum number of rounds to run the test/benchmark during the "
-        "GPU measurement phase. If not provided, will run the same number of "
-        "rounds performed for the runtime measurement."
+        "GPU measurement phase, capped by the number of rounds performed for "
+        "the runtime measurement. When more than one round is run, the min, "
+        "median and standard deviation of GPU mem and GPU leaked mem across "
+        "rounds are also reported (GPU mem and GPU leaked mem are the max). "
+        "Default is 1."
     )
     group.addoption(
         "--benchmark-gpu-disable", action="store_true", default=False,
         help="Do not perform GPU measurements when using the gpubenchmark "
         "fixture, only perform other enabled measurements."
     )
+    group.addoption(
+        "--benchmark-gpu-mode", default="separate",
+        choices=["separate", "inline"],
+        help="When to take the GPU measurements. \"separate\" runs the "
+        "test/benchmark again for up to --benchmark-gpu-max-rounds GPU "
+        "measurement rounds after the runtime measurement. \"inline\" "
+        "instead measures the call pytest-benchmark makes for the return "
+        "value, so no extra calls are made and the runtime stats are not "
+        "affected, but only 1 GPU round is run. With pedantic(..., "
+        "iterations=1) that call is the last timed round, which is then left "
+        "out of the runtime stats unless it is the only round. Default is "
+        "\"separate\"."
+    )
+    group.addoption(
+        "--benchmark-gpu-tracker", default="rmm-log", choices=GPU_TRACKERS,
+        help="Backend used to track GPU memory allocations. \"rmm-log\" parses "
+        "RMM's CSV allocation log, \"rmm-stats\" counts allocations in memory "
+        "using RMM's statistics resource adaptor, and \"fake\" tracks "
+        "allocations made through rapids_pytest_benchmark.rmm_resource_analyzer."
+        "fake_allocator, for testing on machines without a GPU."
+    )
+    group.addoption(
+        "--benchmark-gpu-log-streaming", action="store_true", default=False,
+        help="Consume the RMM allocation logs in a background thread while "
+        "the test/benchmark runs, instead of parsing them all afterwards. "
+        "This keeps memory use constant and disk use bounded for benchmarks "
+        "that make a very large number of allocations. Only used with "
+        "--benchmark-gpu-tracker=rmm-log."
+    )
+    group.addoption(
+        "--benchmark-gpu-timeline", metavar="NUM_POINTS", default=0,
+        type=_parseNonNegativeInt,
+        help="Also record GPU memory usage over time, downsampled to at most "
+        "NUM_POINTS points while preserving its shape and peak. The timeline "
+        "is saved with the benchmark stats in the pytest-benchmark JSON. Not "
+        "supported by --benchmark-gpu-tracker=rmm-stats. Default is 0 "
+        "(disabled)."
+    )
+    group.addoption(
+        "--benchmark-gpu-attribution", action="store_true", default=False,
+        help="Also report the peak GPU memory, number of allocations and bytes "
+        "allocated for each CUDA stream and each host thread. Streams and "
+        "threads are numbered by order of first allocation, eg. "
+        "\"gpu_mem[stream0]\" or \"gpu_allocs[thread1]\". Not supported by "
+        "--benchmark-gpu-tracker=rmm-stats."
+    )
+    group.addoption(
+        "--benchmark-gpu-leak-report", metavar="TOP_N", nargs="?", const=10,
+        default=0, type=_parseNonNegativeInt,
+        help="Pair GPU allocations and frees by pointer, so leaked memory is "
+        "the size of the allocations that were never freed, and frees of "
+        "memory allocated before the measurement do not count against it. "
+        "Also report the number of leaked allocations, their size "
+        "distribution and the TOP_N largest (default 10 if TOP_N is not "
+        "given). Not supported by --benchmark-gpu-tracker=rmm-stats."
+    )
+    group.addoption(
+        "--benchmark-gpu-sample-interval", metavar="SECONDS", default=0.05,
+        type=_parseNonNegativeFloat,
+        help="Interval between samples of GPU utilization and device memory "
+        "used, taken in a background thread during the GPU measurement "
+        "rounds. The max and mean utilization and the max device memory used "
+        "(which, unlike GPU mem, includes memory not allocated through RMM) "
+        "are reported. 0 disables sampling. Default is 0.05."
+    )
+    group.addoption(
+        "--benchmark-gpu-sampler", default="nvml", choices=list(DEVICE_BACKENDS),
+        help="Backend used to sample GPU utilization and device memory used. "
+        "\"nvml\" uses NVML, and \"fake\" returns the values set on "
+        "rapids_pytest_benchmark.device_sampler.fake_device_backend, for "
+        "testing on machines without a GPU."
+    )
+    group.addoption(
+        "--benchmark-host-sample-interval", metavar="SECONDS", default=0.05,
+        type=_parseNonNegativeFloat,
+        help="Also measure the peak RSS (host_mem), RSS growth "
+        "(host_leaked_mem), CPU time (cpu_time) and CPU utilization summed "
+        "across cores (cpu_util) of the process during the GPU measurement "
+        "rounds. On Linux the peak RSS is exact, elsewhere it is sampled at "
+        "this interval. 0 disables host measurements. Default is 0.05."
+    )
+    group.addoption(
+        "--benchmark-gpu-workers",
+        metavar="GPU_DEVICENOS", default=None, type=_parseSaveGPUDeviceNum,
+        help="Run the benchmarks in parallel, in one worker process per GPU "
+        "device in this comma-separated list. Each worker only sees its "
+        "device (through CUDA_VISIBLE_DEVICES, so the device is device 0 in "
+        "the worker and --benchmark-gpu-device is ignored) and runs on its "
+        "share of the CPU cores. The benchmarks are spread across the workers "
+        "so they take about the same time, based on the durations of previous "
+        "runs kept in the pytest cache, and the results are reported and "
+        "saved as for a serial run."
+    )
+    group.addoption(
+        "--benchmark-gpu-worker", metavar="WORK_DIR", default=None,
+        help=argparse.SUPPRESS
+    )
     group.addoption(
         "--benchmark-custom-metrics-disable", action="store_true", default=False,
         help="Do not perform custom metrics measurements when using the "
         "gpubenchmark fixture, only perform other enabled measurements."
     )
+    group.addoption(
+        "--benchmark-target-precision", metavar="PERCENT",
+        default=None, type=_parsePercent,
+        help="Run rounds of each benchmark until the 95%% confidence interval "
+        "of its --benchmark-target-precision-stat is within +/-PERCENT of it "
+        "(eg. \"2%%\"), instead of for --benchmark-max-time, but for at "
+        "least --benchmark-min-rounds and at most "
+        "--benchmark-target-precision-max-time. The precision reached is "
+        "shown in the \"precision\" column. Does not apply to pedantic "
+        "benchmarks."
+    )
+    group.addoption(
+        "--benchmark-target-precision-stat", default="mean",
+        choices=list(PRECISION_TRACKERS),
+        help="Stat whose precision --benchmark-target-precision applies to. "
+        "Default is \"mean\"."
+    )
+    group.addoption(
+        "--benchmark-target-precision-max-time", metavar="SECONDS",
+        default=10.0, type=_parseNonNegativeFloat,
+        help="Maximum time to run rounds of a benchmark for with "
+        "--benchmark-target-precision, if its precision is not reached "
+        "first. Default is 10."
+    )
     group.addoption(
         "--benchmark-asv-output-dir",
         metavar="ASV_DB_DIR", default=None,
@@ -81,19 +274,87 @@ def pytest_addoption(parser):
         default={}, type=_parseSaveMetadata,
         help='Metadata to be included in the ASV report in JSON format. For example: '
         '{"machineName":"my_machine2000", "gpuType":"FastGPU3", "arch":"x86_64"}. If not '
-        'provided, best-guess values will be derived from the environment. '
-        'Valid metadata is: "machineName", "cudaVer", "osType", "pythonVer", '
+        'provided, best-guess values will be derived from the environment '
+        '(the machine\'s are cached until the next reboot or GPU driver '
+        'change). Valid metadata is: "machineName", "cudaVer", "osType", "pythonVer", '
         '"commitRepo", "commitBranch", "commitHash", "commitTime", "gpuType", '
         '"cpuType", "arch", "ram", "gpuRam", "requirements"'
     )
+    group.addoption(
+        "--benchmark-asv-gpu-timelines", action="store_true", default=False,
+        help="Write the GPU memory timelines recorded with "
+        "--benchmark-gpu-timeline to a JSON file per machine and commit in "
+        "the gpu_timelines directory of the ASV output dir."
+    )
+    group.addoption(
+        "--benchmark-asv-stats", metavar="STATS",
+        default=[], type=_parseASVStats,
+        help="Comma-separated runtime stats to add to the ASV results of each "
+        "benchmark besides the mean, as <benchmark>_time_<stat>. Valid stats "
+        "are: %s" % ", ".join('"%s"' % stat for stat in ASV_RUNTIME_STATS)
+    )
+    group.addoption(
+        "--benchmark-asv-round-timings", action="store_true", default=False,
+        help="Write the time of each round of each benchmark, compressed (see "
+        "rapids_pytest_benchmark.round_timings), to a JSON file per machine "
+        "and commit in the round_timings directory of the ASV output dir."
+    )
+    group.addoption(
+        "--benchmark-asv-journal", metavar="JOURNAL", default=None,
+        help="Append the ASV results of each benchmark to the JOURNAL file as "
+        "soon as it finishes, so they are not lost if the session does not "
+        "finish. Add journals to an ASV database with \"python -m "
+        "rapids_pytest_benchmark.asv_journal ASV_DB_DIR JOURNAL...\". Uses "
+        "--benchmark-asv-metadata, --benchmark-asv-stats, "
+        "--benchmark-asv-gpu-timelines and --benchmark-asv-round-timings as "
+        "--benchmark-asv-output-dir does."
+    )
+    group.addoption(
+        "--benchmark-asv-skip-existing", action="store_true", default=False,
+        help="Deselect the benchmarks that already have results for this "
+        "commit on this machine in the ASV output dir, eg. to resume a run "
+        "that did not finish. Benchmarks whose params are renamed with "
+        "\"fixture_param_names\" are always run. Requires "
+        "--benchmark-asv-output-dir."
+    )
+    group.addoption(
+        "--benchmark-asv-regression-gate", action="store_true", default=False,
+        help="Fail the session if the time, GPU memory or custom metrics of "
+        "a benchmark regressed compared to its recent results on this "
+        "machine in the ASV output dir: if the change from their median is "
+        "over the threshold for the metric and beyond their normal "
+        "run-to-run variation. A report of the regressions, largest first, "
+        "is shown. Custom metrics fail for changes in either direction. "
+        "Requires --benchmark-asv-output-dir."
+    )
+    group.addoption(
+        "--benchmark-asv-regression-threshold", metavar="THRESHOLDS",
+        default={"*": 0.05}, type=_parseRegressionThresholds,
+        help="Minimum change for --benchmark-asv-regression-gate to fail, as "
+        "a percentage for all metrics (eg. \"5%%\") or per metric (eg. "
+        "\"time=5%%,gpu_mem=0%%,accuracy=1%%,*=10%%\", where * is for any "
+        "other metric). Default is 5%%."
+    )
+    group.addoption(
+        "--benchmark-asv-regression-history", metavar="NUM",
+        default=20, type=_parsePositiveInt,
+        help="Number of recent results of each benchmark (for other commits) "
+        "to compare to with --benchmark-asv-regression-gate. Benchmarks with "
+        "fewer than 3 are not checked. Default is 20."
+    )
+    group.addoption(
+        "--benchmark-asv-regression-confidence", metavar="CONFIDENCE",
+        default=0.95, type=_parseConfidence,
+        help="Confidence required for --benchmark-asv-regression-gate to "
+        "report a change beyond the run-to-run variation of a benchmark as a "
+        "regression, between 0 and 1. Default is 0.95."
+    )
 
 
 def _parseGpuMaxRounds(stringOpt):
     """
     Ensures opt passed is a number > 0
     """
-    if stringOpt != "1":
-        raise argparse.ArgumentTypeError("Only 1 round is supported until GPU utilization is implemented")
     if not stringOpt:
         raise argparse.ArgumentTypeError("Cannot be empty")
     if stringOpt.isdecimal():
@@ -105,6 +366,37 @@ def _parseGpuMaxRounds(stringOpt):
     return num
 
 
+def _parseNonNegativeInt(stringOpt):
+    """
+    Ensures opt passed is a number >= 0
+    """
+    if not stringOpt.isdecimal():
+        raise argparse.ArgumentTypeError("Must be an int >= 0")
+    return int(stringOpt)
+
+
+def _parsePositiveInt(stringOpt):
+    """
+    Ensures opt passed is a number > 0
+    """
+    if not stringOpt.isdecimal() or (int(stringOpt) == 0):
+        raise argparse.ArgumentTypeError("Must be an int > 0")
+    return int(stringOpt)
+
+
+def _parseNonNegativeFloat(stringOpt):
+    """
+    Ensures opt passed is a number >= 0
+    """
+    try:
+        num = float(stringOpt)
+    except ValueError:
+        raise argparse.ArgumentTypeError("Must be a number >= 0")
+    if num < 0:
+        raise argparse.ArgumentTypeError("Must be a number >= 0")
+    return num
+
+
 def _parseSaveGPUDeviceNum(stringOpt):
     """
     Given a string like "0,1, 2" return [0, 1, 2]
@@ -125,6 +417,39 @@ def _parseSaveGPUDeviceNum(stringOpt):
     return retList
 
 
+def _getGPUDeviceNums(config):
+    """
+    Return the flat list of GPU device numbers given with
+    --benchmark-gpu-device, or [0] if none were given.
+    """
+    # A --benchmark-gpu-workers worker only sees its own device, as device 0
+    if config.getoption("benchmark_gpu_worker"):
+        return [0]
+    # The "append" action adds to the default list rather than replacing it,
+    # so the default is always the first item.
+    (_, *deviceLists) = config.getoption("benchmark_gpu_device")
+    retList = []
+    for deviceList in deviceLists:
+        for num in deviceList:
+            if num not in retList:
+                retList.append(num)
+    return retList or [0]
+
+
+def _getDeviceBackend(config):
+    """
+    Return the --benchmark-gpu-sampler backend of the session. It is made on
+    first use and shut down at the end of the session, so NVML is initialized
+    once rather than for every GPU measurement round.
+    """
+    backend = getattr(config, "_gpuDeviceBackend", None)
+    if backend is None:
+        backend = DEVICE_BACKENDS[config.getoption("benchmark_gpu_sampler")]()
+        config._gpuDeviceBackend = backend
+        config.add_cleanup(backend.shutdown)
+    return backend
+
+
 def _parseSaveMetadata(stringOpt):
     """
     Convert JSON input to Python dictionary
@@ -145,11 +470,96 @@ def _parseSaveMetadata(stringOpt):
     return retDict
 
 
+def _parseASVStats(stringOpt):
+    """
+    Given a string like "median, iqr" return ["median", "iqr"], ensuring they
+    are valid ASV_RUNTIME_STATS
+    """
+    if not stringOpt:
+        raise argparse.ArgumentTypeError("Cannot be empty")
+    stats = [stat.strip() for stat in stringOpt.split(",")]
+    for stat in stats:
+        if stat not in ASV_RUNTIME_STATS:
+            raise argparse.ArgumentTypeError(f'invalid stat: "{stat}"')
+    return stats
+
+
+def _parseRegressionThresholds(stringOpt):
+    """
+    Given a string like "5%" or "time=5%, gpu_mem=0%" return {"*": 0.05} or
+    {"time": 0.05, "gpu_mem": 0.0, "*": 0.05}
+    """
+    if not stringOpt:
+        raise argparse.ArgumentTypeError("Cannot be empty")
+    thresholds = {regression_gate.DEFAULT_THRESHOLD_KEY: 0.05}
+    for item in stringOpt.split(","):
+        (metric, _, percent) = item.rpartition("=")
+        metric = metric.strip() or regression_gate.DEFAULT_THRESHOLD_KEY
+        try:
+            num = float(percent.strip().rstrip("%"))
+        except ValueError:
+            raise argparse.ArgumentTypeError(
+                f"must specify a percentage, got {percent}")
+        if num < 0:
+            raise argparse.ArgumentTypeError("Must be a percentage >= 0")
+        thresholds[metric] = num / 100
+    return thresholds
+
+
+def _parsePercent(stringOpt):
+    """
+    Given a string like "2%" or "2" return 0.02, ensuring it is > 0
+    """
+    try:
+        num = float(stringOpt.strip().rstrip("%"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("Must be a percentage > 0")
+    if num <= 0:
+        raise argparse.ArgumentTypeError("Must be a percentage > 0")
+    return num / 100
+
+
+def _parseConfidence(stringOpt):
+    """
+    Ensures opt passed is a number between 0 and 1 (exclusive)
+    """
+    try:
+        num = float(stringOpt)
+    except ValueError:
+        raise argparse.ArgumentTypeError("Must be a number between 0 and 1")
+    if not (0 < num < 1):
+        raise argparse.ArgumentTypeError("Must be a number between 0 and 1")
+    return num
+
+
 class GPUBenchmarkResults:
-    def __init__(self, gpuMem, gpuUtil, gpuLeakedMem):
+    def __init__(self, gpuMem, gpuUtil, gpuLeakedMem, deviceGpuMem=None,
+                 deviceGpuLeakedMem=None, gpuMemTimeline=None,
+                 gpuMemAttribution=None, gpuMemAttributionIds=None,
+                 gpuLeakReport=None, gpuUtilMean=-1, gpuUsedMem=-1,
+                 hostMem=-1, hostLeakedMem=0, cpuTime=-1, cpuUtil=-1):
         self.gpuMem = gpuMem
         self.gpuUtil = gpuUtil
+        self.gpuUtilMean = gpuUtilMean
+        # Device memory used as reported by the device, not just RMM
+        self.gpuUsedMem = gpuUsedMem
+        # Host metrics, see HostSampler. -1 if not measured.
+        self.hostMem = hostMem
+        self.hostLeakedMem = hostLeakedMem
+        self.cpuTime = cpuTime
+        self.cpuUtil = cpuUtil
         self.gpuLeakedMem = gpuLeakedMem
+        # Per-device values, keyed by device number
+        self.deviceGpuMem = deviceGpuMem or {}
+        self.deviceGpuLeakedMem = deviceGpuLeakedMem or {}
+        # List of [seconds, bytes] pairs, or None if not recorded
+        self.gpuMemTimeline = gpuMemTimeline
+        # Per-stream and per-thread values, keyed by label (eg. "stream0"),
+        # see RMMResourceAnalyzer.mem_attribution
+        self.gpuMemAttribution = gpuMemAttribution or {}
+        self.gpuMemAttributionIds = gpuMemAttributionIds or {}
+        # See RMMResourceAnalyzer.leak_report, or None if not recorded
+        self.gpuLeakReport = gpuLeakReport
 
 
 class GPUMetadata(pytest_benchmark_stats.Metadata):
@@ -170,12 +580,24 @@ class GPUMetadata(pytest_benchmark_stats.Metadata):
 class GPUStats(pytest_benchmark_stats.Stats):
     fields = (
         "min", "max", "mean", "stddev", "rounds", "gpu_rounds", "median", "gpu_mem", "gpu_util", "gpu_leaked_mem" , "iqr", "q1", "q3", "iqr_outliers", "stddev_outliers",
-        "outliers", "ld15iqr", "hd15iqr", "ops", "total"
+        "outliers", "ld15iqr", "hd15iqr", "ops", "total", *GPU_ROUND_STATS,
+        "gpu_util_mean", "gpu_used_mem", "host_mem", "host_leaked_mem",
+        "cpu_time", "cpu_util", "precision"
     )
 
     def __init__(self):
         super().__init__()
         self.gpuData = []
+        self.deviceGpuData = []
+        self.gpuMemTimelines = []
+        self.gpuAttributionData = []
+        self.gpuAttributionIds = {}
+        self.gpuLeakReports = []
+        self.gpuSampleData = []
+        self.hostData = []
+        # The precision reached with --benchmark-target-precision, as a
+        # percentage. -1 if not run until a target precision.
+        self.precision = -1
         # Custom metrics are by:
         #     key : name of the metric
         #     value : tuple of (value, unit_type)
@@ -186,6 +608,22 @@ class GPUStats(pytest_benchmark_stats.Stats):
         self.gpuData.append((gpuBenchmarkResults.gpuMem,
                              gpuBenchmarkResults.gpuUtil,
                              gpuBenchmarkResults.gpuLeakedMem))
+        self.deviceGpuData.append((gpuBenchmarkResults.deviceGpuMem,
+                                   gpuBenchmarkResults.deviceGpuLeakedMem))
+        self.gpuMemTimelines.append(gpuBenchmarkResults.gpuMemTimeline)
+        self.gpuAttributionData.append(
+            {"gpu_%s[%s]" % (stat, label): value
+             for (label, stats) in gpuBenchmarkResults.gpuMemAttribution.items()
+             for (stat, value) in stats.items()})
+        self.gpuAttributionIds.update(gpuBenchmarkResults.gpuMemAttributionIds)
+        self.gpuLeakReports.append(gpuBenchmarkResults.gpuLeakReport)
+        self.gpuSampleData.append((gpuBenchmarkResults.gpuUtilMean,
+                                   gpuBenchmarkResults.gpuUsedMem))
+        if gpuBenchmarkResults.hostMem >= 0:
+            self.hostData.append((gpuBenchmarkResults.hostMem,
+                                  gpuBenchmarkResults.hostLeakedMem,
+                                  gpuBenchmarkResults.cpuTime,
+                                  gpuBenchmarkResults.cpuUtil))
 
 
     def updateCustomMetric(self, result, name, unitString):
@@ -200,9 +638,47 @@ class GPUStats(pytest_benchmark_stats.Stats):
         return self.__customMetrics[name]
 
 
-    # FIXME: this may not need to be here
+    def getDeviceStatNames(self):
+        """
+        Return the names of the per-device stats, such as "gpu_mem[dev1]".
+        These are only present when more than one device was observed.
+        """
+        devices = sorted(self.gpu_device_mem)
+        if len(devices) < 2:
+            return []
+        return ["%s[dev%d]" % (stat, device)
+                for stat in ("gpu_mem", "gpu_leaked_mem")
+                for device in devices]
+
+    def getDeviceStat(self, name):
+        (stat, _, device) = name.rstrip("]").partition("[dev")
+        return getattr(self, "gpu_device_%s" % stat[len("gpu_"):])[int(device)]
+
+    def getAttributionStatNames(self):
+        """
+        Return the names of the per-stream and per-thread stats, such as
+        "gpu_allocs[stream1]". These are only present if attribution was
+        enabled.
+        """
+        return sortAttributionColumns(self.gpu_attribution)
+
+    def getAttributionStat(self, name):
+        return self.gpu_attribution[name]
+
     def as_dict(self):
-        return super().as_dict()
+        result = super().as_dict()
+        for name in self.getDeviceStatNames():
+            result[name] = self.getDeviceStat(name)
+        for name in self.getAttributionStatNames():
+            result[name] = self.getAttributionStat(name)
+        if self.gpuAttributionIds:
+            result["gpu_attribution_ids"] = self.gpuAttributionIds
+        if self.gpu_leak_report is not None:
+            result["gpu_leaked_allocs"] = self.gpu_leaked_allocs
+            result["gpu_leak_report"] = self.gpu_leak_report
+        if self.gpu_mem_timeline is not None:
+            result["gpu_mem_timeline"] = self.gpu_mem_timeline
+        return result
 
     @pytest_benchmark_utils.cached_property
     def gpu_rounds(self):
@@ -220,15 +696,189 @@ class GPUStats(pytest_benchmark_stats.Stats):
     def gpu_leaked_mem(self):
         return max([i[2] for i in self.gpuData])
 
+    @pytest_benchmark_utils.cached_property
+    def gpu_util_mean(self):
+        """
+        The mean of the per-round mean utilizations, or -1 if utilization was
+        not sampled.
+        """
+        sampled = [i[0] for i in self.gpuSampleData if i[0] >= 0]
+        if not sampled:
+            return -1
+        return statistics.mean(sampled)
+
+    @pytest_benchmark_utils.cached_property
+    def gpu_used_mem(self):
+        return max([i[1] for i in self.gpuSampleData], default=-1)
+
+    @pytest_benchmark_utils.cached_property
+    def host_mem(self):
+        return max([i[0] for i in self.hostData], default=-1)
+
+    @pytest_benchmark_utils.cached_property
+    def host_leaked_mem(self):
+        return max([i[1] for i in self.hostData], default=0)
+
+    @pytest_benchmark_utils.cached_property
+    def cpu_time(self):
+        if not self.hostData:
+            return -1
+        return statistics.mean([i[2] for i in self.hostData])
+
+    @pytest_benchmark_utils.cached_property
+    def cpu_util(self):
+        if not self.hostData:
+            return -1
+        return statistics.mean([i[3] for i in self.hostData])
+
+    @pytest_benchmark_utils.cached_property
+    def gpu_mem_min(self):
+        return min([i[0] for i in self.gpuData])
+
+    @pytest_benchmark_utils.cached_property
+    def gpu_mem_median(self):
+        return statistics.median([i[0] for i in self.gpuData])
+
+    @pytest_benchmark_utils.cached_property
+    def gpu_mem_stddev(self):
+        return _stddev([i[0] for i in self.gpuData])
+
+    @pytest_benchmark_utils.cached_property
+    def gpu_leaked_mem_min(self):
+        return min([i[2] for i in self.gpuData])
+
+    @pytest_benchmark_utils.cached_property
+    def gpu_leaked_mem_median(self):
+        return statistics.median([i[2] for i in self.gpuData])
+
+    @pytest_benchmark_utils.cached_property
+    def gpu_leaked_mem_stddev(self):
+        return _stddev([i[2] for i in self.gpuData])
+
+    @pytest_benchmark_utils.cached_property
+    def gpu_mem_timeline(self):
+        """
+        The timeline of the round with the highest peak, or None if timelines
+        were not recorded.
+        """
+        rounds = [(i[0], timeline) for (i, timeline)
+                  in zip(self.gpuData, self.gpuMemTimelines)
+                  if timeline is not None]
+        if not rounds:
+            return None
+        return max(rounds, key=lambda r: r[0])[1]
+
+    @pytest_benchmark_utils.cached_property
+    def gpu_leak_report(self):
+        """
+        The leak report of the round that leaked the most, or None if leak
+        reports were not recorded.
+        """
+        rounds = [(i[2], report) for (i, report)
+                  in zip(self.gpuData, self.gpuLeakReports)
+                  if report is not None]
+        if not rounds:
+            return None
+        return max(rounds, key=lambda r: r[0])[1]
+
+    @pytest_benchmark_utils.cached_property
+    def gpu_leaked_allocs(self):
+        if self.gpu_leak_report is None:
+            return None
+        return self.gpu_leak_report["leaked_allocs"]
+
+    @pytest_benchmark_utils.cached_property
+    def gpu_device_mem(self):
+        return _maxPerKey([i[0] for i in self.deviceGpuData])
+
+    @pytest_benchmark_utils.cached_property
+    def gpu_device_leaked_mem(self):
+        return _maxPerKey([i[1] for i in self.deviceGpuData])
+
+    @pytest_benchmark_utils.cached_property
+    def gpu_attribution(self):
+        return _maxPerKey(self.gpuAttributionData)
+
+
+def _stddev(data):
+    """
+    Sample standard deviation, or 0 for a single sample (as in
+    pytest-benchmark's Stats).
+    """
+    if len(data) > 1:
+        return statistics.stdev(data)
+    return 0
+
+
+def _maxPerKey(dicts):
+    """
+    Given a list of {key: value} dicts, one per round, return a dict of the
+    max value for each key.
+    """
+    retDict = {}
+    for d in dicts:
+        for (key, value) in d.items():
+            retDict[key] = max(value, retDict.get(key, value))
+    return retDict
+
+
+class _InlineGPUTarget:
+    """
+    Stands in for the function being benchmarked in
+    --benchmark-gpu-mode=inline. The runners pytest-benchmark makes for the
+    timed rounds call the function directly (see
+    GPUBenchmarkFixture._make_runner), except the measuredRunner-th one if
+    given, and the first other call is GPU measured while measure is True.
+    Later calls, such as the one profiled with --benchmark-cprofile after the
+    rounds, call the function directly.
+    """
+
+    def __init__(self, function, makeGPURunner, measuredRunner=None,
+                 measure=True):
+        self.function = function
+        self.makeGPURunner = makeGPURunner
+        self.measuredRunner = measuredRunner
+        self.measure = measure
+        self.numRunners = 0
+        self.gpuResults = None
+
+    def __call__(self, *args, **kwargs):
+        if not(self.measure) or (self.gpuResults is not None):
+            return self.function(*args, **kwargs)
+        (self.gpuResults, result) = \
+            self.makeGPURunner(self.function, args, kwargs)()
+        return result
+
+
 class GPUBenchmarkFixture(pytest_benchmark_fixture.BenchmarkFixture):
 
     def __init__(self, benchmarkFixtureInstance, fixtureParamNames=None,
                  gpuMaxRounds=None, gpuDisable=False,
-                 customMetricsDisable=False):
+                 customMetricsDisable=False, gpuTracker="rmm-log",
+                 gpuLogStreaming=False, gpuDeviceNums=None,
+                 gpuTimelinePoints=0, gpuAttribution=False, gpuLeakReport=0,
+                 gpuSampleInterval=0, gpuSampler="nvml", hostSampleInterval=0,
+                 gpuBenchmarkSession=None, gpuMode="separate",
+                 targetPrecision=None, targetPrecisionStat="mean",
+                 targetPrecisionMaxTime=10.0):
         self.__benchmarkFixtureInstance = benchmarkFixtureInstance
         self.fixture_param_names = fixtureParamNames
         self.gpuMaxRounds = gpuMaxRounds
         self.gpuDisable = gpuDisable
+        self.gpuTracker = gpuTracker
+        self.gpuLogStreaming = gpuLogStreaming
+        self.gpuDeviceNums = gpuDeviceNums
+        self.gpuTimelinePoints = gpuTimelinePoints
+        self.gpuAttribution = gpuAttribution
+        self.gpuLeakReport = gpuLeakReport
+        self.gpuSampleInterval = gpuSampleInterval
+        self.gpuSampler = gpuSampler
+        self.hostSampleInterval = hostSampleInterval
+        self.gpuBenchmarkSession = gpuBenchmarkSession
+        self.gpuMode = gpuMode
+        self.targetPrecision = targetPrecision
+        self.targetPrecisionStat = targetPrecisionStat
+        self.targetPrecisionMaxTime = targetPrecisionMaxTime
         self.customMetricsDisable = customMetricsDisable
         self.__timeOnlyRunner = None
         self.__customMetricsDict = {}
@@ -245,55 +895,138 @@ class GPUBenchmarkFixture(pytest_benchmark_fixture.BenchmarkFixture):
         return getattr(self.__benchmarkFixtureInstance, attr)
 
 
-    def _make_gpu_runner(self, function_to_benchmark, args, kwargs):
+    def _make_gpu_runner(self, function_to_benchmark, args, kwargs,
+                         iterations=1):
         """
         Create a callable that will run the function_to_benchmark with the
-        provided args and kwargs, and wrap it in calls to perform GPU
-        measurements. The resulting callable will return a GPUBenchmarkResults
-        obj containing the measurements.
+        provided args and kwargs iterations times, and wrap it in calls to
+        perform GPU measurements. The resulting callable will return a
+        GPUBenchmarkResults obj containing the measurements, and the return
+        value of the last call.
+
+        There is no minimum round time: stopping the analyzer takes a final
+        sample from any samplers and flushes any logs, so the round is fully
+        captured as soon as the function returns.
         """
+        from .rmm_resource_analyzer import RMMResourceAnalyzer, makeTracker
+        from .host_sampler import HostSampler
+
         def runner():
-            rmm_analyzer = RMMResourceAnalyzer()
+            sampler = None
+            if self.gpuSampleInterval > 0:
+                sampler = makeDeviceSampler(self.gpuSampler,
+                                            self.gpuDeviceNums or [0],
+                                            self.gpuSampleInterval)
+            rmm_analyzer = RMMResourceAnalyzer(
+                sampler=sampler,
+                tracker=makeTracker(self.gpuTracker,
+                                    devices=self.gpuDeviceNums,
+                                    timeline_points=self.gpuTimelinePoints,
+                                    attribution=self.gpuAttribution,
+                                    leak_report=self.gpuLeakReport,
+                                    streaming=self.gpuLogStreaming))
+            hostSampler = None
+            if self.hostSampleInterval > 0:
+                hostSampler = HostSampler(self.hostSampleInterval)
             rmm_analyzer.enable_logging()
             try:
+                if hostSampler is not None:
+                    hostSampler.start()
                 startTime = time.time()
-                function_to_benchmark(*args, **kwargs)
+                try:
+                    for _ in range(iterations):
+                        result = function_to_benchmark(*args, **kwargs)
+                finally:
+                    if hostSampler is not None:
+                        hostSampler.stop()
                 duration = time.time() - startTime
-                # Guarantee a minimum time has passed to ensure GPU metrics
-                # have been taken
-                if duration < 0.1:
-                    time.sleep(0.1)
+                if self.gpuBenchmarkSession is not None:
+                    self.gpuBenchmarkSession.addSkippedWait(
+                        max(FIXED_GPU_ROUND_WAIT - duration, 0))
 
             finally:
                 rmm_analyzer.disable_logging()
 
-            return GPUBenchmarkResults(gpuMem=rmm_analyzer.max_gpu_mem_usage,
-                                       gpuUtil=rmm_analyzer.max_gpu_util,
-                                       gpuLeakedMem=rmm_analyzer.leaked_memory)
+            hostResults = {}
+            if hostSampler is not None:
+                hostResults = dict(hostMem=hostSampler.max_rss,
+                                   hostLeakedMem=hostSampler.rss_growth,
+                                   cpuTime=hostSampler.cpu_time,
+                                   cpuUtil=hostSampler.cpu_util)
+
+            return (GPUBenchmarkResults(
+                gpuMem=rmm_analyzer.max_gpu_mem_usage,
+                gpuUtil=rmm_analyzer.max_gpu_util,
+                gpuLeakedMem=rmm_analyzer.leaked_memory,
+                deviceGpuMem=rmm_analyzer.device_mem_usage,
+                deviceGpuLeakedMem=rmm_analyzer.device_leaked_memory,
+                gpuMemTimeline=rmm_analyzer.mem_timeline,
+                gpuMemAttribution=rmm_analyzer.mem_attribution,
+                gpuMemAttributionIds=rmm_analyzer.mem_attribution_ids,
+                gpuLeakReport=rmm_analyzer.leak_report,
+                gpuUtilMean=rmm_analyzer.mean_gpu_util,
+                gpuUsedMem=rmm_analyzer.max_gpu_used_mem,
+                **hostResults), result)
         return runner
 
 
-    def _run_gpu_measurements(self, function_to_benchmark, args, kwargs):
+    def _make_runner(self, function_to_benchmark, args, kwargs):
         """
-        Run as part of _raw() or _raw_pedantic() to perform GPU measurements.
-        This only runs if benchmarks and gpu benchmarks are enabled.
+        Overridden method to have the timed rounds call the function being
+        benchmarked directly in --benchmark-gpu-mode=inline, except for the
+        round chosen to be GPU measured, if any.
         """
-        if self.enabled and not(self.gpuDisable):
-            gpuRunner = self._make_gpu_runner(function_to_benchmark, args, kwargs)
+        if isinstance(function_to_benchmark, _InlineGPUTarget):
+            function_to_benchmark.numRunners += 1
+            if function_to_benchmark.numRunners != \
+               function_to_benchmark.measuredRunner:
+                function_to_benchmark = function_to_benchmark.function
+        return super()._make_runner(function_to_benchmark, args, kwargs)
+
 
-            # This loop can be used to re-implement GPU utiliziation in the future
-            #
-            # # Get the number of rounds performed from the runtime measurement
-            # rounds = self.stats.stats.rounds
-            # assert rounds > 0  # FIXME: do we need this?
+    def _isInlineGPUMode(self):
+        return self.enabled and not(self.gpuDisable) and \
+            (self.gpuMode == "inline")
 
-            # if self.gpuMaxRounds is not None:
-            #     rounds = min(rounds, self.gpuMaxRounds)
 
-            # for _ in pytest_benchmark_compat.XRANGE(rounds):
-            #     self.stats.updateGPUMetrics(gpuRunner())
+    def _run_gpu_measurements(self, function_to_benchmark, args, kwargs,
+                              setup=None, warmup_rounds=0, iterations=1):
+        """
+        Run as part of _raw() or _raw_pedantic() to perform GPU measurements.
+        This only runs if benchmarks and gpu benchmarks are enabled.
 
-            self.stats.updateGPUMetrics(gpuRunner())
+        For pedantic runs, setup (if given) is called before each warmup and
+        measured round, outside of the measured window so its own allocations
+        are not counted, and its return value (if any) replaces args and
+        kwargs as in pytest-benchmark. warmup_rounds unmeasured rounds are run
+        first, and each measured round calls function_to_benchmark iterations
+        times.
+        """
+        if self.enabled and not(self.gpuDisable):
+            def makeArguments():
+                if setup:
+                    maybeArgs = setup()
+                    if maybeArgs:
+                        return maybeArgs
+                return (args, kwargs)
+
+            # Get the number of rounds performed from the runtime measurement
+            rounds = max(self.stats.stats.rounds, 1)
+
+            if self.gpuMaxRounds is not None:
+                rounds = min(rounds, self.gpuMaxRounds)
+
+            for _ in range(warmup_rounds):
+                (roundArgs, roundKwargs) = makeArguments()
+                for _ in range(iterations):
+                    function_to_benchmark(*roundArgs, **roundKwargs)
+
+            for _ in range(rounds):
+                (roundArgs, roundKwargs) = makeArguments()
+                gpuRunner = self._make_gpu_runner(function_to_benchmark,
+                                                  roundArgs, roundKwargs,
+                                                  iterations)
+                self.stats.updateGPUMetrics(gpuRunner()[0])
 
         # Set the "mode" (regular or pedantic) here rather than override another
         # method. This is needed since cleanup callbacks registered prior to the
@@ -303,6 +1036,18 @@ class GPUBenchmarkFixture(pytest_benchmark_fixture.BenchmarkFixture):
         self.__benchmarkFixtureInstance._mode = self._mode
 
 
+    def _run_inline_gpu_measurements(self, inlineTarget):
+        """
+        Run as part of _raw() or _raw_pedantic() in
+        --benchmark-gpu-mode=inline to record the GPU measurements taken by
+        inlineTarget while the runtime was measured.
+        """
+        if inlineTarget.gpuResults is not None:
+            self.stats.updateGPUMetrics(inlineTarget.gpuResults)
+        # See _run_gpu_measurements()
+        self.__benchmarkFixtureInstance._mode = self._mode
+
+
     def _run_custom_measurements(self, function_result):
         # Run custom metrics if they are enabled
         if self.enabled and not(self.customMetricsDisable):
@@ -317,25 +1062,116 @@ class GPUBenchmarkFixture(pytest_benchmark_fixture.BenchmarkFixture):
         """
         Run the time measurement as defined in pytest-benchmark, then run GPU
         metrics separately. Running separately ensures GPU monitoring does not
-        affect runtime perf.
+        affect runtime perf. In --benchmark-gpu-mode=inline, the GPU metrics
+        are instead taken during the untimed call made for the return value,
+        or with --benchmark-cprofile, a call made after it so the profile does
+        not include the GPU measurements.
         """
-        function_result = super()._raw(function_to_benchmark, *args, **kwargs)
-        self._run_gpu_measurements(function_to_benchmark, args, kwargs)
+        if self._isInlineGPUMode():
+            inlineTarget = _InlineGPUTarget(function_to_benchmark,
+                                            self._make_gpu_runner,
+                                            measure=not(self.cprofile))
+            function_result = self._raw_timed(inlineTarget, *args, **kwargs)
+            if not(inlineTarget.measure):
+                inlineTarget.measure = True
+                inlineTarget(*args, **kwargs)
+            self._run_inline_gpu_measurements(inlineTarget)
+        else:
+            function_result = self._raw_timed(function_to_benchmark, *args,
+                                              **kwargs)
+            self._run_gpu_measurements(function_to_benchmark, args, kwargs)
         self._run_custom_measurements(function_result)
         return function_result
 
 
+    def _raw_timed(self, function_to_benchmark, *args, **kwargs):
+        """
+        Run the time measurement as defined in pytest-benchmark, or with
+        --benchmark-target-precision, for as many rounds as it takes to reach
+        the target precision.
+        """
+        if (self.targetPrecision is None) or not(self.enabled):
+            return super()._raw(function_to_benchmark, *args, **kwargs)
+
+        # pytest-benchmark calibrates the timer, warms up, runs the min rounds
+        # (with a max time of 0) and makes the call for the result, profiled
+        # with --benchmark-cprofile, then rounds are added here until the
+        # target precision is reached
+        maxTime = self._max_time
+        self._max_time = 0
+        try:
+            function_result = super()._raw(function_to_benchmark, *args,
+                                           **kwargs)
+        finally:
+            self._max_time = maxTime
+        stats = self.stats
+        stats.options["max_time"] = maxTime
+
+        runner = self._make_runner(function_to_benchmark, args, kwargs)
+        loopsRange = range(stats.iterations)
+        tracker = PRECISION_TRACKERS[self.targetPrecisionStat]()
+        for duration in stats.stats.data:
+            tracker.add(duration)
+        self._logger.debug("  Running rounds x %s iterations until the %s is "
+                           "within +/-%s%% ..." % (
+                               stats.iterations, self.targetPrecisionStat,
+                               self.targetPrecision * 100),
+                           yellow=True, bold=True)
+        runStart = time.time()
+        while True:
+            # At least 2 rounds are needed for any precision
+            if tracker.count >= max(self._min_rounds, 2):
+                if (time.time() - runStart) >= self.targetPrecisionMaxTime:
+                    break
+                if tracker.should_check() and \
+                   (tracker.precision <= self.targetPrecision):
+                    break
+            stats.update(runner(loopsRange))
+            tracker.add(stats.stats.data[-1])
+        precision = tracker.precision
+        if isinstance(stats.stats, GPUStats):
+            stats.stats.precision = precision * 100
+        self._logger.debug("  Ran %s rounds for %ss, the %s is within "
+                           "+/-%.2f%%." % (
+                               tracker.count,
+                               pytest_benchmark_utils.format_time(
+                                   time.time() - runStart),
+                               self.targetPrecisionStat, precision * 100),
+                           yellow=True, bold=True)
+        return function_result
+
+
     def _raw_pedantic(self, target, args=(), kwargs=None, setup=None, rounds=1,
                       warmup_rounds=0, iterations=1):
         """
         Run the pedantic time measurement as defined in pytest-benchmark, then
         run GPU metrics separately. Running separately ensures GPU monitoring
-        does not affect runtime perf.
+        does not affect runtime perf. In --benchmark-gpu-mode=inline, the GPU
+        metrics are instead taken during the call made for the return value.
         """
-        result = super()._raw_pedantic(target, args, kwargs, setup, rounds,
-                                       warmup_rounds, iterations)
-        self._run_gpu_measurements(function_to_benchmark, args, kwargs)
-        self._run_custom_measurements(function_result)
+        if kwargs is None:
+            kwargs = {}
+        if self._isInlineGPUMode():
+            # With 1 iteration the result comes from the last timed round,
+            # otherwise from a separate call.
+            measuredRunner = None
+            if iterations == 1:
+                measuredRunner = warmup_rounds + rounds
+            inlineTarget = _InlineGPUTarget(target, self._make_gpu_runner,
+                                            measuredRunner)
+            result = super()._raw_pedantic(inlineTarget, args, kwargs, setup,
+                                           rounds, warmup_rounds, iterations)
+            # The measured round was slowed down by the GPU measurements
+            if (measuredRunner is not None) and (rounds > 1):
+                self.stats.stats.data.pop()
+            self._run_inline_gpu_measurements(inlineTarget)
+        else:
+            result = super()._raw_pedantic(target, args, kwargs, setup,
+                                           rounds, warmup_rounds, iterations)
+            self._run_gpu_measurements(target, args, kwargs, setup=setup,
+                                       warmup_rounds=warmup_rounds,
+                                       iterations=iterations)
+        self._run_custom_measurements(result)
         return result
 
 
@@ -382,6 +1218,12 @@ class GPUBenchmarkSession(pytest_benchmark_session.BenchmarkSession):
         self.__benchmarkSessionInstance = benchmarkSession
         self.compared_mapping = benchmarkSession.compared_mapping
         self.groups = benchmarkSession.groups
+        self.skippedWaitTime = 0
+        self.skippedWaitRounds = 0
+        # The regression_gate.RegressionGate, if --benchmark-asv-regression-gate
+        self.asvRegressionGate = None
+        # The number of benchmarks appended to the --benchmark-asv-journal
+        self.numJournaledBenchmarks = 0
 
         # Add the GPU columns to the original list in the appropriate order
         # FIXME: this always adds gpu_* columns, even if the user specified a
@@ -391,7 +1233,7 @@ class GPUBenchmarkSession(pytest_benchmark_session.BenchmarkSession):
         # think?)
         origColumns = self.columns
         self.columns = []
-        for c in ["min", "max", "mean", "stddev", "median", "iqr", "outliers", "ops", "gpu_mem", "gpu_leaked_mem", "rounds", "gpu_rounds", "iterations"]:
+        for c in ["min", "max", "mean", "stddev", "median", "iqr", "outliers", "ops", "gpu_mem", "gpu_leaked_mem", "precision", "rounds", "gpu_rounds", "iterations"]:
             # Always add gpu_mem & gpu_leaked_mem (for now), and only add gpu_rounds if rounds was requested.
             if (c in origColumns) or \
                (c == "gpu_mem") or \
@@ -402,12 +1244,71 @@ class GPUBenchmarkSession(pytest_benchmark_session.BenchmarkSession):
     def __getattr__(self, attr):
         return getattr(self.__benchmarkSessionInstance, attr)
 
+    def addSkippedWait(self, seconds):
+        """
+        Record that a GPU round finished seconds sooner than it would have
+        with the FIXED_GPU_ROUND_WAIT minimum round time.
+        """
+        if seconds > 0:
+            self.skippedWaitTime += seconds
+            self.skippedWaitRounds += 1
+
+    def _getDisplayColumns(self):
+        """
+        Return self.columns with the distribution of the GPU mem and GPU
+        leaked mem rounds, if any benchmark ran more than one GPU round, and
+        any per-device GPU columns present in the results (eg.
+        "gpu_mem[dev1]") added after the corresponding all-device column.
+        The leaked allocation count, any per-stream/per-thread columns (eg.
+        "gpu_allocs[stream0]"), the sampled device memory and utilization
+        columns and the host columns are added after the GPU leaked mem
+        column.
+        """
+        deviceColumns = set()
+        attributionColumns = set()
+        hasLeakedAllocs = False
+        hasGPURounds = False
+        hasGPUUtil = False
+        hasHostMetrics = False
+        hasPrecision = False
+        for (_, benchmarks) in self.groups:
+            for bench in benchmarks:
+                hasPrecision |= bench.get("precision", -1) >= 0
+                hasHostMetrics |= bench.get("host_mem", -1) >= 0
+                hasGPUUtil |= bench.get("gpu_util", -1) >= 0
+                hasGPURounds |= (bench.get("gpu_rounds") or 0) > 1
+                hasLeakedAllocs |= ("gpu_leaked_allocs" in bench)
+                deviceColumns.update(k for k in bench if isDeviceColumn(k))
+                attributionColumns.update(k for k in bench
+                                          if isAttributionColumn(k))
+        columns = []
+        for c in self.columns:
+            # The precision reached is shown next to the rounds it took
+            if (c == "rounds") and hasPrecision and \
+               ("precision" not in self.columns):
+                columns.append("precision")
+            columns.append(c)
+            if hasGPURounds:
+                columns += [rc for rc in GPU_ROUND_STATS
+                            if rc.rpartition("_")[0] == c]
+            columns += sorted(dc for dc in deviceColumns
+                              if dc.partition("[")[0] == c)
+            if c == "gpu_leaked_mem":
+                if hasLeakedAllocs:
+                    columns.append("gpu_leaked_allocs")
+                columns += sortAttributionColumns(attributionColumns)
+                if hasGPUUtil:
+                    columns += ["gpu_used_mem", "gpu_util", "gpu_util_mean"]
+                if hasHostMetrics:
+                    columns += ["host_mem", "host_leaked_mem", "cpu_util"]
+        return columns
+
     def display(self, tr):
         if not self.groups:
             return
         tr.ensure_newline()
         results_table = GPUTableResults(
-            columns=self.columns,
+            columns=self._getDisplayColumns(),
             sort=self.sort,
             histogram=self.histogram,
             name_format=self.name_format,
@@ -415,6 +1316,14 @@ class GPUBenchmarkSession(pytest_benchmark_session.BenchmarkSession):
             scale_unit=partial(self.config.hook.pytest_benchmark_scale_unit, config=self.config),
         )
         results_table.display(tr, self.groups)
+        displayLeakReports(tr, self.groups)
+        if self.asvRegressionGate is not None:
+            displayRegressionReport(tr, self.asvRegressionGate)
+        if self.skippedWaitRounds:
+            tr.write_line(
+                "GPU measurement: %.2fs saved over %d rounds shorter than "
+                "%ss" % (self.skippedWaitTime, self.skippedWaitRounds,
+                         FIXED_GPU_ROUND_WAIT))
         self.check_regressions()
         self.display_cprofile(tr)
 
@@ -426,52 +1335,269 @@ def gpubenchmark(request, benchmark):
     gpuMaxRounds = request.config.getoption("benchmark_gpu_max_rounds")
     gpuDisable = request.config.getoption("benchmark_gpu_disable")
     customMetricsDisable = request.config.getoption("benchmark_custom_metrics_disable")
+    gpuTracker = request.config.getoption("benchmark_gpu_tracker")
+    gpuLogStreaming = request.config.getoption("benchmark_gpu_log_streaming")
     return GPUBenchmarkFixture(
         benchmark,
         fixtureParamNames=request.node.keywords.get("fixture_param_names"),
         gpuMaxRounds=gpuMaxRounds,
         gpuDisable=gpuDisable,
-        customMetricsDisable=customMetricsDisable)
+        customMetricsDisable=customMetricsDisable,
+        gpuTracker=gpuTracker,
+        gpuLogStreaming=gpuLogStreaming,
+        gpuDeviceNums=_getGPUDeviceNums(request.config),
+        gpuTimelinePoints=request.config.getoption("benchmark_gpu_timeline"),
+        gpuAttribution=request.config.getoption("benchmark_gpu_attribution"),
+        gpuLeakReport=request.config.getoption("benchmark_gpu_leak_report"),
+        gpuSampleInterval=request.config.getoption("benchmark_gpu_sample_interval"),
+        gpuSampler=_getDeviceBackend(request.config),
+        hostSampleInterval=request.config.getoption("benchmark_host_sample_interval"),
+        gpuBenchmarkSession=getattr(request.config, "_gpubenchmarksession", None),
+        gpuMode=request.config.getoption("benchmark_gpu_mode"),
+        targetPrecision=request.config.getoption("benchmark_target_precision"),
+        targetPrecisionStat=request.config.getoption("benchmark_target_precision_stat"),
+        targetPrecisionMaxTime=request.config.getoption("benchmark_target_precision_max_time"))
+
+
+class _WorkerReportCollector:
+    """
+    Plugin registered in --benchmark-gpu-workers workers to collect the test
+    reports to send back to the main session.
+    """
 
+    def __init__(self, config):
+        self.config = config
+        self.reports = []
 
-################################################################################
-def pytest_sessionstart(session):
-    session.config._benchmarksession_orig = session.config._benchmarksession
-    session.config._gpubenchmarksession = \
-        GPUBenchmarkSession(session.config._benchmarksession)
-    session.config._benchmarksession = session.config._gpubenchmarksession
+    def pytest_runtest_logreport(self, report):
+        self.reports.append(self.config.hook.pytest_report_to_serializable(
+            config=self.config, report=report))
+
+
+class _GatheredFixture:
+    """
+    Stands in for the fixture of a benchmark gathered from a
+    --benchmark-gpu-workers worker, which stays in the worker.
+    """
 
+    def __init__(self, has_error):
+        self.has_error = has_error
 
-def _getOSName():
-    try :
-        binout = subprocess.check_output(
-            ["bash", "-c",
-             "source /etc/os-release && echo -n ${ID}-${VERSION_ID}"])
-        return binout.decode()
 
-    except subprocess.CalledProcessError:
-        return None
+def _serializeBenchmark(bench):
+    """
+    Return a picklable copy of the Metadata (or GPUMetadata) bench, without
+    its fixture. cProfile stats cannot be pickled and are not kept.
+    """
+    state = dict(bench.__dict__, fixture=None, cprofile_stats=None)
+    return (type(bench), state, bench.has_error)
+
+
+def _deserializeBenchmark(serializedBench):
+    (benchClass, state, hasError) = serializedBench
+    bench = benchClass.__new__(benchClass)
+    bench.__dict__.update(state)
+    bench.fixture = _GatheredFixture(hasError)
+    return bench
+
 
+def pytest_configure(config):
+    for option in ["benchmark_asv_regression_gate",
+                   "benchmark_asv_skip_existing"]:
+        if config.getoption(option) and \
+           not config.getoption("benchmark_asv_output_dir"):
+            raise pytest.UsageError(
+                "--%s requires --benchmark-asv-output-dir."
+                % option.replace("_", "-"))
+    if config.getoption("benchmark_gpu_worker"):
+        config._gpuWorkerReportCollector = _WorkerReportCollector(config)
+        config.pluginmanager.register(config._gpuWorkerReportCollector,
+                                      "rapids_pytest_benchmark_worker")
 
-def _getCudaVersion():
-    """
-    Get the CUDA version from the CUDA DLL/.so if possible, otherwise return
-    None. (NOTE: is this better than screen scraping nvidia-smi?)
-    """
-    try :
-        lib = ctypes.CDLL("libcudart.so")
-        function = getattr(lib,"cudaRuntimeGetVersion")
-        result = ctypes.c_int()
-        resultPtr = ctypes.pointer(result)
-        function(resultPtr)
-        # The version is returned as (1000 major + 10 minor). For example, CUDA
-        # 9.2 would be represented by 9020
-        major = int(result.value / 1000)
-        minor = int((result.value - (major * 1000)) / 10)
-        return f"{major}.{minor}"
-    # FIXME: do not use a catch-all handler
-    except:
+
+def pytest_collection_modifyitems(config, items):
+    """
+    Restrict a --benchmark-gpu-workers worker to the items it was given, or
+    with --benchmark-asv-skip-existing, deselect the items already in the ASV
+    output dir.
+    """
+    workDir = config.getoption("benchmark_gpu_worker")
+    if workDir:
+        nodeids = set(scheduler.readWorkerItems(workDir))
+        keep = lambda item: item.nodeid in nodeids
+    elif config.getoption("benchmark_asv_skip_existing"):
+        keep = _makeASVExistingFilter(config)
+    else:
+        return
+    (selected, deselected) = ([], [])
+    for item in items:
+        (selected if keep(item) else deselected).append(item)
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        items[:] = selected
+
+
+def _makeASVExistingFilter(config):
+    """
+    Return a function that returns False for items whose time result is
+    already in the ASV output dir for the commit and machine of this session.
+    Each item is an indexed lookup in the ASVHistory of the ASV output dir
+    (which only reads the results files changed since its last use), so this
+    stays fast for databases and sessions with many results.
+    """
+    from .asv_history import ASVHistory
+    metadata = ASVMetadata(config.getoption("benchmark_asv_metadata"),
+                           _getGPUDeviceNums(config)[0])
+    (machineName, commitHash) = (metadata["machineName"],
+                                 metadata["commitHash"])
+    history = ASVHistory(config.getoption("benchmark_asv_output_dir"))
+    config.add_cleanup(history.close)
+
+    def keep(item):
+        callspec = getattr(item, "callspec", None)
+        return not history.has_result(
+            machineName, commitHash,
+            "%s_%s" % (_getHierBenchNameFromFullname(item.nodeid),
+                       ASV_STAT_SUFFIXES["mean"]),
+            callspec.params if callspec is not None else {})
+
+    return keep
+
+
+def pytest_runtestloop(session):
+    """
+    Run the session's items in --benchmark-gpu-workers workers instead of in
+    this process, and gather their reports and benchmarks as if they had run
+    here.
+    """
+    config = session.config
+    devices = config.getoption("benchmark_gpu_workers")
+    if (not devices) or config.getoption("benchmark_gpu_worker") or \
+       config.option.collectonly:
         return None
+    if session.testsfailed and \
+       not config.option.continue_on_collection_errors:
+        raise session.Interrupted(
+            "%d error%s during collection"
+            % (session.testsfailed, "s" if session.testsfailed != 1 else ""))
+
+    nodeids = [item.nodeid for item in session.items]
+    assignments = scheduler.balanceByDuration(
+        nodeids, scheduler.getPastDurations(config), len(devices))
+    workRoot = tempfile.mkdtemp(prefix="rapids_pytest_benchmark_workers_")
+    workers = []
+    for (device, cores, workerNodeids) in zip(
+            devices, scheduler.cpuAffinitySets(len(devices)), assignments):
+        if not workerNodeids:
+            continue
+        workDir = os.path.join(workRoot, "dev%d" % device)
+        # Each worker gets its own basetemp, since pytest clears it
+        args = [*config.invocation_params.args,
+                "--basetemp=%s" % os.path.join(workDir, "basetemp")]
+        workers.append(scheduler.DeviceWorker(
+            device, cores, workerNodeids, args, workDir,
+            cwd=str(config.invocation_params.dir)))
+    for worker in workers:
+        worker.start()
+
+    gpuBenchSess = config._gpubenchmarksession
+    durations = {}
+    for worker in workers:
+        results = worker.wait()
+        if results is None:
+            session.testsfailed += 1
+            config.pluginmanager.get_plugin("terminalreporter").write_line(
+                "GPU worker for device %d failed (exit code %s):\n%s"
+                % (worker.device, worker.returncode, worker.output), red=True)
+            continue
+        lastNodeid = None
+        for data in results["reports"]:
+            report = config.hook.pytest_report_from_serializable(
+                config=config, data=data)
+            if report.nodeid != lastNodeid:
+                if lastNodeid is not None:
+                    config.hook.pytest_runtest_logfinish(
+                        nodeid=lastNodeid, location=lastLocation)
+                config.hook.pytest_runtest_logstart(
+                    nodeid=report.nodeid, location=report.location)
+                (lastNodeid, lastLocation) = (report.nodeid, report.location)
+            config.hook.pytest_runtest_logreport(report=report)
+            durations[report.nodeid] = \
+                durations.get(report.nodeid, 0) + report.duration
+        if lastNodeid is not None:
+            config.hook.pytest_runtest_logfinish(nodeid=lastNodeid,
+                                                 location=lastLocation)
+        gpuBenchSess.benchmarks.extend(
+            _deserializeBenchmark(b) for b in results["benchmarks"])
+        gpuBenchSess.skippedWaitTime += results["skippedWaitTime"]
+        gpuBenchSess.skippedWaitRounds += results["skippedWaitRounds"]
+    scheduler.savePastDurations(config, durations)
+    shutil.rmtree(workRoot, ignore_errors=True)
+    return True
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_teardown(item, nextitem):
+    """
+    Append the benchmarks run by item to the --benchmark-asv-journal once its
+    fixtures are finalized, which completes their stats.
+    """
+    yield
+    config = item.config
+    journal = config.getoption("benchmark_asv_journal")
+    if not journal:
+        return
+    gpuBenchSess = config._gpubenchmarksession
+    benchmarks = gpuBenchSess.benchmarks[gpuBenchSess.numJournaledBenchmarks:]
+    # Benchmarks that failed before any round have no results
+    records = [_getASVJournalRecord(config, bench)
+               for bench in benchmarks if bench]
+    if records:
+        asv_journal.appendRecords(journal, records)
+    gpuBenchSess.numJournaledBenchmarks += len(benchmarks)
+
+
+def _getASVJournalRecord(config, bench):
+    """
+    Return the --benchmark-asv-journal record of bench: its ASV results and
+    what is needed to add them to an ASV database, see asv_journal.
+    """
+    if not hasattr(config, "_asvJournalMetadata"):
+        config._asvJournalMetadata = ASVMetadata(
+            config.getoption("benchmark_asv_metadata"),
+            _getGPUDeviceNums(config)[0])
+    metadata = config._asvJournalMetadata
+    benchName = _getHierBenchNameFromFullname(bench.fullname)
+    params = _getASVParams(bench)
+    record = dict(version=asv_journal.JOURNAL_VERSION,
+                  time=time.time(),
+                  info=_getASVBenchmarkInfo(metadata),
+                  repo=metadata["commitRepo"],
+                  benchmark=bench.fullname,
+                  name=benchName,
+                  params=list(params.items()),
+                  results=_getASVResults(
+                      bench, benchName,
+                      config.getoption("benchmark_asv_stats")))
+    if config.getoption("benchmark_asv_gpu_timelines") and \
+       isinstance(bench.stats, GPUStats):
+        record["gpu_timeline"] = bench.stats.gpu_mem_timeline
+    if config.getoption("benchmark_asv_round_timings") and bench.stats.data:
+        record["round_timings"] = encodeRoundTimings(bench.stats.data)
+    return record
+
+
+################################################################################
+def pytest_sessionstart(session):
+    session.config._benchmarksession_orig = session.config._benchmarksession
+    session.config._gpubenchmarksession = \
+        GPUBenchmarkSession(session.config._benchmarksession)
+    session.config._benchmarksession = session.config._gpubenchmarksession
+    # The main session saves the results gathered from the workers
+    if session.config.getoption("benchmark_gpu_worker"):
+        session.config._benchmarksession_orig.json = None
+        session.config._benchmarksession_orig.save = None
+        session.config._benchmarksession_orig.autosave = None
 
 
 def _ensureListLike(item):
@@ -502,130 +1628,214 @@ def _getHierBenchNameFromFullname(benchFullname):
     return "%s.%s" % (modName, benchName)
 
 
+def _getASVParams(bench):
+    """
+    Return the {name: value} params of bench for its ASV results.
+    """
+    # build the final params dict by extracting them from the
+    # bench.params dictionary. Not all benchmarks are parameterized
+    params = {}
+    bench_params = bench.params.items() if bench.params is not None else []
+    for (paramName, paramVal) in bench_params:
+        # If the params are coming from a fixture, handle them
+        # differently since they will (should be) stored in a special
+        # variable accessible with the name of the fixture.
+        #
+        # NOTE: "fixture_param_names" must be manually set by the
+        # benchmark author/user using the "request" fixture! (see below)
+        #
+        # @pytest.fixture(params=[1,2,3])
+        # def someFixture(request):
+        #     request.keywords["fixture_param_names"] = ["the_param_name"]
+        if hasattr(bench, "fixture_param_names") and \
+           (bench.fixture_param_names is not None) and \
+           (paramName in bench.fixture_param_names):
+            fixtureName = paramName
+            paramNames = _ensureListLike(bench.fixture_param_names[fixtureName])
+            paramValues = _ensureListLike(paramVal)
+            for (pname, pval) in zip(paramNames, paramValues):
+                params[pname] = pval
+        # otherwise, a benchmark/test will have params added to the
+        # bench.params dict as a standard key:value (paramName:paramVal)
+        else:
+            params[paramName] = paramVal
+    return params
+
+
+def _getASVResults(bench, benchName, asvStats):
+    """
+    Return [(name, result, unit)] for the ASV results of bench, named after
+    benchName: the stats, the --benchmark-asv-stats runtime stats, the
+    per-device stats, if more than one device was observed, the
+    per-stream/per-thread stats, if attribution was enabled, and any custom
+    metrics.
+    """
+    results = []
+    statTypes = ["mean", "gpu_mem", "gpu_leaked_mem", "gpu_util",
+                 "gpu_leaked_allocs"]
+    # Only add the sampled stats if sampling was done
+    if getattr(bench.stats, "gpu_util", -1) >= 0:
+        statTypes += ["gpu_util_mean", "gpu_used_mem"]
+    # Likewise for the host stats
+    if getattr(bench.stats, "host_mem", -1) >= 0:
+        statTypes += ["host_mem", "host_leaked_mem", "cpu_time",
+                      "cpu_util"]
+    # Only add the distribution across GPU rounds if there was one
+    if (getattr(bench.stats, "gpu_rounds", 0) or 0) > 1:
+        statTypes += GPU_ROUND_STATS
+    for statType in statTypes:
+        val = getattr(bench.stats, statType, None)
+        if val is not None:
+            results.append(("%s_%s" % (benchName, ASV_STAT_SUFFIXES[statType]),
+                            val, ASV_STAT_UNITS[statType]))
+
+    for statType in asvStats:
+        results.append(("%s_%s_%s" % (benchName, ASV_STAT_SUFFIXES["mean"],
+                                      statType),
+                        getattr(bench.stats, statType),
+                        ASV_RUNTIME_STATS[statType]))
+
+    if isinstance(bench.stats, GPUStats):
+        for deviceStatName in bench.stats.getDeviceStatNames():
+            (statType, _, device) = deviceStatName.rstrip("]").partition("[")
+            results.append(("%s_%s_%s" % (benchName,
+                                          ASV_STAT_SUFFIXES[statType], device),
+                            bench.stats.getDeviceStat(deviceStatName),
+                            ASV_STAT_UNITS[statType]))
+
+        for attrStatName in bench.stats.getAttributionStatNames():
+            (statType, _, label) = attrStatName.rstrip("]").partition("[")
+            results.append(("%s_%s_%s" % (benchName,
+                                          ASV_STAT_SUFFIXES[statType], label),
+                            bench.stats.getAttributionStat(attrStatName),
+                            ASV_STAT_UNITS[statType]))
+
+        for customMetricName in bench.stats.getCustomMetricNames():
+            (result, unitString) = bench.stats.getCustomMetric(customMetricName)
+            results.append(("%s_%s" % (benchName, customMetricName), result,
+                            unitString))
+    return results
+
+
+def _getASVBenchmarkInfo(metadata):
+    """
+    Return the asvdb BenchmarkInfo args for the ASVMetadata metadata.
+    """
+    return dict(machineName=metadata["machineName"],
+                cudaVer=metadata["cudaVer"],
+                osType=metadata["osType"],
+                pythonVer=metadata["pythonVer"],
+                commitHash=metadata["commitHash"],
+                commitTime=metadata["commitTime"],
+                branch=metadata["commitBranch"],
+                gpuType=metadata["gpuType"],
+                cpuType=metadata["cpuType"],
+                arch=metadata["arch"],
+                ram=metadata["ram"],
+                gpuRam=metadata["gpuRam"],
+                requirements=metadata["requirements"])
+
+
 def pytest_sessionfinish(session, exitstatus):
     gpuBenchSess = session.config._gpubenchmarksession
     config = session.config
+    workDir = config.getoption("benchmark_gpu_worker")
+    if workDir:
+        scheduler.writeWorkerResults(workDir, dict(
+            reports=config._gpuWorkerReportCollector.reports,
+            benchmarks=[_serializeBenchmark(bench)
+                        for bench in gpuBenchSess.benchmarks],
+            skippedWaitTime=gpuBenchSess.skippedWaitTime,
+            skippedWaitRounds=gpuBenchSess.skippedWaitRounds))
+        # The main session writes the ASV results
+        return
     asvOutputDir = config.getoption("benchmark_asv_output_dir")
     asvMetadata = config.getoption("benchmark_asv_metadata")
-    gpuDeviceNums = config.getoption("benchmark_gpu_device")
+    gpuDeviceNums = _getGPUDeviceNums(config)
+    asvGPUTimelines = config.getoption("benchmark_asv_gpu_timelines")
+    asvStats = config.getoption("benchmark_asv_stats")
+    asvRoundTimings = config.getoption("benchmark_asv_round_timings")
 
     if asvOutputDir and gpuBenchSess.benchmarks:
+        from asvdb import BenchmarkInfo
 
-        # FIXME: do not lookup commit metadata if already specified on the
-        # command line.
-        (commitHash, commitTime) = asvdbUtils.getCommitInfo()
-        (commitRepo, commitBranch) = asvdbUtils.getRepoInfo()
-
-        # FIXME: do not make pynvml calls if all the metadata provided by pynvml
-        # was specified on the command line.
-        smi.nvmlInit()
-        # only supporting 1 GPU
+        # Only the metadata not given with --benchmark-asv-metadata is probed
+        # for, and most of it only once per boot, see ASVMetadata.
         # FIXME: see if it's possible to auto detect gpu device number instead of
         # manually passing a value
-        gpuDeviceHandle = smi.nvmlDeviceGetHandleByIndex(gpuDeviceNums[0])
-
-        uname = platform.uname()
-        machineName = asvMetadata.get("machineName", uname.machine)
-        cpuType = asvMetadata.get("cpuType", uname.processor)
-        arch = asvMetadata.get("arch", uname.machine)
-        pythonVer = asvMetadata.get("pythonVer",
-            ".".join(platform.python_version_tuple()[:-1]))
-        cudaVer = asvMetadata.get("cudaVer", _getCudaVersion() or "unknown")
-        osType = asvMetadata.get("osType",
-            _getOSName() or platform.linux_distribution()[0])
-        gpuType = asvMetadata.get("gpuType",
-            smi.nvmlDeviceGetName(gpuDeviceHandle).decode())
-        ram = asvMetadata.get("ram", "%d" % psutil.virtual_memory().total)
-        gpuRam = asvMetadata.get("gpuRam",
-            "%d" % smi.nvmlDeviceGetMemoryInfo(gpuDeviceHandle).total)
-
-        commitHash = asvMetadata.get("commitHash", commitHash)
-        commitTime = asvMetadata.get("commitTime", commitTime)
-        commitRepo = asvMetadata.get("commitRepo", commitRepo)
-        commitBranch = asvMetadata.get("commitBranch", commitBranch)
-        requirements = asvMetadata.get("requirements", "{}")
-
-        suffixDict = dict(gpu_util="gpuutil",
-                          gpu_mem="gpumem",
-                          gpu_leaked_mem="gpu_leaked_mem",
-                          mean="time",
-        )
-        unitsDict = dict(gpu_util="percent",
-                         gpu_mem="bytes",
-                         gpu_leaked_mem="bytes",
-                         mean="seconds",
-        )
-
-        db = ASVDb(asvOutputDir, commitRepo, [commitBranch])
-
-        bInfo = BenchmarkInfo(machineName=machineName,
-                              cudaVer=cudaVer,
-                              osType=osType,
-                              pythonVer=pythonVer,
-                              commitHash=commitHash,
-                              commitTime=commitTime,
-                              branch=commitBranch,
-                              gpuType=gpuType,
-                              cpuType=cpuType,
-                              arch=arch,
-                              ram=ram,
-                              gpuRam=gpuRam,
-                              requirements=requirements)
+        metadata = ASVMetadata(asvMetadata, gpuDeviceNums[0])
+        machineName = metadata["machineName"]
+        commitHash = metadata["commitHash"]
+        bInfo = BenchmarkInfo(**_getASVBenchmarkInfo(metadata))
+
+        gpuTimelines = []
+        roundTimings = []
+        # The results of all benchmarks, written in one batch at the end
+        resultList = []
+
+        gate = None
+        if config.getoption("benchmark_asv_regression_gate"):
+            from .asv_history import ASVHistory
+            gate = regression_gate.RegressionGate(
+                ASVHistory(asvOutputDir), machineName, commitHash,
+                config.getoption("benchmark_asv_regression_threshold"),
+                config.getoption("benchmark_asv_regression_confidence"),
+                config.getoption("benchmark_asv_regression_history"))
 
         for bench in gpuBenchSess.benchmarks:
             benchName = _getHierBenchNameFromFullname(bench.fullname)
-            # build the final params dict by extracting them from the
-            # bench.params dictionary. Not all benchmarks are parameterized
-            params = {}
-            bench_params = bench.params.items() if bench.params is not None else []
-            for (paramName, paramVal) in bench_params:
-                # If the params are coming from a fixture, handle them
-                # differently since they will (should be) stored in a special
-                # variable accessible with the name of the fixture.
-                #
-                # NOTE: "fixture_param_names" must be manually set by the
-                # benchmark author/user using the "request" fixture! (see below)
-                #
-                # @pytest.fixture(params=[1,2,3])
-                # def someFixture(request):
-                #     request.keywords["fixture_param_names"] = ["the_param_name"]
-                if hasattr(bench, "fixture_param_names") and \
-                   (bench.fixture_param_names is not None) and \
-                   (paramName in bench.fixture_param_names):
-                    fixtureName = paramName
-                    paramNames = _ensureListLike(bench.fixture_param_names[fixtureName])
-                    paramValues = _ensureListLike(paramVal)
-                    for (pname, pval) in zip(paramNames, paramValues):
-                        params[pname] = pval
-                # otherwise, a benchmark/test will have params added to the
-                # bench.params dict as a standard key:value (paramName:paramVal)
-                else:
-                    params[paramName] = paramVal
-
-            resultList = []
-            for statType in ["mean", "gpu_mem", "gpu_leaked_mem", "gpu_util"]:
-                bn = "%s_%s" % (benchName, suffixDict[statType])
-                val = getattr(bench.stats, statType, None)
-                if val is not None:
-                    bResult = BenchmarkResult(funcName=bn,
-                                              argNameValuePairs=list(params.items()),
-                                              result=val)
-                    bResult.unit = unitsDict[statType]
-                    resultList.append(bResult)
-
-            # If there were any custom metrics, add each of those as well as an
-            # individual result to the same bInfo isntance.
-            if isinstance(bench.stats, GPUStats):
-                for customMetricName in bench.stats.getCustomMetricNames():
-                    (result, unitString) = bench.stats.getCustomMetric(customMetricName)
-                    bn = "%s_%s" % (benchName, customMetricName)
-                    bResult = BenchmarkResult(funcName=bn,
-                                              argNameValuePairs=list(params.items()),
-                                              result=result)
-                    bResult.unit = unitString
-                    resultList.append(bResult)
-
-            db.addResults(bInfo, resultList)
+            params = _getASVParams(bench)
+            resultList += makeASVBenchmarkResults(
+                params, _getASVResults(bench, benchName, asvStats))
+
+            if asvRoundTimings and bench.stats.data:
+                roundTimings.append((benchName, params,
+                                     encodeRoundTimings(bench.stats.data)))
+            if asvGPUTimelines and isinstance(bench.stats, GPUStats) and \
+               (bench.stats.gpu_mem_timeline is not None):
+                gpuTimelines.append((benchName, params,
+                                     bench.stats.gpu_mem_timeline))
+
+            if gate is not None:
+                _checkASVRegressions(gate, bench, benchName, params,
+                                     ASV_STAT_SUFFIXES)
+
+        if gate is not None:
+            # All benchmarks were checked, only the results are reported
+            gate.history.close()
+            gpuBenchSess.asvRegressionGate = gate
+            # Fails the session when the report is displayed, as for
+            # --benchmark-compare-fail
+            for regression in gate.ranked_regressions():
+                gpuBenchSess.performance_regressions.append(
+                    (regression.name, "%s %+.1f%% (z=%.1f)" % (
+                        regression.metric, regression.change * 100,
+                        regression.zscore)))
+
+        writeASVResults(asvOutputDir, metadata["commitRepo"],
+                         metadata["commitBranch"], bInfo, resultList,
+                         gpuTimelines, roundTimings)
+
+
+def _checkASVRegressions(gate, bench, benchName, params, suffixDict):
+    """
+    Check the time, GPU memory and custom metrics of bench against their
+    recent results with gate. The time is the mean, whose standard error is
+    included in the run-to-run variation.
+    """
+    stats = bench.stats
+    gate.check(bench.fullname, "%s_%s" % (benchName, suffixDict["mean"]),
+               params, "time", stats.mean,
+               stderr=stats.stddev / (stats.rounds ** 0.5))
+    gpuMem = getattr(stats, "gpu_mem", -1)
+    if (gpuMem is not None) and (gpuMem >= 0):
+        gate.check(bench.fullname, "%s_%s" % (benchName, suffixDict["gpu_mem"]),
+                   params, "gpu_mem", gpuMem)
+    if isinstance(stats, GPUStats):
+        for customMetricName in stats.getCustomMetricNames():
+            (result, _) = stats.getCustomMetric(customMetricName)
+            gate.check(bench.fullname, "%s_%s" % (benchName, customMetricName),
+                       params, customMetricName, result, two_sided=True)
 
 
 def pytest_report_header(config):
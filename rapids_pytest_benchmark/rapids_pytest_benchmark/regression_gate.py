@@ -0,0 +1,162 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compares a session's results to the recent results of the same benchmarks on
+the same machine in an ASV database (see --benchmark-asv-regression-gate).
+
+A result is a regression if it changed from the median of the recent results
+by more than the threshold for its metric, and by more than the normal
+run-to-run variation of the benchmark: its robust z-score (the change divided
+by 1.4826 x the median absolute deviation of the recent results, which
+estimates their standard deviation without being thrown off by outliers, and
+the standard error of the session's own result) must be beyond the
+--benchmark-asv-regression-confidence quantile of the normal distribution.
+This way noisy benchmarks need a larger change to fail the gate than stable
+ones, and stable ones do not fail it for changes under the threshold.
+"""
+
+import random
+import statistics
+
+# Key in the thresholds dict for the metrics not given a threshold
+DEFAULT_THRESHOLD_KEY = "*"
+
+# Results with fewer recent results than this are not checked
+MIN_HISTORY_RESULTS = 3
+
+# Scales the median absolute deviation of normally distributed values to
+# their standard deviation
+_MAD_TO_STDDEV = 1.4826
+
+_BOOTSTRAP_RESAMPLES = 1000
+
+
+class Regression:
+    """
+    A result that regressed: metric of the benchmark name (with params)
+    changed from baseline, the median of its recent results, to value. ci is
+    the (low, high) bootstrap confidence interval of baseline, change is
+    value / baseline - 1 and zscore the change in units of the run-to-run
+    variation.
+    """
+
+    def __init__(self, name, metric, value, baseline, ci, change, zscore,
+                 num_history):
+        self.name = name
+        self.metric = metric
+        self.value = value
+        self.baseline = baseline
+        self.ci = ci
+        self.change = change
+        self.zscore = zscore
+        self.num_history = num_history
+
+
+def bootstrapMedianCI(values, confidence, resamples=_BOOTSTRAP_RESAMPLES,
+                      seed=0):
+    """
+    Return the (low, high) percentile bootstrap confidence interval of the
+    median of values. The resampling is seeded so reports are reproducible.
+    """
+    rng = random.Random(seed)
+    medians = sorted(statistics.median(rng.choices(values, k=len(values)))
+                     for _ in range(resamples))
+    tail = (1 - confidence) / 2
+    return (medians[int(tail * (resamples - 1))],
+            medians[int(round((1 - tail) * (resamples - 1)))])
+
+
+def checkResult(name, metric, value, history, threshold, confidence,
+                stderr=0, two_sided=False):
+    """
+    Return a Regression if value, the result of metric for the benchmark
+    name, regressed compared to history, the values of its recent results,
+    otherwise None. Higher values are worse, unless two_sided, in which case
+    changes in either direction are regressions (for custom metrics, whose
+    direction is not known). stderr is the standard error of value, if known.
+    """
+    baseline = statistics.median(history)
+    if baseline == 0:
+        return None
+    mad = statistics.median(abs(h - baseline) for h in history)
+    noise = ((_MAD_TO_STDDEV * mad) ** 2 + stderr ** 2) ** 0.5
+    change = value / baseline - 1
+    if noise > 0:
+        zscore = (value - baseline) / noise
+    else:
+        zscore = 0.0 if value == baseline else \
+            float("inf") if value > baseline else float("-inf")
+    normal = statistics.NormalDist()
+    if two_sided:
+        regressed = (abs(change) > threshold) and \
+            (abs(zscore) > normal.inv_cdf(1 - (1 - confidence) / 2))
+    else:
+        regressed = (change > threshold) and \
+            (zscore > normal.inv_cdf(confidence))
+    if not regressed:
+        return None
+    return Regression(name, metric, value, baseline,
+                      bootstrapMedianCI(history, confidence), change, zscore,
+                      len(history))
+
+
+class RegressionGate:
+    """
+    Checks results against their recent results in history (an
+    asv_history.ASVHistory) on machine, leaving out those for commit_hash,
+    the commit being benchmarked. thresholds is {metric: minimum relative
+    change}, with DEFAULT_THRESHOLD_KEY for the metrics not listed, and
+    num_history the number of recent results to compare to.
+    """
+
+    def __init__(self, history, machine, commit_hash, thresholds, confidence,
+                 num_history):
+        self.history = history
+        self.machine = machine
+        self.commit_hash = commit_hash
+        self.thresholds = thresholds
+        self.confidence = confidence
+        self.num_history = num_history
+        self.regressions = []
+        self.num_checked = 0
+        self.num_without_history = 0
+
+    def check(self, name, asv_name, params, metric, value, stderr=0,
+              two_sided=False):
+        """
+        Check value, the result of metric for the benchmark name, recorded in
+        ASV as asv_name with params.
+        """
+        if not isinstance(value, (int, float)):
+            return
+        history = [v for (_, v) in self.history.get_history(
+            self.machine, asv_name, params, exclude_commit=self.commit_hash,
+            limit=self.num_history)]
+        if len(history) < MIN_HISTORY_RESULTS:
+            self.num_without_history += 1
+            return
+        self.num_checked += 1
+        threshold = self.thresholds.get(
+            metric, self.thresholds[DEFAULT_THRESHOLD_KEY])
+        regression = checkResult(name, metric, value, history, threshold,
+                                 self.confidence, stderr, two_sided)
+        if regression is not None:
+            self.regressions.append(regression)
+
+    def ranked_regressions(self):
+        """
+        Return the regressions, largest change first.
+        """
+        return sorted(self.regressions, key=lambda r: abs(r.change),
+                      reverse=True)
@@ -22,10 +22,125 @@ NUMBER_FMT = pytest_benchmark_table.NUMBER_FMT
 ALIGNED_NUMBER_FMT = pytest_benchmark_table.ALIGNED_NUMBER_FMT
 INT_NUMBER_FMT = "{0:,d}" if sys.version_info[:2] > (2, 6) else "{0:d}"
 ALIGNED_INT_NUMBER_FMT = "{0:>{1},d}{2:<{3}}" if sys.version_info[:2] > (2, 6) else "{0:>{1}d}{2:<{3}}"
+PERCENT_FMT = "{0:.1f}"
+ALIGNED_PERCENT_FMT = "{0:>{1}.1f}{2:<{3}}"
+
+
+GPU_MEM_COLUMNS = ("gpu_mem", "gpu_leaked_mem")
+GPU_UTIL_COLUMNS = ("gpu_util", "gpu_util_mean", "cpu_util")
+# Columns displayed as percentages
+PERCENT_COLUMNS = GPU_UTIL_COLUMNS + ("precision",)
+GPU_ROUND_COLUMNS = tuple("%s_%s" % (name, stat) for name in GPU_MEM_COLUMNS
+                          for stat in ("min", "median", "stddev"))
+GPU_ATTRIBUTION_COLUMNS = ("gpu_mem", "gpu_allocs", "gpu_alloc_bytes")
+
+
+def isDeviceColumn(column):
+    """
+    Return True if column is a per-device GPU column, such as "gpu_mem[dev1]"
+    """
+    (name, _, label) = column.partition("[")
+    return name in GPU_MEM_COLUMNS and label.startswith("dev") and \
+        label.endswith("]")
+
+
+def isAttributionColumn(column):
+    """
+    Return True if column is a per-stream or per-thread GPU column, such as
+    "gpu_allocs[stream1]" or "gpu_mem[thread0]"
+    """
+    (name, _, label) = column.partition("[")
+    return name in GPU_ATTRIBUTION_COLUMNS and \
+        label.startswith(("stream", "thread")) and label.endswith("]")
+
+
+def sortAttributionColumns(columns):
+    """
+    Return the attribution columns grouped by stat, then streams before
+    threads, each in label order (so "stream10" follows "stream9").
+    """
+    def key(column):
+        (name, _, label) = column.rstrip("]").partition("[")
+        prefix = label.rstrip("0123456789")
+        return (GPU_ATTRIBUTION_COLUMNS.index(name), prefix,
+                int(label[len(prefix):]))
+    return sorted(columns, key=key)
+
+
+def _isGPUIntColumn(column):
+    return column in GPU_MEM_COLUMNS or column in GPU_ROUND_COLUMNS or \
+        column in ("gpu_leaked_allocs", "gpu_used_mem", "host_mem",
+                   "host_leaked_mem") or \
+        isDeviceColumn(column) or isAttributionColumn(column)
+
+
+def displayLeakReports(tr, groups):
+    """
+    Write the GPU leak report of each benchmark that has one (see
+    --benchmark-gpu-leak-report): the number and bytes of allocations never
+    freed, their size distribution, and the largest of them.
+    """
+    benchmarks = [bench for (_, benchmarks) in groups for bench in benchmarks
+                  if bench.get("gpu_leak_report")]
+    if not benchmarks:
+        return
+    tr.write_line("GPU leaks:", yellow=True, bold=True)
+    for bench in benchmarks:
+        report = bench["gpu_leak_report"]
+        tr.write_line(
+            "  {0}: {1} allocations, {2} bytes not freed"
+            " ({3} frees of earlier allocations, {4} bytes)".format(
+                bench["name"],
+                INT_NUMBER_FMT.format(report["leaked_allocs"]),
+                INT_NUMBER_FMT.format(report["leaked_bytes"]),
+                INT_NUMBER_FMT.format(report["unmatched_frees"]),
+                INT_NUMBER_FMT.format(report["unmatched_free_bytes"])))
+        if report["size_histogram"]:
+            tr.write_line("    sizes: " + ", ".join(
+                "{0}+: {1}".format(INT_NUMBER_FMT.format(minSize),
+                                   INT_NUMBER_FMT.format(count))
+                for (minSize, count, _) in report["size_histogram"]))
+        for leak in report["largest"]:
+            tr.write_line(
+                "    {0:>15} bytes at {1:.6f}s  ptr {2}  device {3}"
+                "  thread {4}  stream {5}".format(
+                    INT_NUMBER_FMT.format(leak["size"]), leak["time"],
+                    leak["pointer"], leak["device"], leak["thread"],
+                    leak["stream"]))
+    tr.write_line("")
+
+
+def displayRegressionReport(tr, gate):
+    """
+    Write the results of --benchmark-asv-regression-gate: how many results
+    were checked, and each regression (largest change first) with its change,
+    the median of the recent results it was compared to and the bootstrap
+    confidence interval of that median, and its z-score.
+    """
+    regressions = gate.ranked_regressions()
+    summary = "ASV regression gate: {0} regressions in {1} results compared " \
+              "to up to {2} recent results on {3}".format(
+                  len(regressions), gate.num_checked, gate.num_history,
+                  gate.machine)
+    if gate.num_without_history:
+        summary += " ({0} results with too few recent results not " \
+                   "checked)".format(gate.num_without_history)
+    tr.write_line(summary, red=bool(regressions), bold=True)
+    for regression in regressions:
+        tr.write_line(
+            "  {0:>+7.1f}%  {1} {2}: {3:.6g} vs. median {4:.6g} "
+            "({5:.0%} CI {6:.6g} - {7:.6g}) of {8} results, z={9:.1f}".format(
+                regression.change * 100, regression.name, regression.metric,
+                regression.value, regression.baseline, gate.confidence,
+                regression.ci[0], regression.ci[1], regression.num_history,
+                regression.zscore))
+    tr.write_line("")
 
 
 class GPUTableResults(pytest_benchmark_table.TableResults):
     def display(self, tr, groups, progress_reporter=pytest_benchmark_utils.report_progress):
+        intColumns = [c for c in self.columns if _isGPUIntColumn(c)]
+        utilColumns = [c for c in self.columns if c in PERCENT_COLUMNS]
         tr.write_line("")
         tr.rewrite("Computing stats ...", black=True, bold=True)
         for line, (group, benchmarks) in progress_reporter(groups, tr, "Computing stats ... group {pos}/{total}"):
@@ -36,10 +151,10 @@ class GPUTableResults(pytest_benchmark_table.TableResults):
             worst = {}
             best = {}
             solo = len(benchmarks) == 1
-            for line, prop in progress_reporter(("min", "max", "mean", "median", "iqr", "stddev", "gpu_mem", "gpu_leaked_mem", "ops"),
+            for line, prop in progress_reporter(("min", "max", "mean", "median", "iqr", "stddev", *intColumns, *utilColumns, "ops"),
                                                 tr, "{line}: {value}", line=line):
                 # During a compare, current or previous results may not have gpu keys
-                if prop not in bench:
+                if not [b for b in benchmarks if prop in b]:
                     continue
 
                 if prop == "ops":
@@ -71,6 +186,22 @@ class GPUTableResults(pytest_benchmark_table.TableResults):
                 "stddev": "StdDev",
                 "gpu_mem": "GPU mem",
                 "gpu_leaked_mem": "GPU Leaked mem",
+                "gpu_leaked_allocs": "GPU Leaked allocs",
+                "gpu_used_mem": "GPU used mem",
+                "gpu_util": "GPU util %",
+                "gpu_util_mean": "GPU util mean %",
+                "precision": "Precision %",
+                "host_mem": "Host mem",
+                "host_leaked_mem": "Host Leaked mem",
+                "cpu_util": "CPU util %",
+                "gpu_mem_min": "GPU mem Min",
+                "gpu_mem_median": "GPU mem Median",
+                "gpu_mem_stddev": "GPU mem StdDev",
+                "gpu_leaked_mem_min": "GPU Leaked mem Min",
+                "gpu_leaked_mem_median": "GPU Leaked mem Median",
+                "gpu_leaked_mem_stddev": "GPU Leaked mem StdDev",
+                "gpu_allocs": "GPU allocs",
+                "gpu_alloc_bytes": "GPU alloc bytes",
                 "rounds": "Rounds",
                 "gpu_rounds": "GPU Rounds",
                 "iterations": "Iterations",
@@ -79,6 +210,10 @@ class GPUTableResults(pytest_benchmark_table.TableResults):
                 "outliers": "Outliers",
                 "ops": "OPS ({0}ops/s)".format(ops_unit) if ops_unit else "OPS",
             }
+            for prop in intColumns:
+                if isDeviceColumn(prop) or isAttributionColumn(prop):
+                    (name, _, label) = prop.partition("[")
+                    labels[prop] = "%s [%s" % (labels[name], label)
             widths = {
                 "name": 3 + max(len(labels["name"]), max(len(benchmark["name"]) for benchmark in benchmarks)),
                 "rounds": 2 + max(len(labels["rounds"]), len(str(worst["rounds"]))),
@@ -95,10 +230,16 @@ class GPUTableResults(pytest_benchmark_table.TableResults):
                     len(NUMBER_FMT.format(bench[prop] * adjustment))
                     for bench in benchmarks if prop in bench
                 ))
-            for prop in ["gpu_mem", "gpu_leaked_mem"]:
+            for prop in intColumns:
                 if [b for b in benchmarks if prop in b]:
                     widths[prop] = 2 + max(len(labels[prop]), max(
-                        len(INT_NUMBER_FMT.format(bench[prop]))
+                        len(INT_NUMBER_FMT.format(round(bench[prop])))
+                        for bench in benchmarks if prop in bench
+                    ))
+            for prop in utilColumns:
+                if [b for b in benchmarks if prop in b]:
+                    widths[prop] = 2 + max(len(labels[prop]), max(
+                        len(PERCENT_FMT.format(bench[prop]))
                         for bench in benchmarks if prop in bench
                     ))
 
@@ -142,9 +283,21 @@ class GPUTableResults(pytest_benchmark_table.TableResults):
                             red=not solo and bench[prop] == worst.get(prop),
                             bold=True,
                         )
-                    elif prop in ("gpu_mem", "gpu_leaked_mem"):
+                    elif prop in intColumns:
                         tr.write(
                             ALIGNED_INT_NUMBER_FMT.format(
+                                round(bench[prop]),
+                                widths[prop],
+                                pytest_benchmark_table.compute_baseline_scale(best[prop], bench[prop], rpadding),
+                                rpadding
+                            ),
+                            green=not solo and bench[prop] == best.get(prop),
+                            red=not solo and bench[prop] == worst.get(prop),
+                            bold=True,
+                        )
+                    elif prop in utilColumns:
+                        tr.write(
+                            ALIGNED_PERCENT_FMT.format(
                                 bench[prop],
                                 widths[prop],
                                 pytest_benchmark_table.compute_baseline_scale(best[prop], bench[prop], rpadding),
@@ -11,64 +11,1063 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import abc
 import os
-import csv
-import rmm
+import time
+import ctypes
+import datetime
+import threading
 import tempfile
+from functools import partial
 
+import numpy as np
 
-class RMMResourceAnalyzer:
+# fallocate(2) flags used to give back the disk blocks of log data that has
+# already been consumed, without changing the file size or the offsets the RMM
+# logger is writing at.
+_FALLOC_FL_KEEP_SIZE = 0x01
+_FALLOC_FL_PUNCH_HOLE = 0x02
+
+_fallocate = None
+
+_MICROSECONDS_PER_DAY = 24 * 60 * 60 * 10**6
+
+
+def _releaseFileRange(fd, offset, length):
+    """
+    Deallocate the disk blocks backing [offset, offset+length) of the open file
+    fd. Reads of the range return zeros afterwards, but the file size is
+    unchanged so a writer appending to the file is not affected. Returns False
+    if the platform or filesystem does not support this.
+    """
+    global _fallocate
+    if _fallocate is None:
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            _fallocate = libc.fallocate
+            _fallocate.argtypes = [ctypes.c_int, ctypes.c_int,
+                                   ctypes.c_longlong, ctypes.c_longlong]
+            _fallocate.restype = ctypes.c_int
+        except (OSError, AttributeError):
+            _fallocate = False
+    if not _fallocate:
+        return False
+    return _fallocate(fd, _FALLOC_FL_PUNCH_HOLE | _FALLOC_FL_KEEP_SIZE,
+                      offset, length) == 0
+
+
+def _parseLogTimes(times):
+    """
+    Convert an array of RMM log timestamps, which RMM formats as
+    "HH:MM:SS.ffffff" (local time), to integer microseconds since midnight.
+    """
+    digits = times.astype("S15").view(np.uint8).reshape(len(times), 15)
+    digits = digits.astype(np.int64) - ord("0")
+    hours = digits[:, 0] * 10 + digits[:, 1]
+    minutes = digits[:, 3] * 10 + digits[:, 4]
+    seconds = digits[:, 6] * 10 + digits[:, 7]
+    microseconds = digits[:, 9:15] @ (10 ** np.arange(5, -1, -1))
+    return ((hours * 60 + minutes) * 60 + seconds) * 10**6 + microseconds
+
+
+def _parseLogPointers(pointers):
+    """
+    Convert an array of RMM log pointers, formatted as hex strings such as
+    "0x7f3a5c000000", to uint64.
+    """
+    chars = pointers.astype("S18").view(np.uint8).reshape(len(pointers), 18)
+    chars = chars[:, 2:]  # skip the "0x"
+    is_digit = (chars != 0)
+    lengths = is_digit.sum(axis=1)
+    chars = chars | 0x20  # lowercase
+    digits = np.where(chars >= ord("a"), chars - (ord("a") - 10),
+                      chars - ord("0")).astype(np.uint64)
+    shifts = (lengths[:, None] - 1 - np.arange(chars.shape[1])) * 4
+    digits = np.where(is_digit, digits << shifts.clip(0).astype(np.uint64), 0)
+    return np.bitwise_or.reduce(digits, axis=1)
+
+
+def _logClockNow(startDate):
+    """
+    Return the current time on the clock used for RMM log timestamps after
+    they have been unwrapped by RMMLogFileReader: microseconds since midnight
+    of startDate.
+    """
+    now = datetime.datetime.now()
+    midnight = datetime.datetime.combine(startDate, datetime.time())
+    return (now - midnight) // datetime.timedelta(microseconds=1)
+
+
+def _concatBatches(batches):
+    return {field: np.concatenate([batch[field] for batch in batches])
+            for field in batches[0]}
+
+
+def _takeBatch(batch, indices):
+    return {field: values[indices] for (field, values) in batch.items()}
+
+
+class MemoryUsageCounter:
     """
-    Class to control enabling, disabling, & parsing RMM resource
-    logs.
+    Running totals for a sequence of RMM allocate/free events: the current
+    usage and the peak usage observed at any allocation.
     """
 
     def __init__(self):
-        self.max_gpu_util = -1
+        self.current = 0
+        self.peak = 0
+
+    def update(self, actions, sizes):
+        """
+        Fold a batch of events, given as equal-length arrays of action strings
+        and sizes, into the totals. The running usage is computed as a signed
+        cumulative sum continuing from the current usage, and is returned as
+        an array with the usage after each event.
+        """
+        if len(actions) == 0:
+            return None
+        is_alloc = (actions == b"allocate")
+        deltas = np.where(is_alloc, sizes, 0)
+        deltas -= np.where(actions == b"free", sizes, 0)
+        usage = np.cumsum(deltas)
+        usage += self.current
+        if is_alloc.any():
+            self.peak = max(self.peak, int(usage[is_alloc].max()))
+        self.current = int(usage[-1])
+        return usage
+
+
+class MemoryTimeline:
+    """
+    Bounded-size record of memory usage over time. Samples are grouped into
+    equal-width time buckets and only the minimum and maximum sample of each
+    bucket are kept, which preserves the shape of the curve, including the
+    exact peak. When there are more than max_points / 2 buckets, the bucket
+    width is doubled, so the size stays bounded however many samples are
+    added and the time range does not need to be known up front.
+    """
+
+    def __init__(self, max_points=200):
+        self.max_points = max(max_points, 2)
+        self._start_time = None
+        self._bucket_width = 1
+        self._times = np.empty(0, dtype=np.int64)
+        self._values = np.empty(0, dtype=np.int64)
+
+    def update(self, times, values):
+        """
+        Add samples, given as equal-length arrays of integer timestamps and
+        usage values.
+        """
+        if len(times) == 0:
+            return
+        if self._start_time is None:
+            self._start_time = int(times[0])
+        times = np.concatenate([self._times, times])
+        values = np.concatenate([self._values, values])
+        buckets = (times - self._start_time) // self._bucket_width
+        while len(np.unique(buckets)) > (self.max_points // 2):
+            self._bucket_width *= 2
+            buckets = (times - self._start_time) // self._bucket_width
+        # Sort by bucket then value, the first sample of each bucket is then
+        # its min and the last is its max.
+        order = np.lexsort((values, buckets))
+        sorted_buckets = buckets[order]
+        is_first = np.ones(len(order), dtype=bool)
+        is_first[1:] = sorted_buckets[1:] != sorted_buckets[:-1]
+        is_last = np.ones(len(order), dtype=bool)
+        is_last[:-1] = is_first[1:]
+        keep = np.sort(order[is_first | is_last])
+        self._times = times[keep]
+        self._values = values[keep]
+
+    def points(self, time_scale=1e-6):
+        """
+        Return the timeline as a list of [time, value] pairs in time order,
+        with times relative to the first sample and multiplied by time_scale
+        (microseconds to seconds by default).
+        """
+        order = np.argsort(self._times, kind="stable")
+        return [[(int(t) - self._start_time) * time_scale, int(v)]
+                for (t, v) in zip(self._times[order], self._values[order])]
+
+
+class MemoryAttribution:
+    """
+    Memory usage broken down by the value of one log column, such as the
+    stream or the host thread. Each value gets its own MemoryUsageCounter, fed
+    with only the events carrying that value, plus a count of allocations and
+    of bytes allocated. A free is attributed to the value recorded with the
+    free event itself.
+
+    Raw stream pointers and thread ids change from run to run, so values are
+    labeled by order of first appearance, eg. "stream0", "stream1". The raw
+    value of each label is kept in ids.
+    """
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.ids = {}
+        self.counters = {}
+        self.alloc_counts = {}
+        self.alloc_bytes = {}
+        self._labels = {}
+
+    def update(self, keys, actions, sizes):
+        """
+        Fold a batch of events, given as equal-length arrays of keys (the
+        column values), action strings and sizes, in time order.
+        """
+        if len(keys) == 0:
+            return
+        (unique_keys, first_index, inverse) = np.unique(
+            keys, return_index=True, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        # Visit keys in order of first appearance so labels are assigned in
+        # that order.
+        for i in np.argsort(first_index, kind="stable"):
+            label = self._get_label(unique_keys[i])
+            is_key = (inverse == i)
+            key_actions = actions[is_key]
+            key_sizes = sizes[is_key]
+            self.counters[label].update(key_actions, key_sizes)
+            is_alloc = (key_actions == b"allocate")
+            self.alloc_counts[label] += int(is_alloc.sum())
+            self.alloc_bytes[label] += int(key_sizes[is_alloc].sum())
+
+    def results(self):
+        """
+        Return {label: {"mem": peak bytes, "allocs": number of allocations,
+        "alloc_bytes": bytes allocated}}.
+        """
+        return {label: {"mem": counter.peak,
+                        "allocs": self.alloc_counts[label],
+                        "alloc_bytes": self.alloc_bytes[label]}
+                for (label, counter) in self.counters.items()}
+
+    def _get_label(self, key):
+        label = self._labels.get(key)
+        if label is None:
+            label = "%s%d" % (self.prefix, len(self._labels))
+            self._labels[key] = label
+            self.ids[label] = key.decode()
+            self.counters[label] = MemoryUsageCounter()
+            self.alloc_counts[label] = 0
+            self.alloc_bytes[label] = 0
+        return label
+
+
+class OpenAllocationIndex:
+    """
+    The allocations that have not been freed yet, found by pairing allocate
+    and free events by pointer. The open allocations are kept in parallel
+    NumPy arrays sorted by pointer, with the thread and stream stored as
+    small integer codes, so each takes 32 bytes and millions of them fit
+    easily. A batch of events is applied with one stable sort instead of a
+    dict operation per event.
+
+    A free whose allocate was not seen, eg. because it happened before
+    tracking started, is counted as an unmatched free and does not reduce the
+    leaked bytes.
+    """
+    fields = (
+        ("pointer", np.uint64),
+        ("size", np.int64),
+        ("time", np.int64),
+        ("thread", np.uint32),
+        ("stream", np.uint32),
+    )
+
+    def __init__(self):
+        self.unmatched_frees = 0
+        self.unmatched_free_bytes = 0
+        self._open = {field: np.empty(0, dtype=dtype)
+                      for (field, dtype) in self.fields}
+        # raw id -> code, and code -> raw id, for the thread and stream
+        self._codes = {"thread": {}, "stream": {}}
+        self._ids = {"thread": [], "stream": []}
+
+    def __len__(self):
+        return len(self._open["pointer"])
+
+    @property
+    def leaked_bytes(self):
+        return int(self._open["size"].sum())
+
+    def update(self, batch):
+        """
+        Apply a batch of events in time order. The batch must have the
+        "pointer", "thread" and "stream" fields as well as the required ones,
+        see MemoryUsageAggregator.
+        """
+        is_alloc = (batch["action"] == b"allocate")
+        is_event = is_alloc | (batch["action"] == b"free")
+        if not is_event.any():
+            return
+        events = {
+            "pointer": batch["pointer"][is_event],
+            "size": batch["size"][is_event],
+            "time": batch["time"][is_event],
+            "thread": self._encode("thread", batch["thread"][is_event]),
+            "stream": self._encode("stream", batch["stream"][is_event]),
+        }
+        combined = {field: np.concatenate([self._open[field], events[field]])
+                    for (field, _) in self.fields}
+        is_alloc = np.concatenate([np.ones(len(self), dtype=bool),
+                                   is_alloc[is_event]])
+        # Group the events by pointer. The sort is stable so each group stays
+        # in time order, after the open allocation (if any) it starts with.
+        # The open allocations are already sorted, which the sort takes
+        # advantage of.
+        order = np.argsort(combined["pointer"], kind="stable")
+        pointers = combined["pointer"][order]
+        is_alloc = is_alloc[order]
+        same_as_previous = np.zeros(len(order), dtype=bool)
+        same_as_previous[1:] = (pointers[1:] == pointers[:-1])
+        # A free is matched if the event before it in its group allocated
+        follows_alloc = np.zeros(len(order), dtype=bool)
+        follows_alloc[1:] = is_alloc[:-1]
+        is_unmatched = ~is_alloc & ~(same_as_previous & follows_alloc)
+        unmatched_sizes = combined["size"][order][is_unmatched]
+        self.unmatched_frees += len(unmatched_sizes)
+        self.unmatched_free_bytes += int(unmatched_sizes.sum())
+        # A pointer is still open if the last event in its group allocated
+        is_last = np.ones(len(order), dtype=bool)
+        is_last[:-1] = ~same_as_previous[1:]
+        keep = order[is_last & is_alloc]
+        self._open = {field: values[keep]
+                      for (field, values) in combined.items()}
+
+    def size_histogram(self):
+        """
+        Return the open allocations grouped by size into power of 2 buckets,
+        as a list of [min size, count, bytes] for each non-empty bucket.
+        """
+        sizes = self._open["size"]
+        # Bucket b holds sizes in [2**(b-1), 2**b), and bucket 0 holds 0
+        buckets = np.searchsorted(1 << np.arange(63, dtype=np.int64), sizes,
+                                  side="right")
+        counts = np.bincount(buckets)
+        totals = np.zeros(len(counts), dtype=np.int64)
+        np.add.at(totals, buckets, sizes)
+        return [[(1 << int(b - 1)) if b else 0, int(counts[b]), int(totals[b])]
+                for b in np.flatnonzero(counts)]
+
+    def largest(self, n):
+        """
+        Return the n largest open allocations, largest first, as a list of
+        dicts with the pointer, size, time, thread and stream of each.
+        """
+        sizes = self._open["size"]
+        if n < len(sizes):
+            indices = np.argpartition(sizes, len(sizes) - n)[len(sizes) - n:]
+        else:
+            indices = np.arange(len(sizes))
+        indices = indices[np.argsort(sizes[indices], kind="stable")[::-1]]
+        return [{"pointer": hex(int(self._open["pointer"][i])),
+                 "size": int(sizes[i]),
+                 "time": int(self._open["time"][i]),
+                 "thread": self._ids["thread"][self._open["thread"][i]],
+                 "stream": self._ids["stream"][self._open["stream"][i]]}
+                for i in indices]
+
+    def _encode(self, field, keys):
+        codes = self._codes[field]
+        ids = self._ids[field]
+        (unique_keys, inverse) = np.unique(keys, return_inverse=True)
+        unique_codes = np.empty(len(unique_keys), dtype=np.uint32)
+        for (i, key) in enumerate(unique_keys):
+            if key not in codes:
+                codes[key] = len(ids)
+                ids.append(key.decode())
+            unique_codes[i] = codes[key]
+        return unique_codes[inverse.reshape(-1)]
+
+
+class MemoryUsageAggregator:
+    """
+    Folds batches of events from one or more devices into a MemoryUsageCounter
+    per device, plus a counter for the total across all devices. Events for
+    the total are merged by timestamp so its peak is the true concurrent peak.
+
+    A batch is a dict of equal-length arrays, with at least the fields "time"
+    (int64 microseconds), "action" (bytes) and "size" (int64). Batches for a
+    device must be added in time order. If attribution is True, batches must
+    also have "stream" and "thread" fields (bytes), and the merged events are
+    also broken down by stream and by thread, see MemoryAttribution. If
+    leak_tracking is True, batches must also have a "pointer" field (uint64)
+    and the allocations left open on each device are kept, see
+    OpenAllocationIndex.
+    """
+    # Batch fields the merged events can be broken down by
+    attribution_fields = ("stream", "thread")
+
+    def __init__(self, devices, timeline_points=0, attribution=False,
+                 leak_tracking=False):
+        self.device_counters = {device: MemoryUsageCounter()
+                                for device in devices}
+        self.total_counter = MemoryUsageCounter()
+        # Usage over time of the total across devices, if requested
+        self.timeline = None
+        if timeline_points:
+            self.timeline = MemoryTimeline(timeline_points)
+        self.attributions = {}
+        if attribution:
+            self.attributions = {field: MemoryAttribution(field)
+                                 for field in self.attribution_fields}
+        self.open_allocations = {}
+        if leak_tracking:
+            self.open_allocations = {device: OpenAllocationIndex()
+                                     for device in devices}
+        # The earliest event time seen on any device
+        self.start_time = None
+        self._pending = {device: [] for device in devices}
+
+    @property
+    def extra_fields(self):
+        """
+        The optional batch fields needed, see RMMLogFileReader.
+        """
+        fields = set()
+        if self.attributions:
+            fields.update(self.attribution_fields)
+        if self.open_allocations:
+            fields.update(("pointer", "thread", "stream"))
+        return sorted(fields)
+
+    def add(self, device, batch):
+        self.device_counters[device].update(batch["action"], batch["size"])
+        if self.open_allocations:
+            self.open_allocations[device].update(batch)
+        if len(batch["time"]):
+            first_time = int(batch["time"][0])
+            if self.start_time is None or first_time < self.start_time:
+                self.start_time = first_time
+        self._pending[device].append(batch)
+
+    def merge(self, watermark=None):
+        """
+        Fold the pending events of all devices with a timestamp <= watermark
+        into the total counter in timestamp order. Events after the watermark
+        are kept until a later call. All pending events are folded if
+        watermark is None.
+        """
+        ready = []
+        for (device, batches) in self._pending.items():
+            if not batches:
+                continue
+            pending = _concatBatches(batches)
+            if watermark is None:
+                ready.append(pending)
+                batches.clear()
+            else:
+                is_ready = pending["time"] <= watermark
+                ready.append(_takeBatch(pending, is_ready))
+                batches[:] = [_takeBatch(pending, ~is_ready)]
+        if not ready:
+            return
+        merged = _concatBatches(ready)
+        order = np.argsort(merged["time"], kind="stable")
+        actions = merged["action"][order]
+        sizes = merged["size"][order]
+        usage = self.total_counter.update(actions, sizes)
+        if self.timeline is not None and usage is not None:
+            self.timeline.update(merged["time"][order], usage)
+        for (field, attribution) in self.attributions.items():
+            attribution.update(merged[field][order], actions, sizes)
+
+
+class RMMLogFileReader:
+    """
+    Incrementally reads the rows appended to a single RMM CSV log file since
+    the last read. Rows are read in large chunks and parsed into columnar
+    batches (see MemoryUsageAggregator) rather than one at a time. Only
+    complete lines are consumed, and the disk space of consumed data is
+    optionally released as the reader moves past it.
+
+    Timestamps are unwrapped across midnight, so they keep increasing for logs
+    that span more than one day. The optional columns are only parsed if
+    their field is in extra_fields.
+    """
+    # (RMM log column name, batch field name, dtype parsed from the CSV)
+    columns = [
+        ("Time", "time", "S15"),
+        ("Action", "action", "S16"),
+        ("Size", "size", np.int64),
+    ]
+    optional_columns = [
+        ("Thread", "thread", "S32"),
+        ("Stream", "stream", "S20"),
+        ("Pointer", "pointer", "S18"),
+    ]
+
+    def __init__(self, log_file, chunk_size=1 << 24, release_consumed=True,
+                 extra_fields=()):
+        self.log_file = log_file
+        self.columns = self.columns + [column for column in self.optional_columns
+                                       if column[1] in extra_fields]
+        self.last_time = None
+        self._chunk_size = chunk_size
+        self._release_consumed = release_consumed
+        self._file = None
+        self._offset = 0
+        self._released_offset = 0
+        self._partial_line = b""
+        self._usecols = None
+        self._days = 0
+
+    def read_chunk(self):
+        """
+        Read and parse up to one chunk of complete rows. Returns None if there
+        are no new complete rows in the log file.
+        """
+        if self._file is None:
+            try:
+                self._file = open(self.log_file, mode="rb")
+            except FileNotFoundError:
+                # RMM has not created the log yet, try again next time
+                return None
+        while True:
+            chunk = self._file.read(self._chunk_size)
+            if not chunk:
+                return None
+            self._offset += len(chunk)
+            lines = (self._partial_line + chunk).split(b"\n")
+            self._partial_line = lines.pop()
+            batch = self._parse_lines(lines)
+            self._release()
+            if batch is not None:
+                return batch
+
+    def consume(self, sink):
+        """
+        Read all complete rows currently in the log file, passing each batch
+        to sink.
+        """
+        while True:
+            batch = self.read_chunk()
+            if batch is None:
+                break
+            sink(batch)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _parse_lines(self, lines):
+        if self._usecols is None and lines:
+            header = lines.pop(0).decode().strip().split(",")
+            self._usecols = [header.index(name) for (name, _, _) in self.columns]
+        if not lines:
+            return None
+        rows = np.loadtxt([line.decode() for line in lines],
+                          delimiter=",", usecols=self._usecols,
+                          dtype=[(field, dtype)
+                                 for (_, field, dtype) in self.columns],
+                          ndmin=1)
+        if len(rows) == 0:
+            return None
+        batch = {field: rows[field] for (_, field, _) in self.columns}
+        batch["time"] = self._unwrap_times(_parseLogTimes(batch["time"]))
+        if "pointer" in batch:
+            batch["pointer"] = _parseLogPointers(batch["pointer"])
+        return batch
+
+    def _unwrap_times(self, times):
+        """
+        RMM log timestamps are a time of day, so add a day each time they go
+        backwards by more than half a day.
+        """
+        previous = np.empty_like(times)
+        previous[0] = times[0] if self.last_time is None else \
+            self.last_time - (self._days * _MICROSECONDS_PER_DAY)
+        previous[1:] = times[:-1]
+        days = self._days + np.cumsum(
+            times < (previous - (_MICROSECONDS_PER_DAY // 2)))
+        self._days = int(days[-1])
+        times = times + (days * _MICROSECONDS_PER_DAY)
+        self.last_time = int(times[-1])
+        return times
+
+    def _release(self):
+        """
+        Give back the disk space of all whole blocks that have been consumed.
+        """
+        if not self._release_consumed:
+            return
+        consumed = self._offset - len(self._partial_line)
+        end = consumed - (consumed % self._chunk_size)
+        if end > self._released_offset:
+            if _releaseFileRange(self._file.fileno(), self._released_offset,
+                                 end - self._released_offset):
+                self._released_offset = end
+            else:
+                self._release_consumed = False
+
+
+class RMMLogTailer(threading.Thread):
+    """
+    Background thread that periodically flushes the RMM logs and folds any new
+    rows into a MemoryUsageAggregator while the benchmarked code is running,
+    so memory use is constant, disk use is bounded, and most of the parsing
+    overlaps with the benchmark.
+    """
+
+    def __init__(self, log_files, aggregator, poll_interval=0.05):
+        super().__init__(name="RMMLogTailer", daemon=True)
+        self.poll_interval = poll_interval
+        self.aggregator = aggregator
+        self.readers = {device: RMMLogFileReader(
+                            log_file, extra_fields=aggregator.extra_fields)
+                        for (device, log_file) in log_files.items()}
+        self._start_date = datetime.date.today()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.poll_interval):
+            self._poll()
+
+    def stop(self):
+        """
+        Stop the thread, waiting for any poll in progress to finish.
+        """
+        self._stop_event.set()
+        self.join()
+
+    def finish(self):
+        """
+        Consume any rows written since the last poll. The thread must have
+        been stopped and the logs flushed before calling this.
+        """
+        for (device, reader) in self.readers.items():
+            reader.consume(partial(self.aggregator.add, device))
+            reader.close()
+        self.aggregator.merge()
+
+    def _poll(self):
+        import rmm
+        # Every event logged before the flush has been written once the flush
+        # returns, so all events up to this time can be merged across devices.
+        watermark = _logClockNow(self._start_date)
+        rmm.mr._flush_logs()
+        for (device, reader) in self.readers.items():
+            reader.consume(partial(self.aggregator.add, device))
+        self.aggregator.merge(watermark)
+
+
+class AllocationTracker(abc.ABC):
+    """
+    Base class for the backends RMMResourceAnalyzer uses to observe device
+    memory allocations. start() and stop() bracket the code being measured,
+    and stop() sets the per-device peak and leaked bytes for the devices being
+    observed, along with the concurrent peak and total leaked bytes across
+    them.
+
+    devices is the list of device numbers to observe. If None, all devices
+    the backend can see are observed. If timeline_points is > 0 and the
+    backend records individual events, a downsampled timeline of the total
+    usage across devices is also kept, see MemoryTimeline. Likewise if
+    attribution is True, the usage is also broken down by stream and by host
+    thread, see MemoryAttribution. If leak_report is > 0, allocations and
+    frees are paired by pointer, the leaked bytes are those of the
+    allocations never freed, and a report on them including the leak_report
+    largest is kept, see OpenAllocationIndex.
+    """
+    name = None
+
+    def __init__(self, devices=None, timeline_points=0, attribution=False,
+                 leak_report=0):
+        self.devices = devices
+        self.timeline_points = timeline_points
+        self.attribution = attribution
+        self.leak_report = leak_report
         self.max_gpu_mem_usage = 0
         self.leaked_memory = 0
-        log_file_name = "rapids_pytest_benchmarks_log"
+        self.device_peaks = {}
+        self.device_leaks = {}
+        self.timeline = None
+        # {label: {"mem": ..., "allocs": ..., "alloc_bytes": ...}}, and
+        # {label: raw stream or thread id}
+        self.attributed_usage = {}
+        self.attribution_ids = {}
+        # See _make_leak_report()
+        self.leaks = None
+
+    def _make_aggregator(self, devices):
+        return MemoryUsageAggregator(devices, self.timeline_points,
+                                     self.attribution, self.leak_report > 0)
+
+    @abc.abstractmethod
+    def start(self):
+        pass
+
+    @abc.abstractmethod
+    def stop(self):
+        pass
+
+    def _set_results(self, aggregator):
+        self.max_gpu_mem_usage = aggregator.total_counter.peak
+        self.leaked_memory = aggregator.total_counter.current
+        self.device_peaks = {device: counter.peak for (device, counter)
+                             in aggregator.device_counters.items()}
+        self.device_leaks = {device: counter.current for (device, counter)
+                             in aggregator.device_counters.items()}
+        if aggregator.timeline is not None:
+            self.timeline = aggregator.timeline.points()
+        for attribution in aggregator.attributions.values():
+            self.attributed_usage.update(attribution.results())
+            self.attribution_ids.update(attribution.ids)
+        if aggregator.open_allocations:
+            self.device_leaks = {device: index.leaked_bytes for (device, index)
+                                 in aggregator.open_allocations.items()}
+            self.leaked_memory = sum(self.device_leaks.values())
+            self.leaks = self._make_leak_report(aggregator)
+
+    def _make_leak_report(self, aggregator):
+        """
+        Return a dict describing the allocations left open: their count and
+        bytes, the frees that could not be paired with an allocation, the
+        size distribution (see OpenAllocationIndex.size_histogram) and the
+        largest leaks, with their time in seconds since the first event.
+        """
+        histogram = {}
+        largest = []
+        report = {"leaked_allocs": 0, "leaked_bytes": 0,
+                  "unmatched_frees": 0, "unmatched_free_bytes": 0}
+        for (device, index) in aggregator.open_allocations.items():
+            report["leaked_allocs"] += len(index)
+            report["leaked_bytes"] += index.leaked_bytes
+            report["unmatched_frees"] += index.unmatched_frees
+            report["unmatched_free_bytes"] += index.unmatched_free_bytes
+            for (min_size, count, nbytes) in index.size_histogram():
+                (c, b) = histogram.get(min_size, (0, 0))
+                histogram[min_size] = (c + count, b + nbytes)
+            for leak in index.largest(self.leak_report):
+                leak["device"] = device
+                leak["time"] = (leak["time"] - aggregator.start_time) * 1e-6
+                largest.append(leak)
+        report["size_histogram"] = [[min_size, count, nbytes] for
+                                    (min_size, (count, nbytes))
+                                    in sorted(histogram.items())]
+        report["largest"] = sorted(largest, key=lambda leak: leak["size"],
+                                   reverse=True)[:self.leak_report]
+        return report
+
+
+class RMMLogTracker(AllocationTracker):
+    """
+    Tracks allocations using RMM's CSV logging resource adaptor. The logs are
+    either parsed after the measured code finishes, or consumed while it runs
+    in streaming mode.
+    """
+    name = "rmm-log"
+
+    def __init__(self, devices=None, timeline_points=0, attribution=False,
+                 leak_report=0, streaming=False, poll_interval=0.05):
+        super().__init__(devices, timeline_points, attribution, leak_report)
+        self.streaming = streaming
+        self.poll_interval = poll_interval
+        self._tailer = None
+        # Unique per process, so parallel sessions (eg. --benchmark-gpu-workers
+        # workers) do not share log files
+        log_file_name = "rapids_pytest_benchmarks_log_%d" % os.getpid()
         self._log_file_prefix = os.path.join(tempfile.gettempdir(), log_file_name)
 
-    def enable_logging(self):
+    def start(self):
         """
         Enable RMM logging. RMM creates a CSV output file derived from
         provided file name that looks like: log_file_prefix + ".devX", where
-        X is the GPU number.
+        X is the GPU number. In streaming mode, the logs are consumed by a
+        background thread while logging is enabled.
         """
+        import rmm
         rmm.enable_logging(log_file_name=self._log_file_prefix)
+        if self.streaming:
+            log_files = self._observed_log_files(rmm.get_log_filenames())
+            self._tailer = RMMLogTailer(
+                log_files, self._make_aggregator(log_files),
+                poll_interval=self.poll_interval)
+            self._tailer.start()
 
-    def disable_logging(self):
+    def stop(self):
         """
         Disable RMM logging
         """
+        import rmm
         log_output_files = rmm.get_log_filenames()
+        # The tailer is stopped first, so it does not flush the logs while
+        # logging is being disabled and the resources swapped back
+        if self._tailer is not None:
+            self._tailer.stop()
         rmm.mr._flush_logs()
         rmm.disable_logging()
-        # FIXME: potential improvement here would be to only parse the log files for
-        # the gpu ID that's passed in via --benchmark-gpu-device
-        self._parse_results(log_output_files)
+        if self._tailer is not None:
+            self._tailer.finish()
+            self._set_results(self._tailer.aggregator)
+            self._tailer = None
+        else:
+            self._parse_results(self._observed_log_files(log_output_files))
         for _, log_file in log_output_files.items():
             os.remove(log_file)
 
+    def _observed_log_files(self, log_files):
+        if self.devices is None:
+            return dict(log_files)
+        return {device: log_file for (device, log_file) in log_files.items()
+                if device in self.devices}
+
     def _parse_results(self, log_files):
         """
         Parse CSV results. CSV file has columns:
         Thread,Time,Action,Pointer,Size,Stream
+
+        The log files are read a chunk at a time in lockstep, so events can be
+        merged across devices by timestamp without loading whole logs.
+        """
+        aggregator = self._make_aggregator(log_files)
+        readers = {device: RMMLogFileReader(log_file, release_consumed=False,
+                                            extra_fields=aggregator.extra_fields)
+                   for (device, log_file) in log_files.items()}
+        try:
+            while readers:
+                for (device, reader) in list(readers.items()):
+                    batch = reader.read_chunk()
+                    if batch is None:
+                        reader.close()
+                        del readers[device]
+                    else:
+                        aggregator.add(device, batch)
+                # Every device still being read has events up to its
+                # last_time, so everything up to the earliest of those can be
+                # merged.
+                if readers:
+                    aggregator.merge(min(reader.last_time
+                                         for reader in readers.values()))
+        finally:
+            for reader in readers.values():
+                reader.close()
+        aggregator.merge()
+        self._set_results(aggregator)
+
+
+def _getCurrentDevice():
+    """
+    Return the current CUDA device, through cuda-python rather than RMM's
+    private device helpers.
+    """
+    from cuda import cudart
+    (err, device) = cudart.cudaGetDevice()
+    if err != cudart.cudaError_t.cudaSuccess:
+        raise RuntimeError("could not get the current CUDA device: %s" % err)
+    return device
+
+
+class RMMStatisticsTracker(AllocationTracker):
+    """
+    Tracks allocations in memory by wrapping the device resources in RMM's
+    statistics resource adaptor, which counts current and peak bytes
+    directly. Nothing is written to disk.
+
+    The adaptor does not record when allocations happen, so when more than one
+    device is observed the concurrent peak is reported as the sum of the
+    per-device peaks, which is an upper bound, and no timeline is kept. Nor
+    does it record streams, threads or pointers, so there is no attribution
+    or leak report either.
+    """
+    name = "rmm-stats"
+
+    def __init__(self, devices=None, timeline_points=0, attribution=False,
+                 leak_report=0):
+        super().__init__(devices, timeline_points, attribution, leak_report)
+        self._upstream_mrs = {}
+        self._stats_mrs = {}
+
+    def start(self):
+        import rmm
+        devices = self.devices
+        if devices is None:
+            devices = [_getCurrentDevice()]
+        for device in devices:
+            self._upstream_mrs[device] = rmm.mr.get_per_device_resource(device)
+            self._stats_mrs[device] = \
+                rmm.mr.StatisticsResourceAdaptor(self._upstream_mrs[device])
+            rmm.mr.set_per_device_resource(device, self._stats_mrs[device])
+
+    def stop(self):
+        import rmm
+        for (device, upstream_mr) in self._upstream_mrs.items():
+            rmm.mr.set_per_device_resource(device, upstream_mr)
+            counts = self._stats_mrs[device].allocation_counts
+            self.device_peaks[device] = counts["peak_bytes"]
+            self.device_leaks[device] = counts["current_bytes"]
+        self.max_gpu_mem_usage = sum(self.device_peaks.values())
+        self.leaked_memory = sum(self.device_leaks.values())
+        self._stats_mrs = {}
+        self._upstream_mrs = {}
+
+
+class FakeAllocator:
+    """
+    Pure-Python stand-in for device memory resources. Code under test calls
+    allocate() and deallocate() as it would allocate device memory, and any
+    FakeAllocationTracker started on this allocator records the events. This
+    allows the analyzer and the gpubenchmark fixture to be tested on machines
+    without a GPU.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next_pointer = 0x1000
+        self._live = {}
+        self._trackers = []
+
+    def allocate(self, size, stream=0, device=0):
+        """
+        Return a fake pointer to a new allocation of size bytes on device.
+        """
+        with self._lock:
+            pointer = self._next_pointer
+            self._next_pointer += max(size, 1)
+            self._live[pointer] = (size, stream, device)
+            self._record("allocate", pointer, size, stream, device)
+        return pointer
+
+    def deallocate(self, pointer):
+        with self._lock:
+            (size, stream, device) = self._live.pop(pointer)
+            self._record("free", pointer, size, stream, device)
+
+    def _attach(self, tracker):
+        with self._lock:
+            self._trackers.append(tracker)
+
+    def _detach(self, tracker):
+        with self._lock:
+            self._trackers.remove(tracker)
+
+    def _record(self, action, pointer, size, stream, device):
+        if not self._trackers:
+            return
+        event = (threading.get_ident(), time.perf_counter(), action, pointer,
+                 size, stream, device)
+        for tracker in self._trackers:
+            tracker.events.append(event)
+
+
+# The allocator used by FakeAllocationTracker unless another one is given.
+fake_allocator = FakeAllocator()
+
+
+class FakeAllocationTracker(AllocationTracker):
+    """
+    Tracks allocations made through a FakeAllocator. The events are kept in
+    memory with the same fields as an RMM log row and folded with the same
+    code used for RMM logs when tracking stops.
+    """
+    name = "fake"
+
+    def __init__(self, allocator=None, devices=None, timeline_points=0,
+                 attribution=False, leak_report=0):
+        super().__init__(devices, timeline_points, attribution, leak_report)
+        self.allocator = allocator or fake_allocator
+        self.events = []
+
+    def start(self):
+        self.events = []
+        self.allocator._attach(self)
+
+    def stop(self):
+        self.allocator._detach(self)
+        events = self.events
+        if self.devices is not None:
+            events = [e for e in events if e[6] in self.devices]
+        devices = self.devices
+        if devices is None:
+            devices = sorted(set(e[6] for e in events))
+        aggregator = self._make_aggregator(devices)
+        if events:
+            (threads, times, actions, pointers, sizes, streams,
+             event_devices) = zip(*events)
+            batch = {
+                "time": (np.array(times) * 10**6).astype(np.int64),
+                "action": np.array(actions, dtype="S16"),
+                "size": np.array(sizes, dtype=np.int64),
+                # Formatted the same as the RMM log columns
+                "thread": np.array([str(t) for t in threads], dtype="S32"),
+                "stream": np.array([hex(s) for s in streams], dtype="S20"),
+                "pointer": np.array(pointers, dtype=np.uint64),
+            }
+            event_devices = np.array(event_devices)
+            for device in devices:
+                aggregator.add(device,
+                               _takeBatch(batch, event_devices == device))
+        aggregator.merge()
+        self._set_results(aggregator)
+
+
+TRACKERS = {tracker.name: tracker for tracker in
+            (RMMLogTracker, RMMStatisticsTracker, FakeAllocationTracker)}
+
+
+def makeTracker(name, devices=None, timeline_points=0, attribution=False,
+                leak_report=0, streaming=False, poll_interval=0.05):
+    """
+    Return a new instance of the AllocationTracker registered as name.
+    """
+    if name == RMMLogTracker.name:
+        return RMMLogTracker(devices=devices, timeline_points=timeline_points,
+                             attribution=attribution, leak_report=leak_report,
+                             streaming=streaming, poll_interval=poll_interval)
+    return TRACKERS[name](devices=devices, timeline_points=timeline_points,
+                          attribution=attribution, leak_report=leak_report)
+
+
+class RMMResourceAnalyzer:
+    """
+    Class to control enabling, disabling, & parsing the results of an
+    AllocationTracker, and optionally a DeviceSampler measuring utilization.
+    The RMM CSV logging backend is used if no tracker is given.
+    """
+
+    def __init__(self, tracker=None, sampler=None):
+        self.max_gpu_util = -1
+        self.mean_gpu_util = -1
+        self.max_gpu_used_mem = -1
+        self.max_gpu_mem_usage = 0
+        self.leaked_memory = 0
+        self.device_mem_usage = {}
+        self.device_leaked_memory = {}
+        self.mem_timeline = None
+        self.mem_attribution = {}
+        self.mem_attribution_ids = {}
+        self.leak_report = None
+        self.tracker = tracker or RMMLogTracker()
+        self.sampler = sampler
+
+    def enable_logging(self):
+        """
+        Start tracking allocations, and sampling if a sampler was given.
+        """
+        self.tracker.start()
+        if self.sampler is not None:
+            self.sampler.start()
+
+    def disable_logging(self):
+        """
+        Stop tracking allocations and sampling, and collect the results.
         """
-        current_mem_usage = 0
-        for _, log_file in log_files.items():
-            with open(log_file, mode="r") as csv_file:
-                csv_reader = csv.DictReader(csv_file)
-                for row in csv_reader:
-                    row_action = row["Action"]
-                    row_size = int(row["Size"])
-
-                    if row_action == "allocate":
-                        current_mem_usage += row_size
-                        if current_mem_usage > self.max_gpu_mem_usage:
-                            self.max_gpu_mem_usage = current_mem_usage
-
-                    if row_action == "free":
-                        current_mem_usage -= row_size
-        self.leaked_memory = current_mem_usage
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.max_gpu_util = self.sampler.max_utilization
+            self.mean_gpu_util = self.sampler.mean_utilization
+            self.max_gpu_used_mem = self.sampler.max_memory_used
+        self.tracker.stop()
+        self.max_gpu_mem_usage = self.tracker.max_gpu_mem_usage
+        self.leaked_memory = self.tracker.leaked_memory
+        self.device_mem_usage = dict(self.tracker.device_peaks)
+        self.device_leaked_memory = dict(self.tracker.device_leaks)
+        self.mem_timeline = self.tracker.timeline
+        self.mem_attribution = dict(self.tracker.attributed_usage)
+        self.mem_attribution_ids = dict(self.tracker.attribution_ids)
+        self.leak_report = self.tracker.leaks
@@ -0,0 +1,91 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compact encoding of the per-round timings of a benchmark, as written to the
+ASV output dir with --benchmark-asv-round-timings.
+
+The timings are quantized to a step of SIGNIFICANT_DIGITS significant digits
+of the fastest round (so the error of each is at most 0.05% of the fastest
+round), delta-encoded in round order, since consecutive rounds usually take
+about the same time, written as zigzag varints (1-2 bytes for most deltas),
+zlib-compressed and base64-encoded for JSON. The round order is kept, so
+warmup effects and drift within a run can still be seen.
+"""
+
+import base64
+import math
+import zlib
+
+ENCODING = "delta-varint-zlib"
+
+SIGNIFICANT_DIGITS = 4
+
+
+def _quantizationStep(timings):
+    positive = [t for t in timings if t > 0]
+    if not positive:
+        return 1e-9
+    return 10 ** (math.floor(math.log10(min(positive))) -
+                  (SIGNIFICANT_DIGITS - 1))
+
+
+def encodeRoundTimings(timings):
+    """
+    Return a JSON-serializable dict with the encoded timings (a list of
+    seconds). See decodeRoundTimings().
+    """
+    step = _quantizationStep(timings)
+    data = bytearray()
+    previous = 0
+    for t in timings:
+        quantized = int(round(t / step))
+        delta = quantized - previous
+        previous = quantized
+        # zigzag: 0, -1, 1, -2, 2... -> 0, 1, 2, 3, 4...
+        value = (delta << 1) if delta >= 0 else ((-delta << 1) - 1)
+        while value >= 0x80:
+            data.append((value & 0x7f) | 0x80)
+            value >>= 7
+        data.append(value)
+    return {"encoding": ENCODING,
+            "step": step,
+            "count": len(timings),
+            "data": base64.b64encode(zlib.compress(bytes(data), 9)).decode()}
+
+
+def decodeRoundTimings(encoded):
+    """
+    Return the list of timings (in seconds, in round order) encoded by
+    encodeRoundTimings().
+    """
+    if encoded.get("encoding") != ENCODING:
+        raise ValueError("unknown round timings encoding: %r"
+                         % encoded.get("encoding"))
+    data = zlib.decompress(base64.b64decode(encoded["data"]))
+    step = encoded["step"]
+    timings = []
+    (previous, value, shift) = (0, 0, 0)
+    for byte in data:
+        value |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        delta = (value >> 1) if not (value & 1) else -((value + 1) >> 1)
+        previous += delta
+        timings.append(previous * step)
+        (value, shift) = (0, 0)
+    if len(timings) != encoded["count"]:
+        raise ValueError("expected %d round timings, got %d"
+                         % (encoded["count"], len(timings)))
+    return timings
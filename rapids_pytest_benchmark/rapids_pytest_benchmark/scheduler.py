@@ -0,0 +1,177 @@
+# Copyright (c) 2023, NVIDIA CORPORATION.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Runs a pytest session's benchmarks in parallel, in one worker process per GPU
+device (see --benchmark-gpu-workers). Each worker is a new pytest process run
+with the same args, restricted to CUDA_VISIBLE_DEVICES=<its device> and to its
+share of the CPU cores, that runs only the items it was given and writes its
+test reports and benchmark stats to a file for the main session to gather.
+"""
+
+import heapq
+import json
+import os
+import pickle
+import subprocess
+import sys
+
+# Where the duration of each item is kept between sessions in the pytest
+# cache, for balancing the next session's workers.
+DURATIONS_CACHE_KEY = "rapids_pytest_benchmark/durations"
+
+WORKER_ITEMS_FILE = "items.json"
+WORKER_RESULTS_FILE = "results.pickle"
+WORKER_OUTPUT_FILE = "output.txt"
+
+
+def getPastDurations(config):
+    """
+    Return {nodeid: seconds} for the items run in previous sessions, or {} if
+    the pytest cache is not available.
+    """
+    if getattr(config, "cache", None) is None:
+        return {}
+    return config.cache.get(DURATIONS_CACHE_KEY, {})
+
+
+def savePastDurations(config, durations):
+    """
+    Add {nodeid: seconds} to the durations kept in the pytest cache.
+    """
+    if getattr(config, "cache", None) is None:
+        return
+    pastDurations = getPastDurations(config)
+    pastDurations.update(durations)
+    config.cache.set(DURATIONS_CACHE_KEY, pastDurations)
+
+
+def balanceByDuration(nodeids, durations, numWorkers):
+    """
+    Split nodeids into numWorkers lists with total durations as equal as
+    possible, by giving the longest remaining item to the least loaded
+    worker. Items without a past duration are assumed to take the mean
+    duration of the others (or all the same time if none have one). Each list
+    keeps the items in their original order.
+    """
+    known = [durations[n] for n in nodeids if n in durations]
+    default = (sum(known) / len(known)) if known else 1
+    order = sorted(range(len(nodeids)),
+                   key=lambda i: durations.get(nodeids[i], default),
+                   reverse=True)
+    loads = [(0, worker) for worker in range(numWorkers)]
+    assigned = [[] for _ in range(numWorkers)]
+    for i in order:
+        (load, worker) = heapq.heappop(loads)
+        assigned[worker].append(i)
+        heapq.heappush(loads,
+                       (load + durations.get(nodeids[i], default), worker))
+    return [[nodeids[i] for i in sorted(indices)] for indices in assigned]
+
+
+def cpuAffinitySets(numWorkers):
+    """
+    Split the CPU cores this process may run on into numWorkers contiguous
+    sets, or return None for each worker if CPU affinity is not supported. If
+    there are fewer cores than workers, workers share cores.
+    """
+    if not hasattr(os, "sched_getaffinity"):
+        return [None] * numWorkers
+    cores = sorted(os.sched_getaffinity(0))
+    if len(cores) < numWorkers:
+        return [{cores[i % len(cores)]} for i in range(numWorkers)]
+    (perWorker, extra) = divmod(len(cores), numWorkers)
+    sets = []
+    start = 0
+    for i in range(numWorkers):
+        end = start + perWorker + (1 if i < extra else 0)
+        sets.append(set(cores[start:end]))
+        start = end
+    return sets
+
+
+class DeviceWorker:
+    """
+    A pytest process that runs the items with the given nodeids on a single
+    GPU device and set of CPU cores. workDir is a directory for the worker's
+    items, results and output, and args are the pytest args (the same as the
+    main session's, the worker option is added).
+    """
+
+    def __init__(self, device, cores, nodeids, args, workDir, cwd=None):
+        self.device = device
+        self.cores = cores
+        self.nodeids = nodeids
+        self.args = args
+        self.workDir = workDir
+        self.cwd = cwd
+        self.returncode = None
+        self._process = None
+        self._outputFile = None
+
+    def start(self):
+        os.makedirs(self.workDir, exist_ok=True)
+        with open(os.path.join(self.workDir, WORKER_ITEMS_FILE), "w") as f:
+            json.dump(self.nodeids, f)
+        env = dict(os.environ, CUDA_VISIBLE_DEVICES=str(self.device))
+        preexecFn = None
+        if self.cores is not None:
+            cores = self.cores
+            preexecFn = lambda: os.sched_setaffinity(0, cores)
+        self._outputFile = open(os.path.join(self.workDir, WORKER_OUTPUT_FILE),
+                                "w")
+        self._process = subprocess.Popen(
+            [sys.executable, "-m", "pytest", *self.args,
+             f"--benchmark-gpu-worker={self.workDir}"],
+            env=env, cwd=self.cwd, stdout=self._outputFile,
+            stderr=subprocess.STDOUT, preexec_fn=preexecFn)
+
+    def wait(self):
+        """
+        Wait for the worker to finish and return its results (see
+        writeWorkerResults()), or None if it did not write any, eg. because it
+        crashed.
+        """
+        self.returncode = self._process.wait()
+        self._outputFile.close()
+        resultsFile = os.path.join(self.workDir, WORKER_RESULTS_FILE)
+        if not os.path.exists(resultsFile):
+            return None
+        with open(resultsFile, "rb") as f:
+            return pickle.load(f)
+
+    @property
+    def output(self):
+        with open(os.path.join(self.workDir, WORKER_OUTPUT_FILE)) as f:
+            return f.read()
+
+
+def readWorkerItems(workDir):
+    """
+    Return the nodeids a worker was given to run.
+    """
+    with open(os.path.join(workDir, WORKER_ITEMS_FILE)) as f:
+        return json.load(f)
+
+
+def writeWorkerResults(workDir, results):
+    """
+    Write a worker's results for the main session: a dict of its serialized
+    test reports ("reports"), its benchmarks ("benchmarks") and any other
+    values to be gathered. The file is written under a temporary name and
+    renamed, so a worker that crashes while writing leaves no results.
+    """
+    resultsFile = os.path.join(workDir, WORKER_RESULTS_FILE)
+    with open(resultsFile + ".tmp", "wb") as f:
+        pickle.dump(results, f)
+    os.replace(resultsFile + ".tmp", resultsFile)
@@ -0,0 +1,25 @@
+import pytest
+
+
+class RecordingASVDb:
+    """
+    Stand-in for asvdb.ASVDb that records the (bInfo, resultList) of each
+    addResults() call.
+    """
+    calls = []
+
+    def __init__(self, dbDir, repo, branches):
+        pass
+
+    def addResults(self, bInfo, resultList):
+        self.calls.append((bInfo, list(resultList)))
+
+
+@pytest.fixture
+def recording_asvdb(monkeypatch):
+    """
+    Replace asvdb.ASVDb with a RecordingASVDb with no calls recorded yet.
+    """
+    monkeypatch.setattr("asvdb.ASVDb", RecordingASVDb)
+    RecordingASVDb.calls = []
+    return RecordingASVDb
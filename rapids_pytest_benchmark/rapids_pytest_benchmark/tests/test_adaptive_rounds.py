@@ -0,0 +1,94 @@
+import json
+import math
+import random
+
+from ..adaptive_rounds import MeanPrecision, MedianPrecision
+
+pytest_plugins = "pytester"
+
+
+def test_precision_trackers():
+    rng = random.Random(0)
+    values = [rng.gauss(1.0, 0.05) for _ in range(1000)]
+    for tracker_class in (MeanPrecision, MedianPrecision):
+        tracker = tracker_class()
+        assert tracker.precision == math.inf
+        precisions = []
+        for (i, value) in enumerate(values):
+            tracker.add(value)
+            if i in (9, 99, 999):
+                precisions.append(tracker.precision)
+        # The CI narrows with the square root of the number of rounds
+        assert precisions[0] > precisions[1] > precisions[2]
+        assert 0.002 < precisions[2] < 0.006
+
+    # A 95% CI of the mean of 1000 rounds with a 5% stddev is about
+    # +/-1.96 * 0.05 / sqrt(1000)
+    tracker = MeanPrecision()
+    for value in values:
+        tracker.add(value)
+    assert abs(tracker.precision - 1.96 * 0.05 / math.sqrt(1000)) < 0.0005
+
+
+def test_median_check_schedule():
+    tracker = MedianPrecision()
+    checks = []
+    for i in range(1, 201):
+        tracker.add(1.0)
+        if tracker.should_check():
+            checks.append(i)
+    # Checked at each ~10% growth in rounds, not every round
+    assert checks[:3] == [2, 3, 4]
+    assert len(checks) < 50
+    assert checks[-1] > 180
+
+
+def test_target_precision(pytester):
+    pytester.makepyfile(
+        test_precision="""
+        import time
+
+        def bench_sleep(gpubenchmark):
+            gpubenchmark(time.sleep, 0.001)
+        """
+    )
+    result = pytester.runpytest_subprocess(
+        "-o", "python_functions=bench_*",
+        "--benchmark-gpu-tracker=fake",
+        "--benchmark-target-precision=50%",
+        "--benchmark-min-rounds=3",
+        "--benchmark-json=out.json")
+
+    assert result.ret == 0
+    result.stdout.fnmatch_lines(["*Precision %*Rounds*"])
+    with open(pytester.path / "out.json") as f:
+        stats = json.load(f)["benchmarks"][0]["stats"]
+    # A stable benchmark stops as soon as the precision is reached, well
+    # before the default --benchmark-max-time of 1s
+    assert 0 <= stats["precision"] <= 50
+    assert 3 <= stats["rounds"] < 100
+
+
+def test_target_precision_max_time(pytester):
+    pytester.makepyfile(
+        test_precision_max_time="""
+        import time
+
+        def bench_sleep(gpubenchmark):
+            gpubenchmark(time.sleep, 0.001)
+        """
+    )
+    result = pytester.runpytest_subprocess(
+        "-o", "python_functions=bench_*",
+        "--benchmark-gpu-tracker=fake",
+        "--benchmark-target-precision=0.0001%",
+        "--benchmark-target-precision-stat=median",
+        "--benchmark-target-precision-max-time=0.05",
+        "--benchmark-json=out.json")
+
+    assert result.ret == 0
+    with open(pytester.path / "out.json") as f:
+        stats = json.load(f)["benchmarks"][0]["stats"]
+    # The precision is not reached, so the time cap stops the rounds
+    assert stats["precision"] > 0.0001
+    assert stats["rounds"] < 60
@@ -0,0 +1,65 @@
+import json
+
+from .. import asv_journal
+
+pytest_plugins = "pytester"
+
+
+def test_journal_survives_crash(pytester, recording_asvdb):
+    pytester.makepyfile(
+        test_journal="""
+        import os
+
+        import pytest
+
+        @pytest.mark.parametrize("size", [10, 20])
+        def bench_sum(gpubenchmark, size):
+            gpubenchmark.addMetric(lambda result: result, "total", "count")
+            gpubenchmark(sum, range(size))
+
+        def bench_crash(gpubenchmark):
+            gpubenchmark(sum, range(10))
+            os._exit(1)
+        """
+    )
+    journal = pytester.path / "journal.jsonl"
+    metadata = json.dumps(dict(machineName="machine", commitHash="abc123",
+                               commitTime="10", commitRepo="repo",
+                               commitBranch="main"))
+
+    result = pytester.runpytest_subprocess(
+        "-o", "python_functions=bench_*",
+        "--benchmark-gpu-tracker=fake",
+        "--benchmark-max-time=0.01",
+        f"--benchmark-asv-journal={journal}",
+        f"--benchmark-asv-metadata={metadata}",
+        "--benchmark-asv-stats=min")
+
+    # The session died in bench_crash, after journaling the other benchmarks
+    assert result.ret == 1
+    records = list(asv_journal.readRecords(journal))
+    assert [r["benchmark"] for r in records] == \
+        ["test_journal.py::bench_sum[10]", "test_journal.py::bench_sum[20]"]
+    assert records[1]["params"] == [["size", 20]]
+    results = {name: (value, unit) for (name, value, unit)
+               in records[1]["results"]}
+    assert results["test_journal.bench_sum_total"] == (190, "count")
+    assert results["test_journal.bench_sum_time"][1] == "seconds"
+    assert "test_journal.bench_sum_time_min" in results
+
+    # The rerun of bench_sum[20], and a record cut short by a crash
+    rerun = dict(records[1], results=[["test_journal.bench_sum_time", 1.0,
+                                       "seconds"]])
+    asv_journal.appendRecords(journal, [rerun])
+    with open(journal, "a") as f:
+        f.write(json.dumps(rerun)[:50])
+
+    asv_journal.main([str(pytester.path / "asv"), str(journal)])
+
+    # All results are added in one batch, with the last record of each
+    # benchmark
+    assert len(recording_asvdb.calls) == 1
+    (_, resultList) = recording_asvdb.calls[0]
+    names = [r.funcName for r in resultList]
+    assert names.count("test_journal.bench_sum_time") == 2
+    assert names.count("test_journal.bench_sum_total") == 1
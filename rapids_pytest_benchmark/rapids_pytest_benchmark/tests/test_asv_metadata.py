@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from .. import asv_metadata
+from ..asv_metadata import ASVMetadata, MACHINE_PROFILE_FIELDS
+
+
+ALL_FIELDS = ["machineName", "cudaVer", "osType", "pythonVer", "commitRepo",
+              "commitBranch", "commitHash", "commitTime", "gpuType",
+              "cpuType", "arch", "ram", "gpuRam", "requirements"]
+
+
+@pytest.fixture
+def probes(monkeypatch):
+    """
+    Replace the probes of the machine with counted stand-ins, on a machine
+    with boot ID "boot1" and driver version "535.0".
+    """
+    calls = []
+    machine = {"boot_id": "boot1", "driver": "535.0"}
+
+    def probe(name, value):
+        def probe_fn(*args):
+            calls.append(name)
+            return value
+        return probe_fn
+
+    monkeypatch.setattr(asv_metadata, "_readBootId",
+                        lambda: machine["boot_id"])
+    monkeypatch.setattr(asv_metadata, "_readDriverVersion",
+                        lambda: machine["driver"])
+    monkeypatch.setattr(asv_metadata, "_getOSName", probe("os", "ubuntu-22.04"))
+    monkeypatch.setattr(asv_metadata, "_getCudaVersion", probe("cuda", "12.0"))
+    monkeypatch.setattr(ASVMetadata, "_probe_gpu_type", probe("nvml", "GPU3"))
+    monkeypatch.setattr(ASVMetadata, "_probe_gpu_ram", probe("nvml", "1024"))
+    monkeypatch.setattr(ASVMetadata, "_get_commit_info",
+                        probe("git", ("abc123", 1700000000)))
+    monkeypatch.setattr(ASVMetadata, "_get_repo_info",
+                        probe("git", ("repo", "main")))
+    return (calls, machine)
+
+
+def test_provided_fields_are_not_probed(probes, tmp_path):
+    (calls, _) = probes
+    provided = {field: "given_%s" % field for field in ALL_FIELDS}
+    metadata = ASVMetadata(provided, profile_file=str(tmp_path / "profile.json"))
+
+    assert [metadata[field] for field in ALL_FIELDS] == \
+        ["given_%s" % field for field in ALL_FIELDS]
+    assert calls == []
+
+
+def test_machine_profile_cached(probes, tmp_path):
+    (calls, machine) = probes
+    profile_file = str(tmp_path / "profile.json")
+
+    metadata = ASVMetadata({}, profile_file=profile_file)
+    values = {field: metadata[field] for field in MACHINE_PROFILE_FIELDS}
+    assert values["gpuType"] == "GPU3"
+    assert sorted(set(calls)) == ["cuda", "nvml", "os"]
+    # Written through a per-process temp file, which is not left behind
+    assert os.listdir(str(tmp_path)) == ["profile.json"]
+
+    # A later session on the same boot and driver probes nothing
+    calls.clear()
+    metadata = ASVMetadata({}, profile_file=profile_file)
+    assert {field: metadata[field] for field in MACHINE_PROFILE_FIELDS} == values
+    assert calls == []
+
+    # A new driver invalidates the profile
+    machine["driver"] = "550.0"
+    metadata = ASVMetadata({}, profile_file=profile_file)
+    assert metadata["cudaVer"] == "12.0"
+    assert calls == ["cuda"]
+
+
+def test_no_gpu_probes_without_gpu(probes, tmp_path):
+    (calls, machine) = probes
+    machine["driver"] = None
+    metadata = ASVMetadata({}, profile_file=str(tmp_path / "profile.json"))
+
+    assert (metadata["gpuType"], metadata["gpuRam"], metadata["cudaVer"]) == \
+        ("unknown", "0", "unknown")
+    assert calls == []
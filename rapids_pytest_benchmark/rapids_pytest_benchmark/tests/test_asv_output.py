@@ -0,0 +1,89 @@
+import json
+import statistics
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from .. import asv_output, round_timings
+
+pytest_plugins = "pytester"
+
+
+def test_results_written_in_one_batch(recording_asvdb, tmp_path):
+    bInfo = SimpleNamespace(machineName="machine", commitHash="abc123")
+
+    asv_output.writeASVResults(str(tmp_path), "repo", "main", bInfo,
+                               ["result%d" % i for i in range(1000)], [])
+
+    assert recording_asvdb.calls == \
+        [(bInfo, ["result%d" % i for i in range(1000)])]
+
+
+def test_concurrent_timeline_writes(recording_asvdb, tmp_path):
+    bInfo = SimpleNamespace(machineName="machine", commitHash="abc123")
+
+    def session(i):
+        asv_output.writeASVResults(
+            str(tmp_path), "repo", "main", bInfo, [],
+            [("bench%d" % i, {"n": j}, [[0, j]]) for j in range(100)])
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # No session's update was lost
+    with open(tmp_path / "gpu_timelines" / "machine" / "abc123.json") as f:
+        timelines = json.load(f)
+    assert sorted(timelines) == ["bench%d" % i for i in range(8)]
+    assert all(len(entries) == 100 for entries in timelines.values())
+
+
+def test_round_timings_encoding():
+    timings = [0.0123 + 0.0001 * ((i * 7919) % 13) for i in range(10000)]
+    timings[5] = 0.5  # an outlier
+
+    encoded = round_timings.encodeRoundTimings(timings)
+    decoded = round_timings.decodeRoundTimings(json.loads(json.dumps(encoded)))
+
+    assert len(decoded) == len(timings)
+    assert all(abs(d - t) <= 0.0005 * min(timings)
+               for (d, t) in zip(decoded, timings))
+    # Much smaller than the timings as JSON floats
+    assert len(encoded["data"]) * 20 < len(json.dumps(timings))
+
+
+def test_asv_stats_and_round_timings(pytester, recording_asvdb):
+    pytester.makepyfile(
+        test_stats="""
+        def bench_sum(gpubenchmark):
+            gpubenchmark.pedantic(sum, args=(range(100),), rounds=7)
+        """
+    )
+    asvDir = pytester.path / "asv"
+    metadata = json.dumps(dict(machineName="machine", commitHash="abc123",
+                               commitTime="10", commitRepo="repo",
+                               commitBranch="main"))
+
+    result = pytester.runpytest(
+        "-o", "python_functions=bench_*",
+        "--benchmark-gpu-tracker=fake",
+        f"--benchmark-asv-output-dir={asvDir}",
+        f"--benchmark-asv-metadata={metadata}",
+        "--benchmark-asv-stats=median, iqr_outliers,rounds",
+        "--benchmark-asv-round-timings")
+    result.assert_outcomes(passed=1)
+
+    results = {r.funcName: r for r in recording_asvdb.calls[0][1]}
+    assert results["test_stats.bench_sum_time_rounds"].result == 7
+    assert results["test_stats.bench_sum_time_rounds"].unit == "count"
+    assert results["test_stats.bench_sum_time_median"].unit == "seconds"
+    assert "test_stats.bench_sum_time_iqr_outliers" in results
+    with open(asvDir / "round_timings" / "machine" / "abc123.json") as f:
+        entries = json.load(f)["test_stats.bench_sum"]
+    timings = round_timings.decodeRoundTimings(entries[0]["timings"])
+    assert len(timings) == 7
+    assert statistics.median(timings) == pytest.approx(
+        results["test_stats.bench_sum_time_median"].result, rel=1e-3)
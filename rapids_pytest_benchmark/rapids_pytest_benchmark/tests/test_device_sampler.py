@@ -0,0 +1,125 @@
+import sys
+import time
+import types
+
+import pytest
+
+from ..device_sampler import (DeviceBackend, DeviceSampler, FakeDeviceBackend,
+                              NVMLDeviceBackend)
+from ..rmm_resource_analyzer import (RMMResourceAnalyzer, FakeAllocator,
+                                     FakeAllocationTracker)
+
+pytest_plugins = "pytester"
+
+
+def test_sampler_aggregates_devices():
+    backend = FakeDeviceBackend()
+    sampler = DeviceSampler(backend, [0, 1], interval=60)
+    backend.open(sampler.devices)
+
+    backend.set_utilization(20, device=0)
+    backend.set_utilization(40, device=1)
+    backend.set_memory_used(1000, device=1)
+    sampler.sample()
+    backend.set_utilization(90, device=0)
+    backend.set_memory_used(500, device=0)
+    sampler.sample()
+
+    assert sampler.max_utilization == 90
+    assert sampler.mean_utilization == (20 + 40 + 90 + 40) / 4
+    assert sampler.max_memory_used == 1000
+
+
+def test_sampler_thread():
+    backend = FakeDeviceBackend()
+    inst = RMMResourceAnalyzer(
+        tracker=FakeAllocationTracker(FakeAllocator()),
+        sampler=DeviceSampler(backend, [0], interval=0.001))
+
+    inst.enable_logging()
+    backend.set_utilization(75)
+    time.sleep(0.05)
+    backend.set_utilization(25)
+    inst.disable_logging()
+
+    assert inst.max_gpu_util == 75
+    assert 0 < inst.mean_gpu_util < 75
+    # Samples taken at start and stop, plus those taken in between
+    assert inst.sampler._num_samples > 2
+
+
+def test_sampler_backend_error():
+    class BrokenBackend(DeviceBackend):
+        def open(self, devices):
+            raise RuntimeError("no devices")
+
+        def sample(self):
+            return {}
+
+    sampler = DeviceSampler(BrokenBackend(), [0])
+    with pytest.warns(RuntimeWarning, match="no devices"):
+        sampler.start()
+    sampler.stop()
+    assert (sampler.max_utilization, sampler.mean_utilization,
+            sampler.max_memory_used) == (-1, -1, -1)
+
+
+def test_incomplete_backend():
+    class IncompleteBackend(DeviceBackend):
+        def open(self, devices):
+            pass
+
+    with pytest.raises(TypeError):
+        IncompleteBackend()
+
+
+def test_nvml_backend_initialized_once(monkeypatch):
+    calls = []
+    smi = types.SimpleNamespace(
+        NVMLError=Exception,
+        nvmlInit=lambda: calls.append("init"),
+        nvmlShutdown=lambda: calls.append("shutdown"),
+        nvmlDeviceGetHandleByIndex=lambda index: calls.append(index) or index,
+        nvmlDeviceGetUtilizationRates=lambda handle: types.SimpleNamespace(
+            gpu=10 * handle),
+        nvmlDeviceGetMemoryInfo=lambda handle: types.SimpleNamespace(used=0))
+    monkeypatch.setitem(sys.modules, "pynvml", types.SimpleNamespace(smi=smi))
+    monkeypatch.delenv("CUDA_VISIBLE_DEVICES", raising=False)
+
+    backend = NVMLDeviceBackend()
+    # eg. one sampler per GPU measurement round
+    for devices in ([0], [0], [0, 1]):
+        sampler = DeviceSampler(backend, devices, interval=60)
+        sampler.start()
+        sampler.stop()
+    assert sampler.max_utilization == 10
+    backend.shutdown()
+
+    # NVML and the handle of each device are only opened once
+    assert calls == ["init", 0, 1, "shutdown"]
+
+
+def test_gpubenchmark_fake_sampler(pytester):
+    pytester.makepyfile(
+        """
+        from rapids_pytest_benchmark.device_sampler import fake_device_backend
+
+        def work():
+            fake_device_backend.set_utilization(80)
+            fake_device_backend.set_memory_used(1 << 20)
+
+        def bench_work(gpubenchmark):
+            gpubenchmark(work)
+        """
+    )
+    result = pytester.runpytest(
+        "-o", "python_functions=bench_*",
+        "--benchmark-gpu-tracker=fake",
+        "--benchmark-gpu-sampler=fake",
+        "--benchmark-gpu-sample-interval=0.01",
+        "--benchmark-columns=mean,rounds",
+    )
+    result.assert_outcomes(passed=1)
+    result.stdout.re_match_lines([
+        r".*GPU Leaked mem +GPU used mem +GPU util % +GPU util mean %",
+        r"bench_work +[\d.]+ +0 +0 +1,048,576 +80.0 +80.0 "])
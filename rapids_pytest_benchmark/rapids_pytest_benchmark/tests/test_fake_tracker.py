@@ -0,0 +1,386 @@
+import json
+import threading
+
+from ..rmm_resource_analyzer import (RMMResourceAnalyzer, FakeAllocator,
+                                     FakeAllocationTracker)
+
+pytest_plugins = "pytester"
+
+
+def test_fake_tracker():
+    allocator = FakeAllocator()
+    inst = RMMResourceAnalyzer(tracker=FakeAllocationTracker(allocator))
+
+    # Allocations made before tracking starts are not counted
+    before = allocator.allocate(4096)
+
+    inst.enable_logging()
+    a = allocator.allocate(100)
+    b = allocator.allocate(50)
+    allocator.deallocate(a)
+    allocator.deallocate(before)
+    c = allocator.allocate(10)
+    inst.disable_logging()
+
+    # Nor are allocations made after it stops
+    allocator.allocate(4096)
+
+    assert inst.max_gpu_mem_usage == 150
+    # The free of "before" happened during tracking and is counted against
+    # the leak, the same as it would be in an RMM log.
+    assert inst.leaked_memory == 60 - 4096
+    allocator.deallocate(b)
+    allocator.deallocate(c)
+
+
+def test_fake_tracker_devices():
+    allocator = FakeAllocator()
+    inst = RMMResourceAnalyzer(
+        tracker=FakeAllocationTracker(allocator, devices=[0, 1]))
+
+    inst.enable_logging()
+    a = allocator.allocate(100, device=0)
+    b = allocator.allocate(30, device=1)
+    allocator.deallocate(a)
+    c = allocator.allocate(50, device=1)
+    # Not an observed device
+    d = allocator.allocate(1000, device=2)
+    allocator.deallocate(c)
+    inst.disable_logging()
+
+    assert inst.device_mem_usage == {0: 100, 1: 80}
+    assert inst.device_leaked_memory == {0: 0, 1: 30}
+    # The most in use at once across devices 0 and 1 was 130, not 180
+    assert inst.max_gpu_mem_usage == 130
+    assert inst.leaked_memory == 30
+    allocator.deallocate(b)
+    allocator.deallocate(d)
+
+
+def test_fake_tracker_attribution():
+    allocator = FakeAllocator()
+    inst = RMMResourceAnalyzer(
+        tracker=FakeAllocationTracker(allocator, attribution=True))
+
+    def worker():
+        for _ in range(3):
+            allocator.deallocate(allocator.allocate(10, stream=0x7f00))
+
+    inst.enable_logging()
+    a = allocator.allocate(100)
+    b = allocator.allocate(200, stream=0x7f00)
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    allocator.deallocate(a)
+    inst.disable_logging()
+
+    usage = inst.mem_attribution
+    assert usage["stream0"] == {"mem": 100, "allocs": 1, "alloc_bytes": 100}
+    assert usage["stream1"] == {"mem": 210, "allocs": 4, "alloc_bytes": 230}
+    assert usage["thread0"] == {"mem": 300, "allocs": 2, "alloc_bytes": 300}
+    assert usage["thread1"] == {"mem": 10, "allocs": 3, "alloc_bytes": 30}
+    assert inst.mem_attribution_ids["stream1"] == "0x7f00"
+    assert inst.mem_attribution_ids["thread0"] == str(threading.get_ident())
+    allocator.deallocate(b)
+
+
+def test_gpubenchmark_fake_tracker(pytester):
+    pytester.makepyfile(
+        """
+        from rapids_pytest_benchmark.rmm_resource_analyzer import fake_allocator
+
+        leaked = []
+
+        def alloc():
+            tmp = fake_allocator.allocate(1024)
+            leaked.append(fake_allocator.allocate(256))
+            fake_allocator.deallocate(tmp)
+
+        def bench_alloc(gpubenchmark):
+            gpubenchmark(alloc)
+        """
+    )
+    result = pytester.runpytest(
+        "-o", "python_functions=bench_*",
+        "--benchmark-gpu-tracker=fake",
+        "--benchmark-gpu-max-rounds=1",
+        "--benchmark-columns=mean,rounds",
+    )
+    result.assert_outcomes(passed=1)
+    result.stdout.fnmatch_lines(["*GPU mem*GPU Leaked mem*",
+                                 "*bench_alloc*1,280*256*"])
+
+
+def test_gpubenchmark_fake_tracker_devices(pytester):
+    pytester.makepyfile(
+        """
+        from rapids_pytest_benchmark.rmm_resource_analyzer import fake_allocator
+
+        def alloc():
+            tmp = fake_allocator.allocate(1024, device=0)
+            fake_allocator.deallocate(tmp)
+            tmp = fake_allocator.allocate(4096, device=1)
+            fake_allocator.deallocate(tmp)
+
+        def bench_alloc(gpubenchmark):
+            gpubenchmark(alloc)
+        """
+    )
+    result = pytester.runpytest(
+        "-o", "python_functions=bench_*",
+        "--benchmark-gpu-tracker=fake",
+        "--benchmark-gpu-device=0,1",
+        "--benchmark-columns=mean,rounds",
+    )
+    result.assert_outcomes(passed=1)
+    result.stdout.re_match_lines([r".*GPU mem +GPU mem \[dev0\] +GPU mem \[dev1\]",
+                                  r"bench_alloc +[\d.]+ +4,096 +1,024 +4,096 "])
+
+
+def test_gpubenchmark_fake_tracker_attribution(pytester):
+    pytester.makepyfile(
+        """
+        from rapids_pytest_benchmark.rmm_resource_analyzer import fake_allocator
+
+        def alloc():
+            tmp = fake_allocator.allocate(1024, stream=1)
+            fake_allocator.deallocate(tmp)
+            tmp = fake_allocator.allocate(4096, stream=2)
+            fake_allocator.deallocate(tmp)
+            tmp = fake_allocator.allocate(4096, stream=2)
+            fake_allocator.deallocate(tmp)
+
+        def bench_alloc(gpubenchmark):
+            gpubenchmark(alloc)
+        """
+    )
+    result = pytester.runpytest(
+        "-o", "python_functions=bench_*",
+        "--benchmark-gpu-tracker=fake",
+        "--benchmark-gpu-attribution",
+        "--benchmark-columns=mean,rounds",
+    )
+    result.assert_outcomes(passed=1)
+    result.stdout.re_match_lines([
+        r".*GPU Leaked mem +GPU mem \[stream0\] +GPU mem \[stream1\] "
+        r"+GPU mem \[thread0\] +GPU allocs \[stream0\] +GPU allocs \[stream1\] ",
+        r"bench_alloc +[\d.]+ +4,096 +0 +1,024 +4,096 +4,096 +1 +2 "])
+
+
+def test_gpu_stats_rounds():
+    from ..plugin import GPUStats, GPUBenchmarkResults
+
+    stats = GPUStats()
+    for (gpuMem, gpuLeakedMem) in [(300, 0), (100, 10), (200, 20), (400, 10)]:
+        stats.updateGPUMetrics(GPUBenchmarkResults(gpuMem, -1, gpuLeakedMem))
+
+    assert stats.gpu_rounds == 4
+    assert (stats.gpu_mem_min, stats.gpu_mem_median, stats.gpu_mem) == \
+        (100, 250, 400)
+    assert (stats.gpu_leaked_mem_min, stats.gpu_leaked_mem_median,
+            stats.gpu_leaked_mem) == (0, 10, 20)
+    assert round(stats.gpu_mem_stddev, 3) == 129.099
+
+
+def test_gpubenchmark_gpu_rounds(pytester):
+    pytester.makepyfile(
+        """
+        import itertools
+
+        from rapids_pytest_benchmark.rmm_resource_analyzer import fake_allocator
+
+        sizes = itertools.cycle([1024, 4096, 2048])
+
+        def alloc():
+            fake_allocator.deallocate(fake_allocator.allocate(next(sizes)))
+
+        def bench_alloc(gpubenchmark):
+            gpubenchmark(alloc)
+        """
+    )
+    result = pytester.runpytest(
+        "-o", "python_functions=bench_*",
+        "--benchmark-gpu-tracker=fake",
+        "--benchmark-gpu-max-rounds=3",
+        "--benchmark-min-rounds=5",
+        "--benchmark-columns=mean,rounds",
+        "--benchmark-json=out.json",
+    )
+    result.assert_outcomes(passed=1)
+    result.stdout.re_match_lines([
+        r".*GPU mem +GPU mem Min +GPU mem Median +GPU mem StdDev "
+        r"+GPU Leaked mem +GPU Leaked mem Min .* +GPU Rounds",
+        r"bench_alloc +[\d.]+ +4,096 +1,024 +2,048 +1,564 +0 +0 +0 +0 .* +3$"])
+
+    with open(pytester.path / "out.json") as f:
+        stats = json.load(f)["benchmarks"][0]["stats"]
+    assert stats["gpu_rounds"] == 3
+    assert (stats["gpu_mem_min"], stats["gpu_mem_median"], stats["gpu_mem"]) \
+        == (1024, 2048, 4096)
+
+
+def test_gpubenchmark_pedantic(pytester):
+    pytester.makepyfile(
+        """
+        from rapids_pytest_benchmark.rmm_resource_analyzer import fake_allocator
+
+        inputs = []
+        calls = []
+
+        def setup():
+            # Not part of the measured peak
+            inputs.append(fake_allocator.allocate(4096))
+            return ((inputs[-1],), {})
+
+        def consume(pointer):
+            tmp = fake_allocator.allocate(1024)
+            fake_allocator.deallocate(tmp)
+            calls.append(pointer)
+
+        def leak():
+            fake_allocator.allocate(256)
+            calls.append(None)
+
+        def bench_setup(gpubenchmark):
+            calls.clear()
+            gpubenchmark.pedantic(consume, setup=setup, rounds=3,
+                                  warmup_rounds=2)
+            # Every round, timed or GPU measured, got a new input
+            assert len(calls) == len(set(calls)) == 2 * (2 + 3)
+
+        def bench_iterations(gpubenchmark):
+            calls.clear()
+            gpubenchmark.pedantic(leak, rounds=2, warmup_rounds=1,
+                                  iterations=3)
+            # Warmup and measured rounds of 3 iterations in both phases, plus
+            # the final call for the result
+            assert len(calls) == 2 * (1 + 2) * 3 + 1
+        """
+    )
+    result = pytester.runpytest(
+        "-o", "python_functions=bench_*",
+        "--benchmark-gpu-tracker=fake",
+        "--benchmark-gpu-max-rounds=10",
+        "--benchmark-columns=mean,rounds",
+    )
+    result.assert_outcomes(passed=2)
+    result.stdout.re_match_lines_random([
+        r"bench_iterations .* +768 .* +768 .* +2 +2$",
+        r"bench_setup .* +1,024 .* +0 .* +3 +3$"])
+
+
+def test_gpubenchmark_no_fixed_wait(pytester):
+    pytester.makepyfile(
+        """
+        def bench_noop(gpubenchmark):
+            gpubenchmark(lambda: None)
+        """
+    )
+    result = pytester.runpytest(
+        "-o", "python_functions=bench_*",
+        "--benchmark-gpu-tracker=fake",
+        "--benchmark-gpu-sample-interval=0",
+        "--benchmark-gpu-max-rounds=20",
+        "--benchmark-max-time=0.1",
+        "--benchmark-columns=mean,rounds",
+    )
+    result.assert_outcomes(passed=1)
+    result.stdout.re_match_lines(
+        [r"GPU measurement: [12]\.\d\ds saved over 20 rounds shorter than 0\.1s"])
+    # The GPU rounds alone used to take at least 2s
+    assert result.duration < 1.5
+
+
+def test_gpubenchmark_inline_mode(pytester):
+    pytester.makepyfile(
+        """
+        from rapids_pytest_benchmark.rmm_resource_analyzer import fake_allocator
+
+        calls = []
+
+        def alloc():
+            tmp = fake_allocator.allocate(1024)
+            fake_allocator.deallocate(tmp)
+            calls.append(None)
+
+        def bench_raw(gpubenchmark):
+            calls.clear()
+            gpubenchmark(alloc)
+            # The timed rounds, plus the call for the result which was
+            # measured
+            timed = gpubenchmark.stats.stats.rounds * \\
+                gpubenchmark.stats.iterations
+            assert timed < len(calls) < timed + 100
+
+        def bench_pedantic(gpubenchmark):
+            calls.clear()
+            gpubenchmark.pedantic(alloc, rounds=3, warmup_rounds=1)
+            # No extra calls, and the measured round is not timed
+            assert len(calls) == 1 + 3
+            assert gpubenchmark.stats.stats.rounds == 2
+        """
+    )
+    result = pytester.runpytest(
+        "-o", "python_functions=bench_*",
+        "--benchmark-gpu-tracker=fake",
+        "--benchmark-gpu-mode=inline",
+        "--benchmark-gpu-max-rounds=3",
+        "--benchmark-columns=mean,rounds",
+    )
+    result.assert_outcomes(passed=2)
+    result.stdout.re_match_lines_random([
+        r"bench_pedantic .* +1,024 .* +2 +1$",
+        r"bench_raw .* +1,024 .* +1$"])
+
+
+def test_gpubenchmark_inline_mode_cprofile(pytester):
+    pytester.makepyfile(
+        """
+        from rapids_pytest_benchmark.rmm_resource_analyzer import fake_allocator
+
+        calls = []
+
+        def alloc():
+            tmp = fake_allocator.allocate(1024)
+            fake_allocator.deallocate(tmp)
+            calls.append(None)
+
+        def profiled_functions(gpubenchmark):
+            return {function for (_, _, function) in
+                    gpubenchmark.stats.cprofile_stats.stats}
+
+        def bench_raw(gpubenchmark):
+            calls.clear()
+            gpubenchmark(alloc)
+            # The timed rounds, the profiled call for the result, and a
+            # separate call which was measured
+            timed = gpubenchmark.stats.stats.rounds * \\
+                gpubenchmark.stats.iterations
+            assert timed + 1 < len(calls) < timed + 100
+            # The GPU measurements are not profiled
+            assert "alloc" in profiled_functions(gpubenchmark)
+            assert "enable_logging" not in profiled_functions(gpubenchmark)
+
+        def bench_pedantic(gpubenchmark):
+            calls.clear()
+            gpubenchmark.pedantic(alloc, rounds=3, warmup_rounds=1)
+            # Only the profiled call is extra, and it is not measured
+            assert len(calls) == 1 + 3 + 1
+            assert gpubenchmark.stats.stats.rounds == 2
+            # The GPU measurements are not profiled
+            assert "alloc" in profiled_functions(gpubenchmark)
+            assert "enable_logging" not in profiled_functions(gpubenchmark)
+        """
+    )
+    result = pytester.runpytest(
+        "-o", "python_functions=bench_*",
+        "--benchmark-gpu-tracker=fake",
+        "--benchmark-gpu-mode=inline",
+        "--benchmark-cprofile=tottime",
+        "--benchmark-columns=mean,rounds",
+    )
+    result.assert_outcomes(passed=2)
+    result.stdout.re_match_lines_random([
+        r"bench_pedantic .* +1,024 .* +2 +1$",
+        r"bench_raw .* +1,024 .* +1$"])
@@ -0,0 +1,71 @@
+import time
+
+import pytest
+
+from .. import host_sampler
+from ..host_sampler import HostSampler
+
+pytest_plugins = "pytester"
+
+MB = 1 << 20
+
+
+def _touch(nbytes):
+    # Filled with non-zero bytes, so every page is resident
+    return b"\x01" * nbytes
+
+
+@pytest.mark.parametrize("exact_peak", [True, False])
+def test_host_sampler_memory(monkeypatch, exact_peak):
+    if not exact_peak:
+        monkeypatch.setattr(host_sampler, "_resetPeakRSS", lambda: False)
+    sampler = HostSampler(interval=0.001)
+
+    sampler.start()
+    temporary = _touch(64 * MB)
+    # Give the sampling thread time to see the temporary
+    time.sleep(0.05)
+    del temporary
+    kept = _touch(16 * MB)
+    sampler.stop()
+
+    assert sampler.max_rss >= sampler._start_rss + (60 * MB)
+    # Allow for other memory being given back in the meantime
+    assert (8 * MB) <= sampler.rss_growth < (60 * MB)
+    del kept
+
+
+def test_host_sampler_cpu():
+    sampler = HostSampler()
+
+    sampler.start()
+    end = time.perf_counter() + 0.2
+    while time.perf_counter() < end:
+        pass
+    sampler.stop()
+
+    assert sampler.cpu_time > 0.1
+    # A busy loop keeps one core busy
+    assert 50 < sampler.cpu_util < 150
+
+
+def test_gpubenchmark_host_metrics(pytester):
+    pytester.makepyfile(
+        """
+        def work():
+            return bytes(1 << 20)
+
+        def bench_work(gpubenchmark):
+            gpubenchmark(work)
+        """
+    )
+    result = pytester.runpytest(
+        "-o", "python_functions=bench_*",
+        "--benchmark-gpu-tracker=fake",
+        "--benchmark-gpu-sample-interval=0",
+        "--benchmark-columns=mean,rounds",
+    )
+    result.assert_outcomes(passed=1)
+    result.stdout.re_match_lines([
+        r".*GPU Leaked mem +Host mem +Host Leaked mem +CPU util %",
+        r"bench_work +[\d.]+ +0 +0 +[\d,]+ +-?[\d,]+ +[\d.]+ "])
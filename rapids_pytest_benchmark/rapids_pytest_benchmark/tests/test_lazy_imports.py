@@ -0,0 +1,47 @@
+from ..plugin import GPU_TRACKERS
+from ..rmm_resource_analyzer import TRACKERS
+
+pytest_plugins = "pytester"
+
+
+# Imported by the plugin only once a gpubenchmark is run or ASV results are
+# written.
+HEAVY_MODULES = ["numpy", "psutil", "rmm", "asvdb", "pynvml"]
+
+
+def test_gpu_trackers():
+    assert sorted(GPU_TRACKERS) == sorted(TRACKERS)
+
+
+def test_no_heavy_imports_without_gpubenchmark(pytester):
+    pytester.makepyfile(
+        f"""
+        import sys
+
+        def test_plain():
+            assert [m for m in {HEAVY_MODULES!r} if m in sys.modules] == []
+        """
+    )
+    # In a subprocess, since this process has imported them all already. The
+    # plugin is loaded from its pytest11 entry point as in any other run.
+    result = pytester.runpytest_subprocess()
+    result.assert_outcomes(passed=1)
+
+
+def test_heavy_imports_with_gpubenchmark(pytester):
+    pytester.makepyfile(
+        """
+        import sys
+
+        def bench_gpu(gpubenchmark):
+            gpubenchmark(lambda: None)
+
+        def test_imported():
+            assert "numpy" in sys.modules
+        """
+    )
+    result = pytester.runpytest_subprocess(
+        "-o", "python_functions=bench_* test_*",
+        "--benchmark-gpu-tracker=fake", "--benchmark-gpu-sampler=fake",
+        "--benchmark-max-time=0.01")
+    result.assert_outcomes(passed=2)
@@ -0,0 +1,140 @@
+import csv
+import random
+
+import numpy as np
+
+from ..rmm_resource_analyzer import (OpenAllocationIndex, RMMLogTracker,
+                                     RMMResourceAnalyzer, FakeAllocator,
+                                     FakeAllocationTracker)
+from .test_rmm_log_parser import _write_log
+
+pytest_plugins = "pytester"
+
+
+def _batch(events):
+    """
+    Make a batch from a list of (action, pointer, size) tuples.
+    """
+    (actions, pointers, sizes) = zip(*events)
+    return {
+        "time": np.arange(len(events), dtype=np.int64),
+        "action": np.array(actions, dtype="S16"),
+        "size": np.array(sizes, dtype=np.int64),
+        "pointer": np.array(pointers, dtype=np.uint64),
+        "thread": np.array([b"1"] * len(events), dtype="S32"),
+        "stream": np.array([b"0x0"] * len(events), dtype="S20"),
+    }
+
+
+def test_open_allocation_index():
+    index = OpenAllocationIndex()
+    index.update(_batch([
+        ("allocate", 0x10, 100),
+        ("allocate", 0x20, 200),
+        # Allocated before tracking started
+        ("free", 0x99, 4096),
+        ("free", 0x10, 100),
+        # The same address reused
+        ("allocate", 0x10, 30),
+    ]))
+    assert len(index) == 2
+    assert index.leaked_bytes == 230
+
+    index.update(_batch([
+        ("free", 0x20, 200),
+        ("allocate", 0x20, 5000),
+        ("allocate", 0x30, 1),
+        ("free", 0x10, 30),
+        ("allocate", 0x10, 0),
+    ]))
+    assert (index.unmatched_frees, index.unmatched_free_bytes) == (1, 4096)
+    assert len(index) == 3
+    assert index.leaked_bytes == 5001
+    assert index.size_histogram() == [[0, 1, 0], [1, 1, 1], [4096, 1, 5000]]
+    largest = index.largest(2)
+    assert [(leak["pointer"], leak["size"]) for leak in largest] == \
+        [("0x20", 5000), ("0x30", 1)]
+    assert (largest[0]["time"], largest[0]["thread"], largest[0]["stream"]) \
+        == (1, "1", "0x0")
+
+
+def test_log_leaks_match_reference(tmp_path):
+    log_file = str(tmp_path / "log.dev0")
+    _write_log(log_file, 5000, seed=3)
+
+    inst = RMMLogTracker(devices=[0], leak_report=5)
+    inst._parse_results({0: log_file})
+
+    live = {}
+    with open(log_file, mode="r") as csv_file:
+        for row in csv.DictReader(csv_file):
+            if row["Action"] == "allocate":
+                live[row["Pointer"]] = int(row["Size"])
+            else:
+                del live[row["Pointer"]]
+    largest = sorted(live.items(), key=lambda p: p[1], reverse=True)[:5]
+
+    assert inst.leaked_memory == sum(live.values())
+    assert inst.leaks["leaked_allocs"] == len(live)
+    assert inst.leaks["unmatched_frees"] == 0
+    assert sum(count for (_, count, _) in inst.leaks["size_histogram"]) == \
+        len(live)
+    assert [(leak["pointer"], leak["size"])
+            for leak in inst.leaks["largest"]] == largest
+
+
+def test_fake_tracker_leak_report():
+    allocator = FakeAllocator()
+    before = allocator.allocate(4096)
+
+    inst = RMMResourceAnalyzer(
+        tracker=FakeAllocationTracker(allocator, leak_report=3))
+    inst.enable_logging()
+    leaks = [allocator.allocate(size) for size in (10, 20, 30, 40)]
+    allocator.deallocate(allocator.allocate(1000))
+    allocator.deallocate(before)
+    inst.disable_logging()
+
+    # Unlike the size-based count, the free of "before" does not hide leaks
+    assert inst.leaked_memory == 100
+    report = inst.leak_report
+    assert report["leaked_allocs"] == 4
+    assert (report["unmatched_frees"], report["unmatched_free_bytes"]) == \
+        (1, 4096)
+    assert [leak["size"] for leak in report["largest"]] == [40, 30, 20]
+    assert [leak["pointer"] for leak in report["largest"]] == \
+        [hex(p) for p in leaks[:0:-1]]
+    for leak in leaks:
+        allocator.deallocate(leak)
+
+
+def test_gpubenchmark_leak_report(pytester):
+    pytester.makepyfile(
+        """
+        from rapids_pytest_benchmark.rmm_resource_analyzer import fake_allocator
+
+        leaked = []
+
+        def alloc():
+            leaked.append(fake_allocator.allocate(256))
+            leaked.append(fake_allocator.allocate(2048))
+
+        def bench_alloc(gpubenchmark):
+            gpubenchmark(alloc)
+        """
+    )
+    result = pytester.runpytest(
+        "-o", "python_functions=bench_*",
+        "--benchmark-gpu-tracker=fake",
+        "--benchmark-gpu-leak-report=1",
+        "--benchmark-columns=mean,rounds",
+    )
+    result.assert_outcomes(passed=1)
+    result.stdout.re_match_lines([
+        r".*GPU Leaked mem +GPU Leaked allocs",
+        r"bench_alloc +[\d.]+ +2,304 +2,304 +2 ",
+        r"GPU leaks:",
+        r" +bench_alloc: 2 allocations, 2,304 bytes not freed",
+        r" +sizes: 256\+: 1, 2,048\+: 1",
+        r" +2,048 bytes at [\d.]+s +ptr 0x[0-9a-f]+ +device 0 ",
+    ])
@@ -0,0 +1,74 @@
+import json
+
+import numpy as np
+
+from ..rmm_resource_analyzer import (MemoryTimeline, RMMResourceAnalyzer,
+                                     FakeAllocator, FakeAllocationTracker)
+
+pytest_plugins = "pytester"
+
+
+def test_timeline_bounded_and_keeps_peak():
+    rng = np.random.default_rng(0)
+    timeline = MemoryTimeline(max_points=50)
+    values = np.cumsum(rng.integers(-100, 101, size=100000))
+    peak_index = 31337
+    values[peak_index] = values.max() + 1000
+    times = np.arange(len(values), dtype=np.int64) * 3
+
+    # Add the samples in uneven batches
+    for (start, end) in [(0, 10), (10, 5000), (5000, 5001), (5001, 100000)]:
+        timeline.update(times[start:end], values[start:end])
+
+    points = timeline.points(time_scale=1)
+    assert len(points) <= 50
+    assert [p[0] for p in points] == sorted(p[0] for p in points)
+    assert max(p[1] for p in points) == values[peak_index]
+    assert [peak_index * 3, values[peak_index]] in points
+    assert min(p[1] for p in points) == values.min()
+
+
+def test_fake_tracker_timeline():
+    allocator = FakeAllocator()
+    inst = RMMResourceAnalyzer(
+        tracker=FakeAllocationTracker(allocator, timeline_points=10))
+
+    inst.enable_logging()
+    # A slow ramp up, then a single large temporary
+    ptrs = [allocator.allocate(10) for _ in range(100)]
+    allocator.deallocate(allocator.allocate(5000))
+    for ptr in ptrs:
+        allocator.deallocate(ptr)
+    inst.disable_logging()
+
+    assert len(inst.mem_timeline) <= 10
+    assert max(v for (_, v) in inst.mem_timeline) == 6000
+    assert inst.mem_timeline[0][0] == 0
+
+
+def test_gpubenchmark_timeline_json(pytester):
+    pytester.makepyfile(
+        """
+        from rapids_pytest_benchmark.rmm_resource_analyzer import fake_allocator
+
+        def alloc():
+            ptrs = [fake_allocator.allocate(8) for _ in range(1000)]
+            for ptr in ptrs:
+                fake_allocator.deallocate(ptr)
+
+        def bench_alloc(gpubenchmark):
+            gpubenchmark(alloc)
+        """
+    )
+    result = pytester.runpytest(
+        "-o", "python_functions=bench_*",
+        "--benchmark-gpu-tracker=fake",
+        "--benchmark-gpu-timeline=20",
+        "--benchmark-json=out.json",
+    )
+    result.assert_outcomes(passed=1)
+    with open(pytester.path / "out.json") as f:
+        stats = json.load(f)["benchmarks"][0]["stats"]
+    assert stats["gpu_mem"] == 8000
+    assert len(stats["gpu_mem_timeline"]) <= 20
+    assert max(v for (_, v) in stats["gpu_mem_timeline"]) == 8000
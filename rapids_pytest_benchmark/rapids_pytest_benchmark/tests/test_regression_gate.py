@@ -0,0 +1,169 @@
+import json
+import os
+
+from ..asv_history import ASVHistory
+from ..regression_gate import checkResult
+
+pytest_plugins = "pytester"
+
+
+def write_results(asv_dir, machine, commit_hash, date, results, param_names=None):
+    """
+    Write an ASV results file for commit_hash on machine, with results in the
+    format written by asvdb: {name: {"result": [...], "params": [[...]]}}.
+    """
+    results_dir = os.path.join(asv_dir, "results")
+    os.makedirs(os.path.join(results_dir, machine), exist_ok=True)
+    if param_names is not None:
+        with open(os.path.join(results_dir, "benchmarks.json"), "w") as f:
+            json.dump({name: {"name": name, "param_names": names}
+                       for (name, names) in param_names.items()}, f)
+    path = os.path.join(results_dir, machine, commit_hash + "-python3.10.json")
+    with open(path, "w") as f:
+        json.dump({"commit_hash": commit_hash, "date": date,
+                   "results": results, "version": 1}, f)
+    return path
+
+
+def test_noise_aware_check():
+    stable = [1.0, 1.01, 0.99, 1.0, 1.0]
+    noisy = [1.0, 1.3, 0.8, 1.2, 0.9]
+    # A 10% increase fails a stable benchmark, not a noisy one
+    assert checkResult("b", "time", 1.1, stable, 0.05, 0.95) is not None
+    assert checkResult("b", "time", 1.1, noisy, 0.05, 0.95) is None
+    # Changes under the threshold never fail
+    assert checkResult("b", "time", 1.04, stable, 0.05, 0.95) is None
+    # Decreases only fail two-sided checks
+    assert checkResult("b", "time", 0.8, stable, 0.05, 0.95) is None
+    regression = checkResult("b", "accuracy", 0.8, stable, 0.05, 0.95,
+                             two_sided=True)
+    assert regression.change < -0.19
+    assert regression.ci[0] <= regression.baseline <= regression.ci[1]
+
+
+def test_history_index(tmp_path):
+    asv_dir = str(tmp_path)
+    param_names = {"mod.bench_a_time": ["n", "s"]}
+    for i in range(3):
+        write_results(asv_dir, "m1", "commit%d" % i, 1000 + i,
+                     {"mod.bench_a_time": {"result": [i, 10 + i, None, 30 + i],
+                                           "params": [["1", "2"],
+                                                      ["'x'", "'y'"]]},
+                      "mod.bench_b_time": {"result": [100 + i], "params": []}},
+                     param_names)
+    write_results(asv_dir, "m2", "commit0", 1000,
+                 {"mod.bench_b_time": {"result": [200], "params": []}})
+
+    history = ASVHistory(asv_dir)
+    assert history.get_history("m1", "mod.bench_a_time", {"n": 2, "s": "y"}) \
+        == [("commit2", 32), ("commit1", 31), ("commit0", 30)]
+    assert history.get_history("m1", "mod.bench_a_time", {"n": 2, "s": "x"}) \
+        == []
+    assert history.get_history("m1", "mod.bench_b_time", {},
+                               exclude_commit="commit2", limit=1) \
+        == [("commit1", 101)]
+    assert history.get_history("m2", "mod.bench_b_time", {}) \
+        == [("commit0", 200)]
+    history.close()
+
+    # Only new and changed files are read when the index is reopened
+    os.remove(write_results(asv_dir, "m2", "commit0", 1000, {}))
+    write_results(asv_dir, "m1", "commit3", 1003,
+                 {"mod.bench_b_time": {"result": [103], "params": []}})
+    history = ASVHistory(asv_dir)
+    assert [c for (c, _) in history.get_history("m1", "mod.bench_b_time", {})] \
+        == ["commit3", "commit2", "commit1", "commit0"]
+    assert history.get_history("m2", "mod.bench_b_time", {}) == []
+    history.close()
+
+
+def test_regression_gate(pytester):
+    pytester.makepyfile(
+        test_gate="""
+        import pytest
+
+        from rapids_pytest_benchmark.rmm_resource_analyzer import fake_allocator
+
+        def alloc(size):
+            tmp = fake_allocator.allocate(size)
+            fake_allocator.deallocate(tmp)
+
+        @pytest.mark.parametrize("size", [1000, 2000])
+        def bench_alloc(gpubenchmark, size):
+            gpubenchmark(alloc, size)
+        """
+    )
+    asv_dir = str(pytester.path / "asv")
+    for i in range(5):
+        # bench_alloc[2000] used to allocate half as much. The times are much
+        # higher than they will be.
+        write_results(asv_dir, "machine", "commit%d" % i, i,
+                     {"test_gate.bench_alloc_gpumem": {
+                          "result": [1000, 1000 + i],
+                          "params": [["1000", "2000"]]},
+                      "test_gate.bench_alloc_time": {
+                          "result": [10, 10], "params": [["1000", "2000"]]}},
+                     {"test_gate.bench_alloc_gpumem": ["size"],
+                      "test_gate.bench_alloc_time": ["size"]})
+    metadata = json.dumps(dict(machineName="machine", commitHash="new",
+                               commitTime="10", commitRepo="repo",
+                               commitBranch="main"))
+
+    result = pytester.runpytest(
+        "-o", "python_functions=bench_*",
+        "--benchmark-gpu-tracker=fake",
+        "--benchmark-max-time=0.01",
+        f"--benchmark-asv-output-dir={asv_dir}",
+        f"--benchmark-asv-metadata={metadata}",
+        "--benchmark-asv-regression-gate",
+        "--benchmark-asv-regression-threshold=time=50%,gpu_mem=10%")
+
+    assert result.ret != 0
+    result.stdout.fnmatch_lines([
+        "ASV regression gate: 1 regressions in 4 results compared to up to "
+        "20 recent results on machine",
+        "*+9*%  test_gate.py::bench_alloc[[]2000[]] gpu_mem: 2000 vs. median "
+        "1002 (95% CI * - *) of 5 results, z=*",
+    ])
+    result.stderr.fnmatch_lines(
+        ["*test_gate.py::bench_alloc[[]2000[]] - gpu_mem +99.6% (z=*)"])
+
+
+def test_skip_existing(pytester):
+    pytester.makepyfile(
+        test_skip="""
+        import pytest
+
+        @pytest.mark.parametrize("size", [1000, 2000, 3000])
+        def bench_sum(gpubenchmark, size):
+            gpubenchmark(sum, range(size))
+        """
+    )
+    asv_dir = str(pytester.path / "asv")
+    param_names = {"test_skip.bench_sum_time": ["size"]}
+    # A previous run for this commit only got through size=1000, and one for
+    # another commit through size=2000
+    write_results(asv_dir, "machine", "new", 10,
+                  {"test_skip.bench_sum_time": {
+                       "result": [1.0, None, None],
+                       "params": [["1000", "2000", "3000"]]}},
+                  param_names)
+    write_results(asv_dir, "machine", "old", 9,
+                  {"test_skip.bench_sum_time": {
+                       "result": [1.0, 2.0, None],
+                       "params": [["1000", "2000", "3000"]]}})
+    metadata = json.dumps(dict(machineName="machine", commitHash="new",
+                               commitTime="10", commitRepo="repo",
+                               commitBranch="main"))
+
+    result = pytester.runpytest_subprocess(
+        "-o", "python_functions=bench_*",
+        "--benchmark-gpu-tracker=fake",
+        "--benchmark-max-time=0.01",
+        f"--benchmark-asv-output-dir={asv_dir}",
+        f"--benchmark-asv-metadata={metadata}",
+        "--benchmark-asv-skip-existing", "-v")
+
+    result.assert_outcomes(passed=2, deselected=1)
+    result.stdout.fnmatch_lines(["*bench_sum[[]2000[]] PASSED*",
+                                 "*bench_sum[[]3000[]] PASSED*"])
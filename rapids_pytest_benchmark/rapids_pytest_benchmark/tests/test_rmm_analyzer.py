@@ -1,5 +1,6 @@
 import cudf
-from ..rmm_resource_analyzer import RMMResourceAnalyzer
+from ..rmm_resource_analyzer import (RMMResourceAnalyzer, RMMLogTracker,
+                                     RMMStatisticsTracker)
 
 
 def test_rmm_analyzer():
@@ -9,3 +10,23 @@ def test_rmm_analyzer():
     del s
     inst.disable_logging()
     assert inst.max_gpu_mem_usage == 8
+
+
+def test_rmm_analyzer_streaming():
+    inst = RMMResourceAnalyzer(tracker=RMMLogTracker(streaming=True))
+    inst.enable_logging()
+    s = cudf.Series([1])
+    del s
+    inst.disable_logging()
+    assert inst.max_gpu_mem_usage == 8
+    assert inst.leaked_memory == 0
+
+
+def test_rmm_analyzer_statistics():
+    inst = RMMResourceAnalyzer(tracker=RMMStatisticsTracker())
+    inst.enable_logging()
+    s = cudf.Series([1])
+    del s
+    inst.disable_logging()
+    assert inst.max_gpu_mem_usage == 8
+    assert inst.leaked_memory == 0
@@ -0,0 +1,126 @@
+import csv
+import random
+
+from ..rmm_resource_analyzer import (RMMLogFileReader, RMMLogTracker,
+                                     MemoryUsageAggregator)
+
+
+def _write_log(path, num_rows, seed, time_offset=0, start_time=0,
+               threads=("1234",), streams=("0x0",)):
+    rng = random.Random(seed)
+    live = []
+    with open(path, mode="w") as log_file:
+        log_file.write("Thread,Time,Action,Pointer,Size,Stream\n")
+        for i in range(num_rows):
+            if live and rng.random() < 0.45:
+                (ptr, size) = live.pop(rng.randrange(len(live)))
+                action = "free"
+            else:
+                (ptr, size) = (hex(0x7f0000000000 + i), rng.randint(1, 1 << 20))
+                live.append((ptr, size))
+                action = "allocate"
+            usec = start_time + (i * 2) + time_offset
+            timestamp = "%02d:%02d:%02d.%06d" % (
+                (usec // 3600000000) % 24, (usec // 60000000) % 60,
+                (usec // 1000000) % 60, usec % 1000000)
+            thread = threads[i % len(threads)]
+            stream = streams[(i // 3) % len(streams)]
+            log_file.write(
+                f"{thread},{timestamp},{action},{ptr},{size},{stream}\n")
+
+
+def _read_rows(log_files):
+    rows = []
+    for (device, log_file) in log_files.items():
+        with open(log_file, mode="r") as csv_file:
+            for (i, row) in enumerate(csv.DictReader(csv_file)):
+                rows.append(((i * 2) + device, row))
+    return [row for (_, row) in sorted(rows, key=lambda r: r[0])]
+
+
+def _reference_parse(rows):
+    """
+    The original row-at-a-time parser, used to check the batched one.
+    """
+    max_gpu_mem_usage = 0
+    current_mem_usage = 0
+    for row in rows:
+        if row["Action"] == "allocate":
+            current_mem_usage += int(row["Size"])
+            if current_mem_usage > max_gpu_mem_usage:
+                max_gpu_mem_usage = current_mem_usage
+        if row["Action"] == "free":
+            current_mem_usage -= int(row["Size"])
+    return (max_gpu_mem_usage, current_mem_usage)
+
+
+def test_batched_parser_matches_reference(tmp_path):
+    log_files = {}
+    for device in range(3):
+        log_files[device] = str(tmp_path / f"log.dev{device}")
+        # Interleave the timestamps of the devices
+        _write_log(log_files[device], 5000, seed=device, time_offset=device)
+
+    # Only observe 2 of the devices
+    observed = {0: log_files[0], 2: log_files[2]}
+    inst = RMMLogTracker(devices=[0, 2])
+    inst._parse_results(observed)
+
+    for device in observed:
+        assert (inst.device_peaks[device], inst.device_leaks[device]) == \
+            _reference_parse(_read_rows({device: observed[device]}))
+    assert (inst.max_gpu_mem_usage, inst.leaked_memory) == \
+        _reference_parse(_read_rows(observed))
+
+
+def test_attribution_matches_reference(tmp_path):
+    log_file = str(tmp_path / "log.dev0")
+    _write_log(log_file, 3000, seed=7, threads=("111", "222"),
+               streams=("0x7f10", "0x0", "0x7f20"))
+
+    inst = RMMLogTracker(devices=[0], attribution=True)
+    inst._parse_results({0: log_file})
+
+    rows = _read_rows({0: log_file})
+    for (label, column, raw_id) in [("thread0", "Thread", "111"),
+                                    ("thread1", "Thread", "222"),
+                                    ("stream0", "Stream", "0x7f10"),
+                                    ("stream2", "Stream", "0x7f20")]:
+        assert inst.attribution_ids[label] == raw_id
+        key_rows = [r for r in rows if r[column] == raw_id]
+        allocs = [int(r["Size"]) for r in key_rows
+                  if r["Action"] == "allocate"]
+        assert inst.attributed_usage[label] == {
+            "mem": _reference_parse(key_rows)[0],
+            "allocs": len(allocs),
+            "alloc_bytes": sum(allocs),
+        }
+
+
+def test_reader_chunk_boundaries(tmp_path):
+    log_file = str(tmp_path / "log.dev0")
+    _write_log(log_file, 1000, seed=42)
+
+    # A tiny chunk size splits rows, and the header, across reads
+    reader = RMMLogFileReader(log_file, chunk_size=7, release_consumed=False)
+    aggregator = MemoryUsageAggregator([0])
+    reader.consume(lambda batch: aggregator.add(0, batch))
+    reader.close()
+
+    counter = aggregator.device_counters[0]
+    assert (counter.peak, counter.current) == \
+        _reference_parse(_read_rows({0: log_file}))
+
+
+def test_reader_times_wrap_at_midnight(tmp_path):
+    log_file = str(tmp_path / "log.dev0")
+    # Start 1 ms before midnight
+    _write_log(log_file, 1000, seed=1, start_time=(24 * 3600 * 10**6) - 1000)
+
+    reader = RMMLogFileReader(log_file, chunk_size=100, release_consumed=False)
+    times = []
+    reader.consume(lambda batch: times.extend(batch["time"].tolist()))
+    reader.close()
+
+    assert times == sorted(times)
+    assert times[-1] - times[0] == 999 * 2
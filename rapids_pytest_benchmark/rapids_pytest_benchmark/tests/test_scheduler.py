@@ -0,0 +1,80 @@
+import json
+
+from ..scheduler import (DURATIONS_CACHE_KEY, balanceByDuration,
+                         cpuAffinitySets)
+
+pytest_plugins = "pytester"
+
+
+def test_balance_by_duration():
+    durations = {"a": 10, "b": 6, "c": 5, "d": 4, "e": 1}
+    assignments = balanceByDuration(["a", "b", "c", "d", "e", "new"],
+                                    durations, 2)
+    # "new" has no past duration and is assumed to take the mean (5.2)
+    totals = [sum(durations.get(n, 5.2) for n in nodeids)
+              for nodeids in assignments]
+    assert sorted(n for nodeids in assignments for n in nodeids) == \
+        ["a", "b", "c", "d", "e", "new"]
+    assert abs(totals[0] - totals[1]) <= 1
+    # The original order is kept within each worker
+    for nodeids in assignments:
+        assert nodeids == sorted(nodeids, key=["a", "b", "c", "d", "e", "new"].index)
+
+
+def test_balance_more_workers_than_items():
+    assert balanceByDuration(["a"], {}, 3) == [["a"], [], []]
+
+
+def test_cpu_affinity_sets():
+    sets = cpuAffinitySets(2)
+    if sets[0] is not None:
+        assert sets[0] and sets[1]
+        assert sets[0].isdisjoint(sets[1]) or len(sets[0] | sets[1]) == 1
+
+
+def test_gpubenchmark_workers(pytester):
+    pytester.makepyfile(
+        """
+        import os
+
+        import pytest
+
+        from rapids_pytest_benchmark.rmm_resource_analyzer import fake_allocator
+
+        def alloc(size):
+            tmp = fake_allocator.allocate(size)
+            fake_allocator.deallocate(tmp)
+
+        @pytest.mark.parametrize("size", [1024, 2048, 4096, 8192])
+        def bench_alloc(gpubenchmark, size):
+            gpubenchmark.extra_info["device"] = \\
+                os.environ["CUDA_VISIBLE_DEVICES"]
+            gpubenchmark.extra_info["pid"] = os.getpid()
+            gpubenchmark(alloc, size)
+
+        def bench_fail(gpubenchmark):
+            assert False
+        """
+    )
+    result = pytester.runpytest(
+        "-o", "python_functions=bench_*",
+        "--benchmark-gpu-tracker=fake",
+        "--benchmark-gpu-workers=3,5",
+        "--benchmark-max-time=0.01",
+        "--benchmark-columns=mean,rounds",
+        "--benchmark-json=results.json",
+    )
+    result.assert_outcomes(passed=4, failed=1)
+    result.stdout.re_match_lines_random([
+        r"bench_alloc\[1024\] .* +1,024 .*",
+        r"bench_alloc\[8192\] .* +8,192 .*"])
+    with open(pytester.path / "results.json") as f:
+        benchmarks = json.load(f)["benchmarks"]
+    assert len(benchmarks) == 4
+    assert {b["extra_info"]["device"] for b in benchmarks} == {"3", "5"}
+    assert len({b["extra_info"]["pid"] for b in benchmarks}) == 2
+
+    # The durations of this run are used to balance the next one
+    cache_file = pytester.path / ".pytest_cache" / "v" / DURATIONS_CACHE_KEY
+    with open(cache_file) as f:
+        assert len(json.load(f)) == 5
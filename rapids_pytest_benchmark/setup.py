@@ -19,7 +19,7 @@ setup(
         name="rapids-pytest-benchmark",
         version=rapids_pytest_benchmark.__version__,
         packages=["rapids_pytest_benchmark"],
-        install_requires=["pytest-benchmark", "asvdb", "pynvml", "rmm"],
+        install_requires=["pytest-benchmark>=3.2.3,<5", "asvdb", "numpy", "pynvml", "rmm", "cuda-python"],
         # the following makes a plugin available to pytest
         entry_points={"pytest11": ["rapids_benchmark = rapids_pytest_benchmark.plugin"]},
         # custom PyPI classifier for pytest plugins